@@ -8,9 +8,24 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
 
 import os
+import time
 
-from django.core.asgi import get_asgi_application
+_boot_start = time.perf_counter()
+
+from django.core.asgi import get_asgi_application  # noqa: E402
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_asgi_application()
+
+# 启动后在后台内存映射磁盘上的搜索索引、预加载OCR引擎（settings.STARTUP_PRELOAD），
+# worker 不必等待索引/模型加载完成即可开始接受请求
+from qa_system.views import start_preload  # noqa: E402
+
+start_preload(time.perf_counter() - _boot_start)
+
+# 收尾上一个进程遗留的任务：执行进程已退出的运行中任务标记为失败，线程执行器下重新提交等待中的任务
+# （锁文件保证同一台机器上只由一个Web进程执行）
+from qa_system.jobs import recover_jobs_once  # noqa: E402
+
+recover_jobs_once()
@@ -145,6 +145,127 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# 搜索索引文件目录（由 python manage.py build_search_index 生成，Web进程启动时内存映射加载）
+SEARCH_INDEX_DIR = BASE_DIR / 'search_index'
+
+# 检索后端：'tfidf'（TF-IDF余弦相似度）或 'bm25'（BM25倒排索引）
+SEARCH_BACKEND = 'tfidf'
+
+# 问答接口检查数据变更并增量更新搜索索引的最小间隔（秒）
+SEARCH_INDEX_REFRESH_INTERVAL = 5
+
+# 文本问答检索结果缓存：ALIAS 为空时使用进程内LRU缓存；
+# 多worker部署可在 CACHES 中配置共享缓存（如 FileBasedCache 或 Redis）并填写其别名
+SEARCH_RESULT_CACHE_ALIAS = None
+SEARCH_RESULT_CACHE_SIZE = 2048
+SEARCH_RESULT_CACHE_TTL = 600  # 秒
+
+# 批量分词/预处理使用的进程数（None 表示使用全部CPU）
+TEXT_PROCESS_WORKERS = None
+
+# 问答预处理每批读取/写回的行数，以及断点文件（python manage.py process_qa_data 使用）
+TEXT_PROCESS_BATCH_SIZE = 500
+TEXT_PROCESS_CHECKPOINT = BASE_DIR / 'process_qa_data.checkpoint'
+
+# 爬虫数据入库每批（每个事务）的行数
+CRAWLER_BATCH_SIZE = 500
+
+# 每个进程的OCR引擎数量上限（每个引擎常驻一套PaddleOCR模型），以及是否在服务启动时预加载
+OCR_POOL_SIZE = 1
+OCR_PRELOAD = True
+
+# 送入OCR模型前的图像预处理步骤（按顺序执行），可选 'grayscale'、'denoise'、'threshold'、'morphology'。
+# PaddleOCR 3.0 自带预处理，默认不做额外处理；低对比度的扫描件可尝试 ('grayscale', 'denoise', 'threshold')
+OCR_PREPROCESS_STEPS = ()
+
+# 大图缩放与分块：长边超过 OCR_MAX_SIDE 像素时等比缩小；高宽比超过 OCR_TILE_ASPECT_RATIO 的长图
+# 只按宽度缩放，再沿高度切成高 OCR_MAX_SIDE、相邻重叠 OCR_TILE_OVERLAP 像素的分块分别识别
+OCR_MAX_SIDE = 1600
+OCR_TILE_ASPECT_RATIO = 2.0
+OCR_TILE_OVERLAP = 128
+
+# 图像识别结果缓存：相同图像（SHA-256）在 OCR_CACHE_TTL 秒内再次上传时直接返回已有结果；
+# OCR_CACHE_PERCEPTUAL 为True时按感知哈希匹配近似重复的图像（汉明距离不超过 OCR_CACHE_PERCEPTUAL_DISTANCE）。
+# 保存的识别图像文件超过TTL或总大小超过 OCR_CACHE_MAX_BYTES 时从最旧的开始删除
+OCR_CACHE_ENABLED = True
+OCR_CACHE_TTL = 7 * 24 * 3600
+OCR_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+OCR_CACHE_PERCEPTUAL = False
+OCR_CACHE_PERCEPTUAL_DISTANCE = 4
+
+# 批量图像识别（python manage.py bulk_ocr / POST /image/bulk/）：推理进程数（每个进程常驻一套模型；
+# 配置了OCR服务时为提交线程数）、每批图像数，以及命令行使用的断点文件
+OCR_BULK_WORKERS = 2
+OCR_BULK_BATCH_SIZE = 16
+OCR_BULK_CHECKPOINT = BASE_DIR / 'bulk_ocr.checkpoint'
+
+# 医学词库目录（medical_lexicon.txt、stopwords.txt、medical_stopwords.txt），None 表示使用 data_processing/lexicon/。
+# 编译后的词库（jieba前缀词典、停用词与实体识别自动机）缓存在 LEXICON_CACHE_PATH（cache/ 目录不纳入版本库）；
+# LEXICON_RELOAD_INTERVAL 秒检查一次词库文件，有变化时自动重新加载（None 表示只通过 /system/lexicon/reload/ 重新加载）
+MEDICAL_LEXICON_DIR = None
+LEXICON_CACHE_PATH = BASE_DIR / 'cache' / 'lexicon.cache'
+LEXICON_RELOAD_INTERVAL = 60
+
+# 独立OCR服务（python manage.py run_ocr_service）：地址为 ('127.0.0.1', 8765) 这样的元组或Unix socket路径，
+# 为None时在Web进程内识别。推理进程数、凑批大小与时间窗口（秒）、等待结果的超时（秒，服务端与Web进程共用；
+# 服务端超时后向客户端返回错误，推理进程异常退出时自动重启）
+OCR_SERVICE_ADDRESS = None
+OCR_SERVICE_WORKERS = 2
+OCR_BATCH_SIZE = 4
+OCR_BATCH_WINDOW = 0.02
+OCR_SERVICE_TIMEOUT = 60
+
+# 后台任务执行器：'thread' 在Web进程内的线程池执行；'worker' 只写入数据库，
+# 由 python manage.py run_job_worker 启动的本地进程领取执行。JOB_WORKERS 为线程池大小
+JOB_EXECUTOR = 'thread'
+JOB_WORKERS = 2
+# Web进程启动时收尾遗留任务的锁文件（同一台机器上只由一个进程收尾）
+JOB_RECOVERY_LOCK = BASE_DIR / 'job_recovery.lock'
+
+# 文本挖掘聚类（直接在稀疏TF-IDF矩阵上计算）：文档数超过 TEXT_MINING_MINIBATCH_THRESHOLD 时 kmeans 改用 MiniBatchKMeans，
+# TEXT_MINING_BATCH_SIZE 为小批量/分块行数。DBSCAN 默认在稀疏半径近邻图上执行，
+# TEXT_MINING_DBSCAN_REDUCTION = 'svd' 时先用 TruncatedSVD 降到 TEXT_MINING_SVD_COMPONENTS 维
+TEXT_MINING_MINIBATCH_THRESHOLD = 50000
+TEXT_MINING_BATCH_SIZE = 4096
+TEXT_MINING_DBSCAN_EPS = 0.5
+TEXT_MINING_DBSCAN_MIN_SAMPLES = 5
+TEXT_MINING_DBSCAN_REDUCTION = 'graph'
+TEXT_MINING_SVD_COMPONENTS = 100
+
+# 流式文本挖掘（语料大于内存时）：问答数据超过 TEXT_MINING_STREAMING_THRESHOLD 条、或上传的ZIP数据集中txt文件
+# 解压后超过 TEXT_MINING_STREAMING_ARCHIVE_BYTES 字节时，按 TEXT_MINING_BATCH_SIZE 分块读取与分词，
+# 分词结果暂存在 TEXT_MINING_SPILL_DIR（None 为系统临时目录），MiniBatchKMeans 逐块训练 TEXT_MINING_STREAMING_EPOCHS 遍；
+# 词项文档频率最多计数 TEXT_MINING_VOCABULARY_CAP 项，t-SNE 与词云使用每个簇 TEXT_MINING_SAMPLE_PER_CLUSTER 条样本
+TEXT_MINING_STREAMING_THRESHOLD = 200000
+TEXT_MINING_STREAMING_ARCHIVE_BYTES = 64 * 1024 * 1024
+TEXT_MINING_SPILL_DIR = None
+TEXT_MINING_STREAMING_EPOCHS = 1
+TEXT_MINING_VOCABULARY_CAP = 1000000
+TEXT_MINING_SAMPLE_PER_CLUSTER = 1000
+
+# 聚类可视化的二维投影：按簇分层抽样到 TEXT_MINING_PROJECTION_BUDGET 个点，TruncatedSVD 降到
+# TEXT_MINING_PROJECTION_SVD_COMPONENTS 维后投影。TEXT_MINING_PROJECTION 可选 'tsne'（Barnes-Hut）、
+# 'tsne_fft'（需要安装 openTSNE）或 'pca'（最快）；TEXT_MINING_TSNE_ITERATIONS 为 t-SNE 迭代次数
+TEXT_MINING_PROJECTION = 'tsne'
+TEXT_MINING_PROJECTION_BUDGET = 5000
+TEXT_MINING_PROJECTION_SVD_COMPONENTS = 50
+TEXT_MINING_TSNE_ITERATIONS = 300
+# 投影散点图的尺寸（宽, 高，英寸）与分辨率，默认输出约 1200x800 像素的PNG
+TEXT_MINING_PROJECTION_FIGSIZE = (12, 8)
+TEXT_MINING_PROJECTION_DPI = 100
+
+# 词云由词频直接渲染为 TEXT_MINING_WORDCLOUD_SIZE（宽, 高）像素的图片，格式 'png' 或 'webp'（体积更小）；
+# 多张词云由最多 TEXT_MINING_WORDCLOUD_WORKERS 个进程并行渲染（不超过词云数，1 为在当前进程中逐张渲染）。
+# TEXT_MINING_WORDCLOUD_FONT 为中文字体路径，None 时按系统查找常见字体
+TEXT_MINING_WORDCLOUD_SIZE = (800, 600)
+TEXT_MINING_WORDCLOUD_FORMAT = 'png'
+TEXT_MINING_WORDCLOUD_WORKERS = 4
+TEXT_MINING_WORDCLOUD_FONT = None
+
+# Web worker 启动后预加载搜索索引与OCR引擎的方式：'background' 在后台线程中加载（worker 立即接受请求），
+# 'sync' 加载完成后才接受请求，None 不预加载（首次使用时加载）。启动耗时见 python manage.py startup_benchmark
+STARTUP_PRELOAD = 'background'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
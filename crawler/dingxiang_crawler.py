@@ -5,19 +5,22 @@ import json
 import re
 from bs4 import BeautifulSoup
 from fake_useragent import UserAgent
-import pandas as pd
 from datetime import datetime
 import os
 import sys
 
-# 添加Django环境
-sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+# 直接作为脚本运行时初始化Django环境（作为模块导入时由调用方负责，导入本模块不再触发 django.setup()）
+if __name__ == '__main__':
+    sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-import django
-django.setup()
+    import django
+    django.setup()
 
-from qa_system.models import QAData, CrawlerLog
+from django.conf import settings
+from django.db import connection, transaction
+
+from qa_system.models import QAData, QADataChangeLog, CrawlerLog, question_hash
 
 class DingXiangCrawler:
     def __init__(self):
@@ -225,31 +228,109 @@ class DingXiangCrawler:
         
         return sample_data
     
-    def save_to_database(self, qa_data_list):
-        """保存数据到数据库"""
+    def save_to_database(self, qa_data_list, batch_size=None, deduplicate=True, crawler_log=None,
+                         progress_callback=None):
+        """批量保存数据到数据库
+
+        每批在一个事务内 bulk_create，按归一化问题哈希去重（批内重复与库中已有的问题都会跳过）；
+        传入 crawler_log 时每批写入一次入库数量与吞吐量；progress_callback(已处理条数, 总条数) 每批调用一次。
+        """
+        batch_size = batch_size or getattr(settings, 'CRAWLER_BATCH_SIZE', 500)
         print(f"正在保存 {len(qa_data_list)} 条数据到数据库...")
         
         success_count = 0
-        for qa_data in qa_data_list:
+        duplicate_count = 0
+        for batch_no, start in enumerate(range(0, len(qa_data_list), batch_size), 1):
+            batch = qa_data_list[start:start + batch_size]
+            batch_start = time.time()
+            
             try:
-                qa_obj = QAData(
-                    question=qa_data['question'],
-                    answer=qa_data['answer'],
-                    source=qa_data['source'],
-                    category=qa_data.get('category', ''),
-                )
-                qa_obj.save()
-                success_count += 1
-                
+                inserted, duplicates = self._save_batch(batch, deduplicate)
             except Exception as e:
-                print(f"保存数据失败: {e}")
+                print(f"保存第 {batch_no} 批数据失败: {e}")
+                if crawler_log is not None:
+                    crawler_log.error_log += f"第 {batch_no} 批保存失败: {e}\n"
                 continue
-                
-        print(f"成功保存 {success_count} 条数据")
+            
+            success_count += inserted
+            duplicate_count += duplicates
+            elapsed = time.time() - batch_start
+            rate = len(batch) / elapsed if elapsed > 0 else 0.0
+            print(f"第 {batch_no} 批：新增 {inserted} 条，重复 {duplicates} 条，{rate:.0f} 条/秒")
+            
+            if crawler_log is not None:
+                crawler_log.success_count = success_count
+                crawler_log.duplicate_count = duplicate_count
+                crawler_log.add_batch_stat({
+                    'batch': batch_no,
+                    'size': len(batch),
+                    'inserted': inserted,
+                    'duplicates': duplicates,
+                    'seconds': round(elapsed, 4),
+                    'rows_per_second': round(rate, 1),
+                })
+                crawler_log.save(update_fields=['success_count', 'duplicate_count', 'batch_stats', 'error_log'])
+            
+            if progress_callback is not None:
+                progress_callback(start + len(batch), len(qa_data_list))
+        
+        print(f"成功保存 {success_count} 条数据，跳过重复 {duplicate_count} 条")
         return success_count
     
-    def crawl_qa_data(self, target_count=1000):
-        """爬取问答数据主函数"""
+    def _save_batch(self, batch, deduplicate):
+        """在一个事务内保存一批数据，返回 (新增数量, 重复数量)"""
+        qa_objects = {}
+        duplicates = 0
+        for qa_data in batch:
+            qa_hash = question_hash(qa_data['question'])
+            if deduplicate and qa_hash in qa_objects:
+                duplicates += 1
+                continue
+            qa_objects.setdefault(qa_hash, []).append(QAData(
+                question=qa_data['question'],
+                answer=qa_data['answer'],
+                source=qa_data['source'],
+                category=qa_data.get('category', ''),
+                question_hash=qa_hash,
+            ))
+        
+        with transaction.atomic():
+            if deduplicate:
+                hashes = list(qa_objects)
+                for i in range(0, len(hashes), 500):
+                    existing = QAData.objects.filter(
+                        question_hash__in=hashes[i:i + 500]
+                    ).values_list('question_hash', flat=True)
+                    for qa_hash in set(existing):
+                        duplicates += len(qa_objects.pop(qa_hash))
+            
+            new_objects = [qa for objects in qa_objects.values() for qa in objects]
+            if not new_objects:
+                return 0, duplicates
+            
+            # bulk_create 不触发 post_save 信号，需要自己记录数据变更（只记录本批插入的行）
+            if connection.features.can_return_rows_from_bulk_insert:
+                QAData.objects.bulk_create(new_objects, batch_size=500)
+                inserted_ids = [qa.id for qa in new_objects]
+            else:
+                # 数据库不回填主键（如SQLite）时按本批问题哈希取回；不去重时排除插入前已有的同哈希行
+                hashes = list(qa_objects)
+                existing_ids = set() if deduplicate else self._ids_with_hashes(hashes)
+                QAData.objects.bulk_create(new_objects, batch_size=500)
+                inserted_ids = sorted(self._ids_with_hashes(hashes) - existing_ids)
+            QADataChangeLog.record(inserted_ids)
+        
+        return len(new_objects), duplicates
+    
+    @staticmethod
+    def _ids_with_hashes(hashes):
+        ids = set()
+        for i in range(0, len(hashes), 500):
+            ids.update(QAData.objects.filter(question_hash__in=hashes[i:i + 500]).values_list('id', flat=True))
+        return ids
+    
+    def crawl_qa_data(self, target_count=1000, progress_callback=None):
+        """爬取问答数据主函数（progress_callback 见 save_to_database）"""
         print(f"开始爬取丁香医生问答数据，目标数量: {target_count}")
         
         # 创建爬虫日志
@@ -262,8 +343,10 @@ class DingXiangCrawler:
             # 由于实际爬取可能有反爬限制，这里使用生成示例数据的方式
             qa_data_list = self.generate_sample_data(target_count)
             
-            # 保存到数据库
-            success_count = self.save_to_database(qa_data_list)
+            # 保存到数据库（批量入库，每批吞吐量写入爬虫日志）
+            success_count = self.save_to_database(
+                qa_data_list, crawler_log=crawler_log, progress_callback=progress_callback
+            )
             
             # 更新爬虫日志
             crawler_log.status = 'completed'
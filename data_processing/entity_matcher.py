@@ -0,0 +1,146 @@
+"""
+医学实体识别
+
+问答、文档分析与图像识别共用医学词库（见 medical_lexicon）中带类别的词条，编译为 Aho-Corasick 自动机：
+对文本只扫描一遍即可找出所有词条的出现位置，耗时只与文本长度（和命中数）有关，与词库大小无关，
+词库扩充到十万级药名、病名也不会拖慢单篇文档的识别。英文字母不区分大小写（ct 与 CT 视为同一词条）。
+"""
+from collections import deque
+
+
+def load_lexicon(path):
+    """读取词库文件，返回 [(词条, 类别), ...]，只用于分词的词条类别为空字符串
+
+    文件每行 “词条<TAB>类别”，# 开头的行与空行忽略。
+    """
+    entries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            parts = line.split('\t')
+            term = parts[0].strip()
+            category = parts[1].strip() if len(parts) > 1 else ''
+            if term:
+                entries.append((term, category))
+    return entries
+
+
+class AhoCorasick:
+    """Aho-Corasick 多模式匹配自动机
+
+    words: [(词条, 附带值), ...]；iter(text) 一次扫描返回所有出现 (起始位置, 结束位置, 附带值)，
+    匹配前逐字符转小写（不改变位置）。
+    """
+
+    def __init__(self, words):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+
+        for word, value in words:
+            state = 0
+            for char in word.lower():
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                state = next_state
+            self._output[state].append((len(word), value))
+
+        self._build_fail_links()
+
+    def _build_fail_links(self):
+        """按层遍历建立失败指针，并把失败链上的输出合并到每个状态"""
+        # 第一层状态的失败指针指向根
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def __len__(self):
+        return len(self._goto)
+
+    def iter(self, text):
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        state = 0
+        for end, char in enumerate(text, 1):
+            char = char.lower()
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, value in output[state]:
+                yield end - length, end, value
+
+
+class EntityMatcher:
+    """基于词库的医学实体识别器"""
+
+    def __init__(self, entries):
+        # 同一词条可以属于多个类别；类别按在词库中首次出现的顺序排列
+        self.categories = []
+        terms = {}
+        for term, category in entries:
+            if not category:
+                continue
+            if category not in self.categories:
+                self.categories.append(category)
+            term_categories = terms.setdefault(term.lower(), (term, []))[1]
+            if category not in term_categories:
+                term_categories.append(category)
+
+        self.term_count = len(terms)
+        self._automaton = AhoCorasick(
+            (key, (term, tuple(categories))) for key, (term, categories) in terms.items()
+        )
+
+    def find(self, text, longest=False):
+        """返回文本中的实体位置 [{'start', 'end', 'text', 'category'}, ...]，按起始位置排序
+
+        longest: 为True时只保留互不重叠的最长匹配（如“偏头痛”中不再单独返回“头痛”）
+        """
+        if not text:
+            return []
+
+        matches = sorted(self._automaton.iter(text), key=lambda match: (match[0], -match[1]))
+        if longest:
+            selected = []
+            covered_until = 0
+            for start, end, value in matches:
+                if start >= covered_until:
+                    selected.append((start, end, value))
+                    covered_until = end
+            matches = selected
+
+        spans = []
+        for start, end, (term, categories) in matches:
+            for category in categories:
+                spans.append({'start': start, 'end': end, 'text': term, 'category': category})
+        return spans
+
+    def extract(self, text):
+        """按类别汇总文本中出现的实体 {类别: [词条, ...]}，类别按词库顺序，词条按首次出现的顺序去重"""
+        found = {}
+        for span in self.find(text):
+            entities = found.setdefault(span['category'], [])
+            if span['text'] not in entities:
+                entities.append(span['text'])
+        return {category: found[category] for category in self.categories if category in found}
+
+
+def get_entity_matcher():
+    """获取当前医学词库的实体识别器（随词库热更新）"""
+    from data_processing.medical_lexicon import get_lexicon
+    return get_lexicon().matcher
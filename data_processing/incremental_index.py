@@ -0,0 +1,247 @@
+"""
+增量索引维护
+
+基础索引（磁盘上的一代，词表冻结）之上叠加若干内存中的增量段：
+    - 变更来源是 QADataChangeLog，每次只读取索引数据版本号之后的记录，开销与变更条数成正比
+    - 新增或修改的问答行用基础索引的词表/idf向量化（BM25沿用基础索引的统计量），追加为一个增量段
+    - 被修改或删除的问答在旧段中的行记入 deleted_rows（删除标记），检索时过滤
+    - 增量段累积到一定规模后由后台线程合并（compact_index），再发布为磁盘上的新一代
+所有操作都返回新的 index_info 字典而不修改原对象，正在使用旧对象的请求不受影响。
+"""
+import numpy as np
+from scipy.sparse import vstack
+
+from qa_system.models import QAData, QADataChangeLog
+from data_processing.search_index import get_data_version
+from data_processing.retrieval import top_k_similar, top_k_similar_batch, get_postings_matrix
+from data_processing.inverted_index import BM25InvertedIndex
+from data_processing.result_hydrator import PayloadStore, SegmentedPayloadStore, PAYLOAD_FIELDS, fetch_payloads
+
+# 单次 id__in 查询的ID数量（SQLite默认限制999个参数）
+CHANGE_BATCH_SIZE = 500
+
+
+def iter_segments(index_info):
+    """按顺序返回基础索引与全部增量段"""
+    return [index_info] + list(index_info.get('deltas', []))
+
+
+def get_payload_store(index_info):
+    """返回覆盖全部段的载荷存储，任一段缺少载荷时返回None（退回数据库装配）"""
+    stores = [segment.get('payload_store') for segment in iter_segments(index_info)]
+    if any(store is None for store in stores):
+        return None
+    return stores[0] if len(stores) == 1 else SegmentedPayloadStore(stores)
+
+
+def _find_rows(document_ids, qa_ids):
+    """在升序的 document_ids 中查找 qa_ids 所在的行号"""
+    if len(document_ids) == 0 or len(qa_ids) == 0:
+        return np.zeros(0, dtype=np.int64)
+    positions = np.searchsorted(document_ids, qa_ids)
+    in_range = positions < len(document_ids)
+    positions, qa_ids = positions[in_range], qa_ids[in_range]
+    return positions[np.asarray(document_ids)[positions] == qa_ids]
+
+
+def _build_delta_segment(index_info, qa_ids):
+    """把指定问答行（已处理的）向量化为一个增量段，没有可索引的行时返回None"""
+    documents = []
+    document_ids = []
+    payloads = []
+
+    for start in range(0, len(qa_ids), CHANGE_BATCH_SIZE):
+        batch = qa_ids[start:start + CHANGE_BATCH_SIZE]
+        qa_objects = QAData.objects.filter(id__in=batch).exclude(processed_question='').order_by('id')
+        for qa in qa_objects:
+            documents.append(qa.processed_question + ' ' + qa.processed_answer)
+            document_ids.append(qa.id)
+            payloads.append({field: getattr(qa, field) for field in PAYLOAD_FIELDS})
+
+    if not documents:
+        return None
+
+    segment = {
+        'document_ids': np.array(document_ids, dtype=np.int64),
+        'payload_store': PayloadStore.from_records(payloads),
+        'deleted_rows': np.zeros(0, dtype=np.int64),
+    }
+
+    if index_info.get('backend') == 'bm25':
+        segment['inverted_index'] = BM25InvertedIndex.build(
+            [doc.split() for doc in documents], frozen=index_info['inverted_index']
+        )
+    else:
+        # 冻结词表：沿用基础索引的vectorizer，新词在合并/重建之前不参与检索
+        tfidf_matrix = index_info['vectorizer'].transform(documents)
+        segment['tfidf_matrix'] = tfidf_matrix
+        segment['tfidf_matrix_t'] = tfidf_matrix.T.tocsr()
+
+    return segment
+
+
+def apply_index_updates(index_info, data_version=None):
+    """把 index_info 数据版本号之后的 QAData 变更应用到索引上，返回新的 index_info"""
+    if not index_info:
+        return index_info
+
+    data_version = get_data_version() if data_version is None else data_version
+    if data_version <= index_info['data_version']:
+        return index_info
+
+    changed_ids = np.unique(np.fromiter(
+        QADataChangeLog.objects.filter(
+            id__gt=index_info['data_version'], id__lte=data_version
+        ).values_list('qa_id', flat=True),
+        dtype=np.int64,
+    ))
+
+    # 旧段中对应的行全部打上删除标记，仍然存在的行重新追加到新的增量段
+    segments = []
+    for segment in iter_segments(index_info):
+        rows = _find_rows(segment['document_ids'], changed_ids)
+        segment = {key: value for key, value in segment.items() if key != 'deltas'}
+        if len(rows) > 0:
+            segment['deleted_rows'] = np.union1d(segment.get('deleted_rows', np.zeros(0, dtype=np.int64)), rows)
+        segments.append(segment)
+
+    delta = _build_delta_segment(index_info, changed_ids.tolist())
+    if delta is not None:
+        segments.append(delta)
+
+    new_index = segments[0]
+    new_index['deltas'] = segments[1:]
+    new_index['data_version'] = data_version
+
+    print(f"索引增量更新：{len(changed_ids)} 条变更，数据版本 {index_info['data_version']} -> {data_version}")
+    return new_index
+
+
+def search_segments(index_info, query_words, top_k=5, threshold=0.0):
+    """在基础索引与全部增量段中检索，返回按得分降序的 [(全局行号, QAData.id, 相似度)]"""
+    backend = index_info.get('backend', 'tfidf')
+    if backend != 'bm25':
+        query_vector = index_info['vectorizer'].transform([' '.join(query_words)])
+
+    hits = []
+    offset = 0
+    for segment in iter_segments(index_info):
+        deleted_rows = segment.get('deleted_rows')
+        n_deleted = len(deleted_rows) if deleted_rows is not None else 0
+        # 多取 n_deleted 个，过滤删除标记后仍能凑满 top_k
+        k = top_k + n_deleted
+
+        if backend == 'bm25':
+            rows, scores = segment['inverted_index'].search(
+                query_words, top_k=k, threshold=threshold,
+                norm_bounds=index_info['inverted_index'].term_max_score
+            )
+        else:
+            rows, scores = top_k_similar(query_vector, get_postings_matrix(segment), top_k=k, threshold=threshold)
+
+        if n_deleted:
+            keep = ~np.isin(rows, deleted_rows)
+            rows, scores = rows[keep], scores[keep]
+
+        document_ids = segment['document_ids']
+        hits.extend((offset + int(row), int(document_ids[row]), float(score)) for row, score in zip(rows, scores))
+        offset += len(document_ids)
+
+    hits.sort(key=lambda hit: (-hit[2], hit[0]))
+    return hits[:top_k]
+
+
+def search_segments_batch(index_info, query_words_list, top_k=5, threshold=0.0, block_size=512):
+    """批量检索，返回与查询一一对应的命中列表（格式同 search_segments）
+
+    TF-IDF：全部查询一次向量化，每个段做一次分块的稀疏矩阵乘法；
+    BM25：倒排索引按查询逐个执行MaxScore检索。
+    """
+    if index_info.get('backend') == 'bm25':
+        return [search_segments(index_info, query_words, top_k, threshold) for query_words in query_words_list]
+
+    query_matrix = index_info['vectorizer'].transform([' '.join(words) for words in query_words_list])
+
+    batch_hits = [[] for _ in query_words_list]
+    offset = 0
+    for segment in iter_segments(index_info):
+        deleted_rows = segment.get('deleted_rows')
+        n_deleted = len(deleted_rows) if deleted_rows is not None else 0
+        document_ids = segment['document_ids']
+
+        segment_results = top_k_similar_batch(
+            query_matrix, get_postings_matrix(segment),
+            top_k=top_k + n_deleted, threshold=threshold, block_size=block_size
+        )
+        for hits, (rows, scores) in zip(batch_hits, segment_results):
+            if n_deleted:
+                keep = ~np.isin(rows, deleted_rows)
+                rows, scores = rows[keep], scores[keep]
+            hits.extend((offset + int(row), int(document_ids[row]), float(score)) for row, score in zip(rows, scores))
+        offset += len(document_ids)
+
+    for hits in batch_hits:
+        hits.sort(key=lambda hit: (-hit[2], hit[0]))
+        del hits[top_k:]
+    return batch_hits
+
+
+def needs_compaction(index_info, merge_ratio=0.1, max_segments=8, min_changes=1000):
+    """增量段与删除标记累积到基础索引的一定比例（或段数过多）时需要合并"""
+    if not index_info:
+        return False
+
+    deltas = index_info.get('deltas', [])
+    pending = sum(len(segment['document_ids']) + len(segment.get('deleted_rows', [])) for segment in deltas)
+    pending += len(index_info.get('deleted_rows', []))
+    if pending == 0:
+        return False
+    threshold = max(min_changes, merge_ratio * len(index_info['document_ids']))
+    return pending >= threshold or len(deltas) >= max_segments
+
+
+def compact_index(index_info, text_processor=None):
+    """把增量段合并进基础索引，返回不含增量段的新 index_info
+
+    TF-IDF：按冻结词表直接拼接各段未删除的行，不重新拟合；
+    BM25：idf/avgdl需要重新统计，直接从已分词的数据重建。
+    没有载荷存储的段（如旧版本生成的基础索引）从数据库补齐载荷，合并后的索引仍可直接装配结果。
+    """
+    if index_info.get('backend') == 'bm25':
+        if text_processor is None:
+            from data_processing.text_processor import TextProcessor
+            text_processor = TextProcessor()
+        # 重建读取的是最新数据，之后产生的变更交给下一次增量更新处理
+        return text_processor.build_index(backend='bm25')
+
+    matrices = []
+    document_ids = []
+    payloads = []
+    for segment in iter_segments(index_info):
+        n_rows = len(segment['document_ids'])
+        live = np.setdiff1d(np.arange(n_rows), segment.get('deleted_rows', np.zeros(0, dtype=np.int64)))
+        matrices.append(segment['tfidf_matrix'][live])
+        document_ids.append(np.asarray(segment['document_ids'])[live])
+        store = segment.get('payload_store')
+        if store is not None:
+            payloads.extend(store.get(int(row)) for row in live)
+        else:
+            records = fetch_payloads(document_ids[-1].tolist())
+            # 数据库中已删除的行载荷留空，下一次增量更新会给它打上删除标记
+            payloads.extend(records.get(int(qa_id), {field: '' for field in PAYLOAD_FIELDS})
+                            for qa_id in document_ids[-1])
+
+    document_ids = np.concatenate(document_ids)
+    order = np.argsort(document_ids, kind='stable')
+    tfidf_matrix = vstack(matrices).tocsr()[order]
+
+    print(f"索引合并完成：{len(index_info.get('deltas', []))} 个增量段并入基础索引，共 {len(document_ids)} 个文档")
+    return {
+        'backend': 'tfidf',
+        'vectorizer': index_info['vectorizer'],
+        'tfidf_matrix': tfidf_matrix,
+        'tfidf_matrix_t': tfidf_matrix.T.tocsr(),
+        'document_ids': document_ids[order],
+        'payload_store': PayloadStore.from_records([payloads[i] for i in order]),
+        'data_version': index_info['data_version'],
+    }
@@ -0,0 +1,242 @@
+"""
+搜索索引管理器
+
+每个Web进程持有一个 SearchIndexManager，对外只暴露当前生效的索引快照：
+    - 快照是不可变的 index_info 字典，基础索引内存映射自磁盘上的某一代，多个worker共享同一份物理页，
+      进程内只额外保存增量段（规模由合并阈值限定），内存不随语料规模增长
+    - 增量更新、合并与全量重建都在后台线程中完成，完成后通过一次引用赋值切换快照；
+      读请求只读取引用，从不等待构建
+    - 新的一代写入磁盘后通过 CURRENT 指针原子发布，其他worker在下一次刷新时发现并切换过去
+    - 同一索引目录下的合并/重建由锁文件互斥，避免多个worker重复构建
+"""
+import os
+import threading
+import time
+
+from django.conf import settings
+
+from data_processing.search_index import (
+    load_index, save_index, clear_index, get_index_dir, read_current_generation,
+)
+from data_processing.incremental_index import apply_index_updates, needs_compaction, compact_index
+
+BUILD_LOCK_FILE = 'BUILD.lock'
+# 锁文件超过该时间（秒）视为持有者已崩溃
+BUILD_LOCK_TIMEOUT = 3600
+
+
+class SearchIndexManager:
+    """管理当前进程的搜索索引快照"""
+
+    def __init__(self, text_processor=None, index_dir=None, refresh_interval=None):
+        if text_processor is None:
+            from data_processing.text_processor import TextProcessor
+            text_processor = TextProcessor()
+        self.text_processor = text_processor
+        self.index_dir = index_dir
+        if refresh_interval is None:
+            refresh_interval = getattr(settings, 'SEARCH_INDEX_REFRESH_INTERVAL', 5)
+        self.refresh_interval = refresh_interval
+
+        self._index = None
+        self._checked_at = 0.0
+        # 后台任务互斥（同一时刻只有一个刷新/合并/重建任务），读请求不使用这把锁
+        self._task_lock = threading.Lock()
+        # 冷启动加载互斥：进程内还没有快照时，并发请求等待同一次加载，不重复映射与追赶变更
+        self._load_lock = threading.Lock()
+        # clear() 时递增，后台任务完成时若纪元已变化则丢弃结果
+        self._epoch = 0
+
+    @property
+    def ready(self):
+        return self._index is not None
+
+    def get(self):
+        """返回当前索引快照（可能为None），到期时在后台刷新，不阻塞调用方
+
+        进程内还没有快照时直接内存映射磁盘上的当前代（只读取元数据与映射文件，开销很小），
+        并发的首批请求只有一个执行加载，其余等待它完成后直接使用加载好的快照；
+        磁盘上也没有索引时在后台构建，本次返回None。
+        """
+        if self._index is None:
+            with self._load_lock:
+                if self._index is None:
+                    epoch = self._epoch
+                    index_info = self._load_current()
+                    if index_info is None:
+                        if time.time() - self._checked_at >= self.refresh_interval:
+                            self.rebuild()
+                        return None
+                    self._swap(index_info, epoch)
+
+        if time.time() - self._checked_at >= self.refresh_interval:
+            self.refresh()
+
+        return self._index
+
+    def load(self):
+        """同步加载索引（服务启动、管理命令使用）：优先映射磁盘上的当前代，没有时现场构建并发布"""
+        index_info = self._load_current()
+        if index_info is None:
+            index_info = self._build_and_publish()
+        if index_info is None:
+            return None
+
+        self._swap(index_info, self._epoch)
+        if needs_compaction(index_info):
+            self.refresh()
+        return index_info
+
+    def refresh(self, block=False):
+        """追上数据变更：切换到其他进程发布的新一代，应用增量更新，必要时合并
+
+        block=False 时在后台线程执行并立即返回是否启动了任务（已有任务在运行时返回False）。
+        """
+        return self._run_task(self._refresh, block)
+
+    def rebuild(self, block=False):
+        """全量重建索引并发布为新一代"""
+        return self._run_task(self._rebuild, block)
+
+    def clear(self):
+        """丢弃当前快照并撤销磁盘上的当前代（数据被清空时使用）"""
+        self._epoch += 1
+        self._index = None
+        clear_index(self.index_dir)
+
+    def status(self):
+        """返回索引状态，供健康检查与统计接口使用"""
+        index_info = self._index
+        if index_info is None:
+            return {'ready': False, 'building': self._task_lock.locked()}
+
+        deltas = index_info.get('deltas', [])
+        segments = [index_info] + deltas
+        return {
+            'ready': True,
+            'building': self._task_lock.locked(),
+            'backend': index_info.get('backend', 'tfidf'),
+            'generation': index_info.get('generation'),
+            'data_version': index_info['data_version'],
+            'documents': sum(len(s['document_ids']) - len(s.get('deleted_rows', [])) for s in segments),
+            'delta_segments': len(deltas),
+        }
+
+    def _swap(self, index_info, epoch):
+        """原子切换快照（一次引用赋值），clear() 之后完成的任务结果被丢弃"""
+        if epoch != self._epoch:
+            return False
+        self._index = index_info
+        self._checked_at = time.time()
+        return True
+
+    def _run_task(self, target, block):
+        if not self._task_lock.acquire(blocking=block):
+            return False
+
+        epoch = self._epoch
+
+        def run():
+            try:
+                target(epoch)
+            except Exception as e:
+                print(f"搜索索引后台任务失败: {e}")
+            finally:
+                self._task_lock.release()
+
+        # 无论任务成败，都推迟下一次检查，避免失败时每个请求都重新触发
+        self._checked_at = time.time()
+        if block:
+            run()
+        else:
+            threading.Thread(target=run, name='search-index-task', daemon=True).start()
+        return True
+
+    def _load_current(self):
+        """映射磁盘上的当前代并追上之后的数据变更"""
+        index_info = load_index(self.index_dir)
+        if index_info is None:
+            return None
+        return apply_index_updates(index_info)
+
+    def _refresh(self, epoch):
+        index_info = self._index
+        current = read_current_generation(self.index_dir)
+        if index_info is None or (current and current != index_info.get('generation')):
+            # 其他进程发布了新一代（或本进程尚未加载）：切换过去，旧代的增量段随之丢弃
+            index_info = self._load_current()
+            if index_info is None:
+                return
+        else:
+            index_info = apply_index_updates(index_info)
+        self._swap(index_info, epoch)
+
+        if needs_compaction(index_info):
+            with BuildLock(self.index_dir) as acquired:
+                if acquired:
+                    compacted = compact_index(index_info, self.text_processor)
+                    if compacted:
+                        self._swap(self._publish(compacted), epoch)
+
+    def _rebuild(self, epoch):
+        with BuildLock(self.index_dir) as acquired:
+            if not acquired:
+                # 其他进程正在构建，等它发布后由下一次刷新切换过去
+                return
+            index_info = self._build_and_publish()
+            if index_info is not None:
+                self._swap(index_info, epoch)
+
+    def _build_and_publish(self):
+        index_info = self.text_processor.build_index()
+        if not index_info:
+            return None
+        return self._publish(index_info)
+
+    def _publish(self, index_info):
+        """写入新一代并重新以内存映射方式加载，释放构建时占用的内存"""
+        generation = save_index(index_info, self.index_dir)
+        mapped = load_index(self.index_dir, generation=generation)
+        # 构建期间产生的变更重新增量应用
+        return apply_index_updates(mapped if mapped is not None else index_info)
+
+
+class BuildLock:
+    """基于锁文件的跨进程构建锁（非阻塞），用法：with BuildLock(dir) as acquired: ..."""
+
+    def __init__(self, index_dir=None):
+        root = get_index_dir(index_dir)
+        os.makedirs(root, exist_ok=True)
+        self.path = os.path.join(root, BUILD_LOCK_FILE)
+        self.acquired = False
+
+    def __enter__(self):
+        self.acquired = self._try_acquire()
+        return self.acquired
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if self.acquired:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+        return False
+
+    def _try_acquire(self):
+        try:
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                stale = time.time() - os.path.getmtime(self.path) > BUILD_LOCK_TIMEOUT
+            except FileNotFoundError:
+                stale = True
+            if not stale:
+                return False
+            try:
+                os.remove(self.path)
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except (FileNotFoundError, FileExistsError):
+                return False
+        with os.fdopen(fd, 'w') as f:
+            f.write(str(os.getpid()))
+        return True
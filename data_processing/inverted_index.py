@@ -0,0 +1,262 @@
+"""
+BM25倒排索引
+
+对 processed_question/processed_answer 中的jieba分词结果建立倒排表：
+    - 每个词的倒排表按 BLOCK_SIZE 分块，块内文档行号差分后用变长字节(varbyte)编码压缩，
+      并记录每块最后一个行号，查询时可以只解码包含候选文档的块
+    - 预先计算每个文档的BM25长度归一项 k1 * (1 - b + b * dl / avgdl)
+    - 预先计算每个词的得分上界，查询采用 MaxScore 策略提前终止：
+      当剩余词的上界之和已不足以让新文档进入前k名时，只为已有候选累加得分，
+      并跳过不含候选文档的倒排块
+"""
+import json
+import math
+import os
+from collections import Counter
+
+import numpy as np
+
+from data_processing.retrieval import select_top_k
+
+BLOCK_SIZE = 128
+
+
+def encode_varbyte(values):
+    """变长字节编码：每字节存7位，最后一个字节最高位置1"""
+    values = np.asarray(values, dtype=np.uint64)
+    if len(values) == 0:
+        return np.zeros(0, dtype=np.uint8)
+
+    n_bytes = np.ones(len(values), dtype=np.int64)
+    rest = values >> np.uint64(7)
+    while rest.any():
+        n_bytes += rest > 0
+        rest >>= np.uint64(7)
+
+    value_index = np.repeat(np.arange(len(values)), n_bytes)
+    starts = np.cumsum(n_bytes) - n_bytes
+    position = np.arange(int(n_bytes.sum())) - np.repeat(starts, n_bytes)
+
+    encoded = (values[value_index] >> (np.uint64(7) * position.astype(np.uint64))) & np.uint64(0x7f)
+    encoded[position == n_bytes[value_index] - 1] |= np.uint64(0x80)
+    return encoded.astype(np.uint8)
+
+
+def decode_varbyte(data):
+    """变长字节解码，encode_varbyte 的逆过程"""
+    data = np.asarray(data, dtype=np.uint8)
+    if len(data) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    is_last = (data & 0x80) != 0
+    ends = np.flatnonzero(is_last)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    position = np.arange(len(data)) - np.repeat(starts, ends - starts + 1)
+
+    shifted = (data & 0x7f).astype(np.uint64) << (np.uint64(7) * position.astype(np.uint64))
+    return np.add.reduceat(shifted, starts).astype(np.int64)
+
+
+class BM25InvertedIndex:
+    """压缩倒排表 + BM25打分 + MaxScore提前终止"""
+
+    ARRAY_FILES = (
+        'idf', 'term_max_score', 'term_blocks', 'block_last_row', 'block_byte_offsets',
+        'block_posting_offsets', 'posting_bytes', 'tfs', 'doc_norms',
+    )
+
+    def __init__(self, vocabulary, arrays, k1=1.2, b=0.75, avgdl=0.0):
+        self.vocabulary = vocabulary
+        self.k1 = k1
+        self.b = b
+        self.avgdl = avgdl
+        for name in self.ARRAY_FILES:
+            setattr(self, name, arrays[name])
+
+    @property
+    def n_documents(self):
+        return len(self.doc_norms)
+
+    @classmethod
+    def build(cls, tokenized_docs, k1=1.2, b=0.75, frozen=None):
+        """由分词后的文档列表构建索引，文档在列表中的位置即行号
+
+        frozen: 传入基础索引时沿用其词表、idf、avgdl 与 k1/b（用于增量段），
+                词表之外的词被忽略，得分与基础索引可以直接比较
+        """
+        if frozen is not None:
+            k1, b = frozen.k1, frozen.b
+
+        postings_by_term = {}
+        doc_lengths = np.zeros(len(tokenized_docs), dtype=np.float64)
+
+        for row, tokens in enumerate(tokenized_docs):
+            doc_lengths[row] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                if frozen is None or term in frozen.vocabulary:
+                    postings_by_term.setdefault(term, []).append((row, tf))
+
+        n_docs = len(tokenized_docs)
+        if frozen is not None:
+            avgdl = frozen.avgdl
+            vocabulary = frozen.vocabulary
+        else:
+            avgdl = float(doc_lengths.mean()) if n_docs else 0.0
+            vocabulary = {term: term_id for term_id, term in enumerate(sorted(postings_by_term))}
+        doc_norms = k1 * (1 - b + b * doc_lengths / avgdl) if avgdl > 0 else np.full(n_docs, k1)
+        doc_norms = doc_norms.astype(np.float32)
+
+        idf = np.array(frozen.idf, dtype=np.float32) if frozen is not None else np.zeros(len(vocabulary), dtype=np.float32)
+        term_max_score = np.zeros(len(vocabulary), dtype=np.float32)
+        term_blocks = [0]
+        block_last_row = []
+        block_byte_offsets = [0]
+        block_posting_offsets = [0]
+        byte_chunks = []
+        tf_chunks = []
+
+        for term_id, term in enumerate(sorted(vocabulary, key=vocabulary.get)):
+            entries = postings_by_term.get(term)
+            if not entries:
+                # 冻结词表中本段没有出现的词：空倒排表
+                term_blocks.append(len(block_last_row))
+                continue
+
+            rows = np.array([row for row, _ in entries], dtype=np.int64)
+            tfs = np.array([tf for _, tf in entries], dtype=np.float64)
+
+            df = len(rows)
+            if frozen is None:
+                idf[term_id] = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            term_max_score[term_id] = idf[term_id] * float(np.max(tfs * (k1 + 1) / (tfs + doc_norms[rows])))
+
+            for start in range(0, df, BLOCK_SIZE):
+                block_rows = rows[start:start + BLOCK_SIZE]
+                base = rows[start - 1] if start > 0 else -1
+                encoded = encode_varbyte(np.diff(block_rows, prepend=base))
+                byte_chunks.append(encoded)
+                block_last_row.append(int(block_rows[-1]))
+                block_byte_offsets.append(block_byte_offsets[-1] + len(encoded))
+                block_posting_offsets.append(block_posting_offsets[-1] + len(block_rows))
+
+            tf_chunks.append(np.minimum(tfs, np.iinfo(np.uint16).max).astype(np.uint16))
+            term_blocks.append(len(block_last_row))
+
+        arrays = {
+            'idf': idf,
+            'term_max_score': term_max_score,
+            'term_blocks': np.array(term_blocks, dtype=np.int64),
+            'block_last_row': np.array(block_last_row, dtype=np.int64),
+            'block_byte_offsets': np.array(block_byte_offsets, dtype=np.int64),
+            'block_posting_offsets': np.array(block_posting_offsets, dtype=np.int64),
+            'posting_bytes': np.concatenate(byte_chunks) if byte_chunks else np.zeros(0, dtype=np.uint8),
+            'tfs': np.concatenate(tf_chunks) if tf_chunks else np.zeros(0, dtype=np.uint16),
+            'doc_norms': doc_norms,
+        }
+        return cls(vocabulary, arrays, k1=k1, b=b, avgdl=avgdl)
+
+    def save(self, directory):
+        """写入 bm25_*.npy 与 bm25_meta.json"""
+        for name in self.ARRAY_FILES:
+            np.save(os.path.join(directory, f'bm25_{name}.npy'), getattr(self, name))
+        with open(os.path.join(directory, 'bm25_meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({'k1': self.k1, 'b': self.b, 'avgdl': self.avgdl, 'vocabulary': self.vocabulary},
+                      f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, directory):
+        """以内存映射方式加载索引"""
+        with open(os.path.join(directory, 'bm25_meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(directory, f'bm25_{name}.npy'), mmap_mode='r')
+            for name in cls.ARRAY_FILES
+        }
+        return cls(meta['vocabulary'], arrays, k1=meta['k1'], b=meta['b'], avgdl=meta['avgdl'])
+
+    def _decode_blocks(self, blocks, first_block):
+        """解码某个词的指定倒排块，返回 (rows, tfs)；first_block 为该词的第一个块"""
+        rows_parts = []
+        tf_parts = []
+        for block in blocks:
+            start, end = self.block_byte_offsets[block], self.block_byte_offsets[block + 1]
+            deltas = decode_varbyte(self.posting_bytes[start:end])
+            # 块内第一个差分相对于上一块的最后一个行号，词的第一个块相对于 -1
+            base = self.block_last_row[block - 1] if block > first_block else -1
+            rows_parts.append(np.cumsum(deltas) + base)
+            tf_parts.append(self.tfs[self.block_posting_offsets[block]:self.block_posting_offsets[block + 1]])
+        if not rows_parts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+        return np.concatenate(rows_parts), np.concatenate(tf_parts).astype(np.float64)
+
+    def postings(self, term):
+        """返回某个词完整的倒排表 (rows, tfs)"""
+        term_id = self.vocabulary.get(term)
+        if term_id is None:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+        first_block = self.term_blocks[term_id]
+        return self._decode_blocks(range(first_block, self.term_blocks[term_id + 1]), first_block)
+
+    def search(self, tokens, top_k=5, threshold=0.0, norm_bounds=None):
+        """BM25检索，返回按得分降序的 (rows, similarities)
+
+        BM25原始得分没有固定上限，这里除以查询词得分上界之和，
+        使返回的相似度落在[0, 1]，可以与TF-IDF余弦相似度共用同一套阈值。
+        norm_bounds: 用于归一化的词得分上界（增量段传入基础索引的上界，使各段得分可比）
+        """
+        query_terms = Counter(token for token in tokens if token in self.vocabulary)
+        if not query_terms or top_k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+
+        # 按得分上界从高到低处理：高贡献的词先建立候选集和门槛
+        terms = sorted(query_terms, key=lambda t: -self.term_max_score[self.vocabulary[t]] * query_terms[t])
+        upper_bounds = np.array([self.term_max_score[self.vocabulary[t]] * query_terms[t] for t in terms])
+        remaining_bounds = np.concatenate((np.cumsum(upper_bounds[::-1])[::-1], [0.0]))
+        if norm_bounds is None:
+            norm_bounds = self.term_max_score
+        total_bound = float(sum(norm_bounds[self.vocabulary[t]] * n for t, n in query_terms.items()))
+        if total_bound <= 0 or remaining_bounds[0] <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+
+        min_score = threshold * total_bound
+        cand_rows = np.zeros(0, dtype=np.int64)
+        cand_scores = np.zeros(0)
+
+        for i, term in enumerate(terms):
+            term_id = self.vocabulary[term]
+            first_block, last_block = self.term_blocks[term_id], self.term_blocks[term_id + 1]
+
+            # 当前进入前k名所需的最低得分
+            theta = min_score
+            if len(cand_scores) >= top_k:
+                theta = max(theta, np.partition(cand_scores, len(cand_scores) - top_k)[len(cand_scores) - top_k])
+
+            if i > 0 and remaining_bounds[i] <= theta:
+                # MaxScore：剩余词不可能把新文档推入前k名，只为已有候选累加得分
+                if len(cand_rows) == 0:
+                    break
+                block_last = self.block_last_row[first_block:last_block]
+                blocks = np.unique(np.searchsorted(block_last, cand_rows))
+                blocks = blocks[blocks < len(block_last)] + first_block
+                rows, tfs = self._decode_blocks(blocks, first_block)
+                positions = np.searchsorted(cand_rows, rows)
+                positions[positions >= len(cand_rows)] = 0
+                matched = cand_rows[positions] == rows
+                rows, tfs, positions = rows[matched], tfs[matched], positions[matched]
+                cand_scores[positions] += query_terms[term] * self.idf[term_id] * tfs * (self.k1 + 1) / (
+                    tfs + self.doc_norms[rows])
+            else:
+                rows, tfs = self._decode_blocks(range(first_block, last_block), first_block)
+                scores = query_terms[term] * self.idf[term_id] * tfs * (self.k1 + 1) / (tfs + self.doc_norms[rows])
+                merged_rows, inverse = np.unique(np.concatenate((cand_rows, rows)), return_inverse=True)
+                cand_scores = np.bincount(inverse, weights=np.concatenate((cand_scores, scores)),
+                                          minlength=len(merged_rows))
+                cand_rows = merged_rows
+
+            # 剪枝：即使拿满剩余词的上界也进不了前k名的候选直接丢弃
+            if len(cand_scores) > top_k:
+                theta = max(min_score, np.partition(cand_scores, len(cand_scores) - top_k)[len(cand_scores) - top_k])
+                keep = cand_scores + remaining_bounds[i + 1] >= theta
+                cand_rows, cand_scores = cand_rows[keep], cand_scores[keep]
+
+        return select_top_k(cand_rows, cand_scores / total_bound, top_k, threshold)
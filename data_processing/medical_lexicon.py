@@ -0,0 +1,205 @@
+"""
+医学词库（分词词典、停用词与实体类别）
+
+词库以数据文件维护（默认 data_processing/lexicon/，可由 settings.MEDICAL_LEXICON_DIR 指定其他目录）：
+    - medical_lexicon.txt     医学词条与实体类别（见 entity_matcher.load_lexicon）
+    - stopwords.txt           中文停用词
+    - medical_stopwords.txt   医疗相关停用词
+三个文件编译为一个词库对象：jieba 前缀词典（默认词典 + 全部医学词条）、停用词集合与实体识别自动机，
+并整体缓存为二进制文件（settings.LEXICON_CACHE_PATH），缓存以源文件内容哈希校验。
+每个进程只加载一次：源文件未变化时直接读取缓存，不再逐个 add_word；之后创建 TextProcessor 几乎没有开销。
+
+热更新：修改数据文件后调用 POST /system/lexicon/reload/（或 reload_lexicon()），新词库编译完成后整体切换；
+settings.LEXICON_RELOAD_INTERVAL 不为None时，各进程每隔该秒数检查一次源文件，有变化时在后台重新加载。
+"""
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+
+import jieba
+from django.conf import settings
+
+from data_processing.entity_matcher import EntityMatcher, load_lexicon
+
+# 缓存文件格式版本，结构变化时递增，使旧缓存失效
+CACHE_FORMAT = 1
+
+LEXICON_FILES = {
+    'lexicon': 'medical_lexicon.txt',
+    'stopwords': 'stopwords.txt',
+    'medical_stopwords': 'medical_stopwords.txt',
+}
+
+
+def get_lexicon_dir():
+    default_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lexicon')
+    return str(getattr(settings, 'MEDICAL_LEXICON_DIR', None) or default_dir)
+
+
+def get_source_paths():
+    lexicon_dir = get_lexicon_dir()
+    return {name: os.path.join(lexicon_dir, file_name) for name, file_name in LEXICON_FILES.items()}
+
+
+def get_cache_path():
+    return str(getattr(settings, 'LEXICON_CACHE_PATH', None) or os.path.join(get_lexicon_dir(), 'lexicon.cache'))
+
+
+def source_signature(paths):
+    """源文件内容与jieba版本的哈希，任一变化时缓存失效"""
+    digest = hashlib.sha1(json.dumps([CACHE_FORMAT, jieba.__version__]).encode('utf-8'))
+    for name in sorted(paths):
+        digest.update(name.encode('utf-8'))
+        with open(paths[name], 'rb') as f:
+            digest.update(hashlib.sha1(f.read()).digest())
+    return digest.hexdigest()
+
+
+def _load_words(path):
+    """读取每行一个词的文件，忽略 # 开头的行与空行"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return frozenset(line.strip() for line in f if line.strip() and not line.startswith('#'))
+
+
+class Lexicon:
+    """编译好的词库"""
+
+    def __init__(self, entries, stop_words, medical_stop_words, freq, total, signature):
+        self.entries = entries
+        self.medical_stop_words = medical_stop_words
+        self.stop_words = stop_words | medical_stop_words
+        self.matcher = EntityMatcher(entries)
+        # jieba 前缀词典（Tokenizer.FREQ / Tokenizer.total）
+        self.freq = freq
+        self.total = total
+        self.signature = signature
+
+        self.source = 'compiled'
+        self.load_seconds = 0.0
+        self.loaded_at = None
+
+    def install(self):
+        """把分词词典装入jieba默认分词器（jieba.cut 与 jieba.analyse 共用），整体替换"""
+        tokenizer = jieba.dt
+        with tokenizer.lock:
+            tokenizer.FREQ, tokenizer.total = self.freq, self.total
+            tokenizer.initialized = True
+
+    def status(self):
+        return {
+            'signature': self.signature,
+            'source': self.source,
+            'load_seconds': round(self.load_seconds, 3),
+            'loaded_at': self.loaded_at,
+            'terms': len(self.entries),
+            'entity_terms': self.matcher.term_count,
+            'categories': self.matcher.categories,
+            'stop_words': len(self.stop_words),
+        }
+
+
+def compile_lexicon(paths, signature):
+    """由源文件编译词库：在jieba默认词典上逐个加入医学词条（词频由jieba推算，保证能被切分出来）"""
+    entries = load_lexicon(paths['lexicon'])
+
+    tokenizer = jieba.Tokenizer()
+    tokenizer.initialize()
+    for term, _ in entries:
+        tokenizer.add_word(term)
+
+    return Lexicon(
+        entries,
+        _load_words(paths['stopwords']),
+        _load_words(paths['medical_stopwords']),
+        tokenizer.FREQ,
+        tokenizer.total,
+        signature,
+    )
+
+
+def load_cached_lexicon(cache_path, signature):
+    """读取签名一致的缓存，没有或已过期时返回None"""
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        with open(cache_path, 'rb') as f:
+            cached = pickle.load(f)
+    except Exception as e:
+        print(f"读取词库缓存失败: {e}")
+        return None
+    if cached.get('format') != CACHE_FORMAT or cached.get('signature') != signature:
+        return None
+    return cached['lexicon']
+
+
+def save_lexicon_cache(lexicon, cache_path):
+    """写入缓存（先写临时文件再原子替换，其他进程不会读到写了一半的文件）"""
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+        with open(temp_path, 'wb') as f:
+            pickle.dump(
+                {'format': CACHE_FORMAT, 'signature': lexicon.signature, 'lexicon': lexicon},
+                f, protocol=pickle.HIGHEST_PROTOCOL
+            )
+        os.replace(temp_path, cache_path)
+    except OSError as e:
+        print(f"写入词库缓存失败: {e}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+_current = None
+_checked_at = 0.0
+_reload_lock = threading.Lock()
+
+
+def reload_lexicon(force=False):
+    """加载词库并整体切换：源文件未变化时保持当前词库；force 为True时忽略缓存重新编译"""
+    global _current, _checked_at
+    with _reload_lock:
+        start = time.time()
+        paths = get_source_paths()
+        signature = source_signature(paths)
+        _checked_at = start
+        if _current is not None and _current.signature == signature and not force:
+            return _current
+
+        cache_path = get_cache_path()
+        lexicon = None if force else load_cached_lexicon(cache_path, signature)
+        if lexicon is not None:
+            lexicon.source = 'cache'
+        else:
+            lexicon = compile_lexicon(paths, signature)
+            save_lexicon_cache(lexicon, cache_path)
+
+        lexicon.install()
+        lexicon.load_seconds = time.time() - start
+        lexicon.loaded_at = time.strftime('%Y-%m-%d %H:%M:%S')
+        _current = lexicon
+        print(f"医学词库已加载（{lexicon.source}）：{len(lexicon.entries)} 个词条，"
+              f"{len(lexicon.stop_words)} 个停用词，耗时 {lexicon.load_seconds:.2f} 秒")
+        return lexicon
+
+
+def _reload_in_background():
+    try:
+        reload_lexicon()
+    except Exception as e:
+        print(f"后台重新加载医学词库失败: {e}")
+
+
+def get_lexicon():
+    """获取当前进程的词库（首次调用时加载），按 LEXICON_RELOAD_INTERVAL 检查源文件是否变化"""
+    global _checked_at
+    if _current is None:
+        return reload_lexicon()
+
+    interval = getattr(settings, 'LEXICON_RELOAD_INTERVAL', None)
+    if interval and time.time() - _checked_at > interval and not _reload_lock.locked():
+        _checked_at = time.time()
+        threading.Thread(target=_reload_in_background, daemon=True).start()
+    return _current
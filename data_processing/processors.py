@@ -0,0 +1,104 @@
+"""
+共享处理器注册表
+
+TextProcessor、搜索索引管理器、检索结果缓存等在每个进程内只需要一份，且创建时要加载词库、索引或模型。
+它们以工厂函数登记在这里，第一次 get_processor() 时才创建，之后整个进程（视图、后台任务、OCR引擎池、
+文本挖掘）共用同一个实例。导入本模块不会导入任何重量级依赖，Web worker 启动与管理命令不再为
+用不到的处理器付出加载开销。
+
+新增处理器时用 @register_processor('名称') 登记无参数的工厂函数，工厂内部再导入所需模块。
+"""
+import threading
+import time
+
+PROCESSOR_FACTORIES = {}
+
+_instances = {}
+_init_seconds = {}
+# 工厂函数可能依赖其他处理器（如索引管理器依赖TextProcessor），使用可重入锁
+_lock = threading.RLock()
+
+
+def register_processor(name):
+    """注册处理器工厂的装饰器"""
+    def decorator(factory):
+        PROCESSOR_FACTORIES[name] = factory
+        return factory
+    return decorator
+
+
+def get_processor(name):
+    """获取进程内共享的处理器实例（首次调用时创建）"""
+    instance = _instances.get(name)
+    if instance is not None:
+        return instance
+
+    factory = PROCESSOR_FACTORIES.get(name)
+    if factory is None:
+        raise ValueError(f"未知的处理器: {name}")
+
+    with _lock:
+        instance = _instances.get(name)
+        if instance is None:
+            start = time.perf_counter()
+            instance = factory()
+            _init_seconds[name] = time.perf_counter() - start
+            _instances[name] = instance
+            print(f"处理器 {name} 初始化完成，耗时 {_init_seconds[name]:.2f} 秒")
+    return instance
+
+
+def processor_status():
+    """各处理器是否已创建及创建耗时（秒）"""
+    return {
+        name: {
+            'loaded': name in _instances,
+            'init_seconds': round(_init_seconds[name], 3) if name in _init_seconds else None,
+        }
+        for name in PROCESSOR_FACTORIES
+    }
+
+
+# ==================== 内置处理器 ====================
+
+@register_processor('text_processor')
+def _create_text_processor():
+    from data_processing.text_processor import TextProcessor
+    return TextProcessor()
+
+
+@register_processor('index_manager')
+def _create_index_manager():
+    # 索引快照内存映射自磁盘，后台刷新，原子切换
+    from data_processing.index_manager import SearchIndexManager
+    return SearchIndexManager(get_text_processor())
+
+
+@register_processor('query_cache')
+def _create_query_cache():
+    # 文本问答的检索结果缓存（按分词结果与索引版本）
+    from data_processing.query_cache import QueryResultCache
+    return QueryResultCache()
+
+
+@register_processor('text_analyzer')
+def _create_text_analyzer():
+    # 不加载OCR模型的MedicalOCR，只用于识别文本的分析
+    from image_recognition.medical_ocr import MedicalOCR
+    return MedicalOCR(text_processor=get_text_processor(), load_model=False)
+
+
+def get_text_processor():
+    return get_processor('text_processor')
+
+
+def get_index_manager():
+    return get_processor('index_manager')
+
+
+def get_query_cache():
+    return get_processor('query_cache')
+
+
+def get_text_analyzer():
+    return get_processor('text_analyzer')
@@ -0,0 +1,151 @@
+"""
+问答检索结果缓存
+
+医疗问答的查询高度重复，同一问题的不同写法分词后往往得到相同的词序列。
+缓存键由 segment_text 的分词结果、检索参数与索引代/数据版本号组成：
+    - 索引切换到新的一代或应用了增量更新后，键自然变化，旧结果不会再被命中
+    - 默认使用进程内的LRU缓存（带TTL），索引版本变化时整体清空
+    - settings.SEARCH_RESULT_CACHE_ALIAS 指向 CACHES 中的某个缓存时改用 Django 缓存框架，
+      多worker部署可配置文件缓存或Redis等共享后端，旧版本的条目由TTL回收
+    - 共享缓存中的键再带上一个命名空间代号（保存在同一缓存中），clear() 只递增代号，
+      不清空整个缓存别名（别名可能与会话等其他数据共用）
+缓存的是命中记录（ID、相似度与载荷字段），命中时重新构造 QAData 对象，不访问索引和数据库。
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from qa_system.models import QAData
+from data_processing.result_hydrator import PAYLOAD_FIELDS
+
+CACHE_KEY_PREFIX = 'qa_search'
+NAMESPACE_KEY = f'{CACHE_KEY_PREFIX}:namespace'
+
+
+class QueryResultCache:
+    """检索结果缓存，记录命中/未命中次数"""
+
+    def __init__(self, alias=None, max_entries=None, ttl=None, fields=PAYLOAD_FIELDS):
+        self.alias = alias if alias is not None else getattr(settings, 'SEARCH_RESULT_CACHE_ALIAS', None)
+        self.max_entries = max_entries or getattr(settings, 'SEARCH_RESULT_CACHE_SIZE', 2048)
+        self.ttl = ttl or getattr(settings, 'SEARCH_RESULT_CACHE_TTL', 600)
+        self.fields = fields
+
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._index_key = None
+
+        if self.alias:
+            from django.core.cache import caches
+            self._backend = caches[self.alias]
+        else:
+            self._backend = None
+
+    def get(self, tokens, index_info, **params):
+        """读取缓存的检索结果，未命中时返回None"""
+        key = self._make_key(tokens, index_info, params)
+        if self._backend is not None:
+            records = self._backend.get(key)
+        else:
+            records = self._local_get(key)
+
+        with self._lock:
+            if records is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if records is None:
+            return None
+        return [self._to_result(record) for record in records]
+
+    def set(self, tokens, index_info, results, **params):
+        """写入检索结果（search_similar_qa 的返回值）"""
+        key = self._make_key(tokens, index_info, params)
+        records = [self._to_record(result) for result in results]
+        if self._backend is not None:
+            self._backend.set(key, records, self.ttl)
+        else:
+            self._local_set(key, records)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self._backend is not None:
+            # 递增命名空间代号，旧代号下的条目不再被命中，由TTL回收
+            try:
+                self._backend.incr(NAMESPACE_KEY)
+            except ValueError:
+                self._namespace()
+
+    def stats(self):
+        """命中统计"""
+        total = self.hits + self.misses
+        return {
+            'backend': self.alias or 'local',
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            'entries': len(self._entries) if self._backend is None else None,
+        }
+
+    def _make_key(self, tokens, index_info, params):
+        index_key = f"{index_info.get('generation')}:{index_info.get('data_version')}"
+        if self._backend is None:
+            self._check_index_key(index_key)
+
+        payload = json.dumps([index_key, list(tokens), sorted(params.items())], ensure_ascii=False)
+        digest = hashlib.sha1(payload.encode('utf-8')).hexdigest()
+        if self._backend is None:
+            return f"{CACHE_KEY_PREFIX}:{digest}"
+        return f"{CACHE_KEY_PREFIX}:{self._namespace()}:{digest}"
+
+    def _namespace(self):
+        """共享缓存的命名空间代号；不存在（首次使用或被淘汰）时以当前时间初始化，不会与旧代号重复"""
+        namespace = self._backend.get(NAMESPACE_KEY)
+        if namespace is None:
+            self._backend.add(NAMESPACE_KEY, time.time_ns(), None)
+            namespace = self._backend.get(NAMESPACE_KEY)
+        return namespace
+
+    def _check_index_key(self, index_key):
+        """索引版本变化时清空进程内缓存（旧条目已不可能再被命中）"""
+        if index_key != self._index_key:
+            with self._lock:
+                self._entries.clear()
+                self._index_key = index_key
+
+    def _local_get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, records = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return records
+
+    def _local_set(self, key, records):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, records)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _to_record(self, result):
+        qa = result['qa']
+        fields = {field: getattr(qa, field) for field in self.fields} if qa is not None else None
+        return {'qa_id': result['qa_id'], 'similarity': result['similarity'], 'fields': fields}
+
+    def _to_result(self, record):
+        fields = record['fields']
+        qa = QAData(id=record['qa_id'], **fields) if fields is not None else None
+        return {'qa': qa, 'qa_id': record['qa_id'], 'similarity': record['similarity']}
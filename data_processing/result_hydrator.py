@@ -0,0 +1,151 @@
+"""
+搜索结果装配
+
+检索引擎只返回 (矩阵行号, QAData.id, 相似度)，这里负责把命中结果装配成 QAData 对象：
+    - payload：直接从索引自带的载荷存储读取 问题/答案/分类，不访问数据库
+    - db：对全部命中的ID执行一次 in_bulk 查询（只取需要的字段）
+"""
+import bisect
+import json
+import os
+
+import numpy as np
+
+from qa_system.models import QAData
+
+PAYLOAD_FIELDS = ('question', 'answer', 'category')
+
+
+# 单次 in_bulk 查询的ID数量（SQLite默认限制999个参数）
+FETCH_BATCH_SIZE = 500
+
+
+def fetch_payloads(qa_ids, fields=PAYLOAD_FIELDS):
+    """从数据库批量读取载荷记录，返回 {QAData.id: 记录}（已被删除的ID不在结果中）"""
+    qa_ids = [int(qa_id) for qa_id in qa_ids]
+    records = {}
+    for start in range(0, len(qa_ids), FETCH_BATCH_SIZE):
+        qa_map = QAData.objects.only('id', *fields).in_bulk(qa_ids[start:start + FETCH_BATCH_SIZE])
+        for qa_id, qa in qa_map.items():
+            records[qa_id] = {field: getattr(qa, field) for field in fields}
+    return records
+
+
+class PayloadStore:
+    """索引载荷存储：按矩阵行号保存问题/答案/分类
+
+    所有记录以JSON编码后顺序拼接在一个字节块中，offsets[i]:offsets[i+1] 为第i行的记录。
+    从磁盘加载时两者均为内存映射，读取单条记录只触碰对应的页。
+    """
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def from_records(cls, records):
+        """由记录列表构建内存中的载荷存储"""
+        chunks = []
+        offsets = np.zeros(len(records) + 1, dtype=np.int64)
+        position = 0
+        for i, record in enumerate(records):
+            chunk = json.dumps(record, ensure_ascii=False).encode('utf-8')
+            chunks.append(chunk)
+            position += len(chunk)
+            offsets[i + 1] = position
+        blob = np.frombuffer(b''.join(chunks), dtype=np.uint8)
+        return cls(blob, offsets)
+
+    @classmethod
+    def load(cls, directory):
+        """以内存映射方式加载载荷存储，文件不存在时返回None"""
+        blob_path = os.path.join(directory, 'payload.bin')
+        offsets_path = os.path.join(directory, 'payload_offsets.npy')
+        if not (os.path.exists(blob_path) and os.path.exists(offsets_path)):
+            return None
+
+        offsets = np.load(offsets_path, mmap_mode='r')
+        if os.path.getsize(blob_path) == 0:
+            blob = np.zeros(0, dtype=np.uint8)
+        else:
+            blob = np.memmap(blob_path, dtype=np.uint8, mode='r')
+        return cls(blob, offsets)
+
+    def save(self, directory):
+        """写入 payload.bin 与 payload_offsets.npy"""
+        with open(os.path.join(directory, 'payload.bin'), 'wb') as f:
+            f.write(np.asarray(self.blob, dtype=np.uint8).tobytes())
+        np.save(os.path.join(directory, 'payload_offsets.npy'), np.asarray(self.offsets, dtype=np.int64))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def get(self, row):
+        """读取第 row 行的载荷记录"""
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return json.loads(bytes(self.blob[start:end]).decode('utf-8'))
+
+
+class SegmentedPayloadStore:
+    """把多个载荷存储按顺序拼接成一个，全局行号 = 段起始偏移 + 段内行号"""
+
+    def __init__(self, stores):
+        self.stores = stores
+        self.offsets = [0]
+        for store in stores:
+            self.offsets.append(self.offsets[-1] + len(store))
+
+    def __len__(self):
+        return self.offsets[-1]
+
+    def get(self, row):
+        segment = bisect.bisect_right(self.offsets, row) - 1
+        return self.stores[segment].get(row - self.offsets[segment])
+
+
+class ResultHydrator:
+    """把检索命中装配成 {'qa', 'qa_id', 'similarity'} 结果列表"""
+
+    def __init__(self, payload_store=None, fields=PAYLOAD_FIELDS):
+        self.payload_store = payload_store
+        self.fields = fields
+
+    def hydrate(self, hits, source='payload'):
+        """装配命中结果
+
+        hits: [(row, qa_id, similarity), ...]，已按相似度降序排列
+        source: 'payload' 优先使用载荷存储（不可用时退回数据库），'db' 强制查询数据库，
+                None 不装配对象，只返回ID和相似度
+        """
+        if not hits:
+            return []
+
+        if source is None:
+            return [{'qa': None, 'qa_id': int(qa_id), 'similarity': float(similarity)}
+                    for _, qa_id, similarity in hits]
+
+        if source == 'payload' and self.payload_store is not None:
+            return self._hydrate_from_payload(hits)
+
+        return self._hydrate_from_db(hits)
+
+    def _hydrate_from_payload(self, hits):
+        """从载荷存储构造未保存的QAData对象，不产生任何数据库查询"""
+        results = []
+        for row, qa_id, similarity in hits:
+            record = self.payload_store.get(int(row))
+            qa = QAData(id=int(qa_id), **{field: record.get(field, '') for field in self.fields})
+            results.append({'qa': qa, 'qa_id': int(qa_id), 'similarity': float(similarity)})
+        return results
+
+    def _hydrate_from_db(self, hits):
+        """一次 in_bulk 查询取回全部命中行，已被删除的记录直接跳过"""
+        qa_ids = [int(qa_id) for _, qa_id, _ in hits]
+        qa_map = QAData.objects.only('id', *self.fields).in_bulk(qa_ids)
+
+        results = []
+        for _, qa_id, similarity in hits:
+            qa = qa_map.get(int(qa_id))
+            if qa is not None:
+                results.append({'qa': qa, 'qa_id': int(qa_id), 'similarity': float(similarity)})
+        return results
@@ -0,0 +1,85 @@
+"""
+TF-IDF Top-K 检索
+
+TfidfVectorizer 默认对每行做L2归一化，查询向量同样归一化，因此余弦相似度就是点积。
+索引同时保存一份转置矩阵（特征 x 文档，相当于倒排表），查询时只取查询向量非零列
+对应的行做稀疏乘法，计算量与这些词的倒排长度成正比；再用 argpartition 选出前k个，
+避免对全部文档排序。
+批量检索把全部查询拼成一个稀疏矩阵，按行分块与转置矩阵做一次稀疏矩阵乘法，
+每块的得分矩阵用完即释放，内存与块大小而不是查询总数成正比。
+"""
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+def get_postings_matrix(index_info):
+    """获取转置后的TF-IDF矩阵（特征 x 文档），旧索引没有时现场转置并缓存"""
+    matrix_t = index_info.get('tfidf_matrix_t')
+    if matrix_t is None:
+        matrix_t = csr_matrix(index_info['tfidf_matrix'].T)
+        index_info['tfidf_matrix_t'] = matrix_t
+    return matrix_t
+
+
+def select_top_k(rows, scores, top_k, threshold=0.0):
+    """在候选中选出得分高于阈值的前k个，按得分降序返回 (rows, scores)"""
+    rows = np.asarray(rows)
+    scores = np.asarray(scores)
+
+    # 阈值下推：先过滤再选择，低于阈值的候选不参与排序
+    keep = scores > threshold
+    if not keep.all():
+        rows = rows[keep]
+        scores = scores[keep]
+
+    if len(scores) == 0 or top_k <= 0:
+        return rows[:0], scores[:0]
+
+    if len(scores) > top_k:
+        part = np.argpartition(-scores, top_k - 1)[:top_k]
+        rows = rows[part]
+        scores = scores[part]
+
+    # 只对最终的k个结果排序；得分相同时按行号升序，保证结果稳定
+    order = np.lexsort((rows, -scores))
+    return rows[order], scores[order]
+
+
+def top_k_similar(query_vector, matrix_t, top_k=5, threshold=0.0):
+    """计算查询与全部文档的相似度并返回前k个 (rows, scores)
+
+    query_vector: 1 x 特征 的稀疏查询向量（已L2归一化）
+    matrix_t: 特征 x 文档 的CSR矩阵
+    """
+    query_vector = csr_matrix(query_vector)
+    columns = query_vector.indices
+    if len(columns) == 0:
+        empty = np.zeros(0)
+        return empty.astype(np.int64), empty
+
+    # 只取查询词对应的倒排行做乘法：(1 x q) · (q x 文档)
+    weights = csr_matrix(query_vector.data.reshape(1, -1))
+    scores = weights @ matrix_t[columns]
+
+    return select_top_k(scores.indices.astype(np.int64), scores.data, top_k, threshold)
+
+
+def top_k_similar_batch(query_matrix, matrix_t, top_k=5, threshold=0.0, block_size=512):
+    """批量计算多个查询的前k个结果，返回与查询一一对应的 [(rows, scores), ...]
+
+    query_matrix: 查询数 x 特征 的稀疏矩阵（每行已L2归一化）
+    matrix_t: 特征 x 文档 的CSR矩阵
+    """
+    query_matrix = csr_matrix(query_matrix)
+    results = []
+    for start in range(0, query_matrix.shape[0], block_size):
+        # (块大小 x 特征) · (特征 x 文档)，结果只包含与查询有共同词的文档
+        scores = (query_matrix[start:start + block_size] @ matrix_t).tocsr()
+        for i in range(scores.shape[0]):
+            row_start, row_end = scores.indptr[i], scores.indptr[i + 1]
+            results.append(select_top_k(
+                scores.indices[row_start:row_end].astype(np.int64),
+                scores.data[row_start:row_end],
+                top_k, threshold,
+            ))
+    return results
@@ -0,0 +1,273 @@
+"""
+搜索索引持久化
+
+索引以"代"(generation)为单位写入磁盘，每一代是一个目录：
+    meta.json            元信息（格式版本、检索后端、数据版本号、文档数、向量化参数）
+    doc_ids.npy          矩阵行号 -> QAData.id
+    payload.bin          载荷存储（问题/答案/分类，按行拼接的JSON）
+    payload_offsets.npy  载荷存储每行的起止偏移
+TF-IDF后端：
+    vocabulary.json      TF-IDF词表
+    idf.npy              idf向量
+    tfidf_data.npy       CSR矩阵 data
+    tfidf_indices.npy    CSR矩阵 indices
+    tfidf_indptr.npy     CSR矩阵 indptr
+    tfidf_t_*.npy        转置矩阵（特征 x 文档）的CSR数组，供Top-K检索按查询词取倒排行
+BM25后端：
+    bm25_meta.json       词表与BM25参数
+    bm25_*.npy           压缩倒排表、块索引、词得分上界与文档长度归一项
+索引根目录下的 CURRENT 文件记录当前生效的代，写入新一代后通过 os.replace 原子切换。
+加载时所有 .npy 文件以只读方式内存映射，多个worker进程共享同一份物理页。
+发布新一代后清理变更日志：保留的各代都已包含的变更记录不再需要，删除到其中最小的数据版本号为止。
+"""
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from data_processing.result_hydrator import PayloadStore
+from data_processing.inverted_index import BM25InvertedIndex
+
+INDEX_FORMAT_VERSION = 4
+CURRENT_FILE = 'CURRENT'
+
+
+def get_index_dir(index_dir=None):
+    """获取索引根目录"""
+    if index_dir:
+        return str(index_dir)
+
+    from django.conf import settings
+    return str(getattr(settings, 'SEARCH_INDEX_DIR', os.path.join(settings.BASE_DIR, 'search_index')))
+
+
+def get_data_version():
+    """获取当前QAData数据版本号"""
+    from qa_system.models import QADataChangeLog
+    return QADataChangeLog.current_version()
+
+
+def read_current_generation(index_dir=None):
+    """读取当前生效的索引代名称，不存在时返回None"""
+    current_path = os.path.join(get_index_dir(index_dir), CURRENT_FILE)
+    try:
+        with open(current_path, 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _publish_generation(root, generation):
+    """原子地切换 CURRENT 指向新的索引代"""
+    tmp_path = os.path.join(root, f'{CURRENT_FILE}.{os.getpid()}.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(generation)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(root, CURRENT_FILE))
+
+
+def _save_tfidf(index_info, directory):
+    """写入TF-IDF后端的词表、idf与CSR数组，返回需要记录到 meta.json 的信息"""
+    vectorizer = index_info['vectorizer']
+    tfidf_matrix = csr_matrix(index_info['tfidf_matrix'])
+    tfidf_matrix.sort_indices()
+
+    vocabulary = {term: int(col) for term, col in vectorizer.vocabulary_.items()}
+    with open(os.path.join(directory, 'vocabulary.json'), 'w', encoding='utf-8') as f:
+        json.dump(vocabulary, f, ensure_ascii=False)
+
+    np.save(os.path.join(directory, 'idf.npy'), np.asarray(vectorizer.idf_, dtype=np.float64))
+    np.save(os.path.join(directory, 'tfidf_data.npy'), tfidf_matrix.data.astype(np.float64))
+    np.save(os.path.join(directory, 'tfidf_indices.npy'), tfidf_matrix.indices.astype(np.int32))
+    np.save(os.path.join(directory, 'tfidf_indptr.npy'), tfidf_matrix.indptr.astype(np.int64))
+    tfidf_matrix_t = csr_matrix(tfidf_matrix.T)
+    tfidf_matrix_t.sort_indices()
+    np.save(os.path.join(directory, 'tfidf_t_data.npy'), tfidf_matrix_t.data.astype(np.float64))
+    np.save(os.path.join(directory, 'tfidf_t_indices.npy'), tfidf_matrix_t.indices.astype(np.int32))
+    np.save(os.path.join(directory, 'tfidf_t_indptr.npy'), tfidf_matrix_t.indptr.astype(np.int64))
+
+    return {
+        'n_features': int(tfidf_matrix.shape[1]),
+        'vectorizer_params': {
+            'ngram_range': list(vectorizer.ngram_range),
+            'norm': vectorizer.norm,
+            'sublinear_tf': vectorizer.sublinear_tf,
+        },
+    }
+
+
+def _load_tfidf(directory, meta):
+    """内存映射加载TF-IDF后端"""
+    # sklearn 导入耗时约1秒，只在加载TF-IDF索引时导入
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    with open(os.path.join(directory, 'vocabulary.json'), 'r', encoding='utf-8') as f:
+        vocabulary = json.load(f)
+
+    def _mmap(name):
+        return np.load(os.path.join(directory, name), mmap_mode='r')
+
+    params = meta['vectorizer_params']
+    vectorizer = TfidfVectorizer(
+        vocabulary=vocabulary,
+        ngram_range=tuple(params['ngram_range']),
+        norm=params['norm'],
+        sublinear_tf=params['sublinear_tf'],
+    )
+    vectorizer.idf_ = np.array(_mmap('idf.npy'))
+
+    tfidf_matrix = csr_matrix(
+        (_mmap('tfidf_data.npy'), _mmap('tfidf_indices.npy'), _mmap('tfidf_indptr.npy')),
+        shape=(meta['n_documents'], meta['n_features']),
+        copy=False,
+    )
+
+    tfidf_matrix_t = csr_matrix(
+        (_mmap('tfidf_t_data.npy'), _mmap('tfidf_t_indices.npy'), _mmap('tfidf_t_indptr.npy')),
+        shape=(meta['n_features'], meta['n_documents']),
+        copy=False,
+    )
+
+    return {
+        'vectorizer': vectorizer,
+        'tfidf_matrix': tfidf_matrix,
+        'tfidf_matrix_t': tfidf_matrix_t,
+    }
+
+
+def save_index(index_info, index_dir=None, keep_generations=2):
+    """将索引写入磁盘并发布为当前代，返回代名称"""
+    root = get_index_dir(index_dir)
+    os.makedirs(root, exist_ok=True)
+
+    backend = index_info.get('backend', 'tfidf')
+    data_version = int(index_info.get('data_version', 0))
+    generation = f"gen_{data_version:010d}_{int(time.time() * 1000)}"
+    tmp_dir = os.path.join(root, f'.{generation}.tmp')
+    os.makedirs(tmp_dir)
+
+    meta = {
+        'format_version': INDEX_FORMAT_VERSION,
+        'generation': generation,
+        'backend': backend,
+        'data_version': data_version,
+        'n_documents': len(index_info['document_ids']),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+    if backend == 'bm25':
+        index_info['inverted_index'].save(tmp_dir)
+    else:
+        meta.update(_save_tfidf(index_info, tmp_dir))
+
+    np.save(os.path.join(tmp_dir, 'doc_ids.npy'), np.asarray(index_info['document_ids'], dtype=np.int64))
+
+    payload_store = index_info.get('payload_store')
+    if payload_store is not None:
+        payload_store.save(tmp_dir)
+
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    os.replace(tmp_dir, os.path.join(root, generation))
+    _publish_generation(root, generation)
+    cleanup_generations(root, keep=keep_generations)
+    prune_change_log(root)
+
+    print(f"索引已保存: {generation}（{backend}，数据版本 {data_version}，{meta['n_documents']} 个文档）")
+    return generation
+
+
+def load_index(index_dir=None, generation=None):
+    """以内存映射方式加载索引，返回与 TextProcessor.build_index 相同结构的字典"""
+    root = get_index_dir(index_dir)
+    generation = generation or read_current_generation(root)
+    if not generation:
+        return None
+
+    gen_dir = os.path.join(root, generation)
+    meta_path = os.path.join(gen_dir, 'meta.json')
+    if not os.path.exists(meta_path):
+        print(f"索引目录不完整: {gen_dir}")
+        return None
+
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+
+    if meta.get('format_version') != INDEX_FORMAT_VERSION:
+        print(f"索引格式版本不匹配: {meta.get('format_version')}")
+        return None
+
+    backend = meta.get('backend', 'tfidf')
+    if backend == 'bm25':
+        index_info = {'inverted_index': BM25InvertedIndex.load(gen_dir)}
+    else:
+        index_info = _load_tfidf(gen_dir, meta)
+
+    index_info.update({
+        'backend': backend,
+        'document_ids': np.load(os.path.join(gen_dir, 'doc_ids.npy'), mmap_mode='r'),
+        'payload_store': PayloadStore.load(gen_dir),
+        'data_version': meta['data_version'],
+        'generation': generation,
+    })
+    return index_info
+
+
+def clear_index(index_dir=None):
+    """撤销当前索引代（数据被清空时使用），已有的代目录由 cleanup_generations 回收"""
+    current_path = os.path.join(get_index_dir(index_dir), CURRENT_FILE)
+    if os.path.exists(current_path):
+        os.remove(current_path)
+
+
+def cleanup_generations(index_dir=None, keep=2):
+    """删除旧的索引代，保留最近 keep 代（当前代始终保留）"""
+    root = get_index_dir(index_dir)
+    current = read_current_generation(root)
+    generations = sorted(
+        name for name in os.listdir(root)
+        if name.startswith('gen_') and os.path.isdir(os.path.join(root, name))
+    )
+    stale = [name for name in generations[:-keep] if name != current] if keep > 0 else []
+    for name in stale:
+        # 已映射旧文件的进程仍可继续读取（POSIX下删除不影响已打开的映射）
+        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+    return stale
+
+
+def retained_data_versions(index_dir=None):
+    """磁盘上保留的各代索引的数据版本号"""
+    root = get_index_dir(index_dir)
+    versions = []
+    for name in os.listdir(root):
+        meta_path = os.path.join(root, name, 'meta.json')
+        if not name.startswith('gen_') or not os.path.exists(meta_path):
+            continue
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            versions.append(int(json.load(f).get('data_version', 0)))
+    return versions
+
+
+def prune_change_log(index_dir=None):
+    """删除所有保留的索引代都已包含的变更记录，返回删除条数
+
+    仍在使用旧一代的worker刷新时会先切换到当前代，只需要读取保留的代之后的变更。
+    """
+    versions = retained_data_versions(index_dir)
+    if not versions:
+        return 0
+
+    from qa_system.models import QADataChangeLog
+    try:
+        deleted = QADataChangeLog.prune(min(versions))
+    except Exception as e:
+        print(f"清理变更日志失败: {e}")
+        return 0
+    if deleted:
+        print(f"已清理 {deleted} 条变更日志（数据版本 <= {min(versions)}）")
+    return deleted
@@ -0,0 +1,42 @@
+"""
+批量分词/预处理进程池的worker函数
+
+进程池以 spawn 方式启动（原因见 create_pool），子进程按模块名导入这里的函数，所以本模块不在导入时加载Django模型：
+worker 初始化时先 django.setup()，再构造 TextProcessor（每个进程只加载一次jieba词典）。
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+_worker_processor = None
+
+
+def create_pool(workers):
+    """创建分词/预处理进程池
+
+    项目中所有子进程（本进程池、词云渲染、OCR推理与任务执行进程）统一用 spawn 方式启动：
+    创建它们的Web/任务进程是多线程的，fork 会把其他线程持有的锁原样复制到子进程，可能导致死锁。
+    spawn 子进程需要自己 django.setup()，目标函数必须能按模块名导入。
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=init_worker,
+    )
+
+
+def init_worker():
+    global _worker_processor
+    import django
+    django.setup()
+
+    from data_processing.text_processor import TextProcessor
+    _worker_processor = TextProcessor()
+
+
+def segment_worker(texts):
+    return [_worker_processor.segment_text(text) for text in texts]
+
+
+def process_worker(records):
+    from data_processing.text_processor import process_records
+    return process_records(_worker_processor, records)
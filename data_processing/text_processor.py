@@ -1,65 +1,82 @@
 import jieba
-import jieba.analyse
 import re
 import json
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 import os
 import sys
+import time
+from collections import deque
+from contextlib import contextmanager
 
-# 添加Django环境
-sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+# 直接作为脚本运行时初始化Django环境（作为模块导入时由调用方负责，导入本模块不再触发 django.setup()）
+if __name__ == '__main__':
+    sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-import django
-django.setup()
+    import django
+    django.setup()
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from qa_system.models import QAData, QADataChangeLog
+from data_processing.search_index import get_data_version
+from data_processing.result_hydrator import PayloadStore, ResultHydrator, PAYLOAD_FIELDS
+from data_processing.inverted_index import BM25InvertedIndex
+from data_processing.incremental_index import search_segments, search_segments_batch, get_payload_store
+from data_processing.medical_lexicon import get_lexicon
+from data_processing.segment_pool import create_pool, process_worker, segment_worker
+
+# 文本数量达到该值时才启用多进程分词（进程间传输与worker初始化有固定开销）
+PARALLEL_MIN_TEXTS = 1000
+PARALLEL_CHUNK_SIZE = 256
+
+
+def process_records(processor, records):
+    """预处理一批 (id, question, answer)，失败的记录跳过（保持未处理状态）"""
+    results = []
+    for qa_id, question, answer in records:
+        try:
+            results.append((qa_id, *processor.process_record(question, answer)))
+        except Exception as e:
+            print(f"处理数据 {qa_id} 失败: {e}")
+    return results
 
-from qa_system.models import QAData
 
 class TextProcessor:
     def __init__(self):
-        # 中文停用词表
-        self.stop_words = set([
-            '的', '了', '是', '在', '有', '和', '就', '不', '人', '都', '一', '一个', '上', '也', '很', '到', '说', '要', '去', '你',
-            '会', '着', '没有', '看', '好', '自己', '这', '那', '还', '能', '下', '过', '他', '来', '对', '开始', '地', '可以',
-            '什么', '现在', '一些', '最', '这个', '我', '们', '后', '中', '多', '么', '用', '同', '回', '当', '没', '动', '怎么',
-            '又', '如', '被', '从', '做', '他们', '她', '但', '或者', '已经', '还是', '因为', '所以', '虽然', '然后', '而且',
-            '比如', '等等', '可能', '应该', '需要', '进行', '之后', '通过', '关于', '由于', '根据', '这样', '那样', '这里',
-            '那里', '这些', '那些', '每个', '任何', '所有', '另外', '其他', '同时', '然而', '因此', '于是', '接着', '首先',
-            '其次', '最后', '总之', '一般', '特别', '尤其', '包括', '除了', '如果', '虽然', '但是', '只是', '不过', '当然',
-            '确实', '实际', '基本', '主要', '重要', '必须', '一定', '可能', '也许', '或许', '大概', '差不多', '几乎', '完全'
-        ])
-        
-        # 医疗相关停用词
-        self.medical_stop_words = set([
-            '患者', '病人', '医生', '大夫', '医院', '诊断', '治疗', '检查', '化验', '症状', '疾病', '药物', '服用',
-            '建议', '注意', '预防', '护理', '康复', '保健', '健康'
-        ])
-        
-        self.stop_words.update(self.medical_stop_words)
-        
-        # 初始化jieba
-        jieba.initialize()
-        
-        # 添加医疗词汇
-        self.add_medical_words()
-    
-    def add_medical_words(self):
-        """添加医疗专业词汇到jieba词典"""
-        medical_words = [
-            '高血压', '糖尿病', '心脏病', '脑血管', '冠心病', '心肌梗塞', '脑梗塞', '脑出血',
-            '肺炎', '肺结核', '哮喘', '支气管炎', '肺癌', '胃炎', '胃溃疡', '肠炎', '胆结石',
-            '肾结石', '尿路感染', '前列腺', '乳腺癌', '宫颈癌', '骨质疏松', '关节炎', '风湿',
-            '甲状腺', '内分泌', '免疫力', '过敏性', '传染性', '慢性病', '急性病', '并发症',
-            '副作用', '不良反应', '药物相互作用', '抗生素', '消炎药', '止痛药', '降压药',
-            '降糖药', '胰岛素', '维生素', '钙片', '叶酸', '血常规', '尿常规', 'B超', 'CT',
-            'MRI', 'X光', '心电图', '血压', '血糖', '血脂', '胆固醇', '白细胞', '红细胞',
-            '血小板', '血红蛋白', '肝功能', '肾功能', '心功能', '肺功能'
-        ]
+        # 停用词与jieba分词词典来自共享的医学词库（每个进程只加载一次，之后构造几乎没有开销）
+        get_lexicon()
         
-        for word in medical_words:
-            jieba.add_word(word)
+        # 批量分词的进程数
+        self.workers = getattr(settings, 'TEXT_PROCESS_WORKERS', None) or os.cpu_count() or 1
+    
+    @contextmanager
+    def segmentation_pool(self, n_texts):
+        """为一次批处理创建分词进程池（见 data_processing.segment_pool），with 块结束时关闭
+
+        文本少于 PARALLEL_MIN_TEXTS 或只有一个CPU时产出None（在当前进程内处理）。
+        进程池只在管理命令与后台任务的批处理中创建，Web进程中不会留下常驻的分词进程。
+        """
+        if self.workers <= 1 or n_texts < PARALLEL_MIN_TEXTS:
+            yield None
+            return
+        
+        pool = create_pool(self.workers)
+        try:
+            yield pool
+        finally:
+            pool.shutdown()
+    
+    @property
+    def stop_words(self):
+        """停用词（含医疗相关停用词），随词库热更新"""
+        return get_lexicon().stop_words
+    
+    @property
+    def medical_stop_words(self):
+        return get_lexicon().medical_stop_words
     
     def segment_text(self, text):
         """中文分词"""
@@ -73,14 +90,30 @@ class TextProcessor:
         words = jieba.cut(text)
         
         # 过滤停用词和短词
+        stop_words = self.stop_words
         filtered_words = []
         for word in words:
             word = word.strip()
-            if len(word) > 1 and word not in self.stop_words and word.isalnum():
+            if len(word) > 1 and word not in stop_words and word.isalnum():
                 filtered_words.append(word)
         
         return filtered_words
     
+    def segment_texts(self, texts, pool=None):
+        """批量分词，结果顺序与输入一致
+
+        pool: segmentation_pool() 创建的进程池，传入且文本较多时分块并行处理；不传时在当前进程内逐条分词
+        """
+        texts = list(texts)
+        if pool is None or len(texts) < PARALLEL_MIN_TEXTS:
+            return [self.segment_text(text) for text in texts]
+        
+        chunks = [texts[i:i + PARALLEL_CHUNK_SIZE] for i in range(0, len(texts), PARALLEL_CHUNK_SIZE)]
+        results = []
+        for words_list in pool.map(segment_worker, chunks):
+            results.extend(words_list)
+        return results
+    
     def clean_text(self, text):
         """清理文本"""
         if not text:
@@ -102,6 +135,9 @@ class TextProcessor:
         if not text:
             return []
         
+        # jieba.analyse 导入时加载IDF词典与词性标注模型，只在需要提取关键词时导入
+        import jieba.analyse
+        
         # 使用jieba的TF-IDF提取关键词
         keywords_tfidf = jieba.analyse.extract_tags(text, topK=num_keywords, withWeight=True)
         
@@ -125,69 +161,156 @@ class TextProcessor:
         
         return [word for word, weight in sorted_keywords[:num_keywords]]
     
-    def process_qa_data(self, qa_id=None):
-        """处理问答数据"""
+    def process_record(self, question, answer):
+        """预处理一条问答：问题/答案分词与关键词提取，返回 (processed_question, processed_answer, keywords)"""
+        processed_question = ' '.join(self.segment_text(question))
+        processed_answer = ' '.join(self.segment_text(answer))
+        keywords = self.extract_keywords(question + ' ' + answer)
+        return processed_question, processed_answer, keywords
+    
+    def process_qa_data(self, qa_id=None, reprocess=False, batch_size=None, start_id=0,
+                        checkpoint_path=None, progress_callback=None):
+        """处理问答数据
+
+        按主键分页（WHERE id > 上一批最大id）流式读取，每批交给进程池分词并提取关键词，
+        结果用 bulk_update 写回；数据量较小或只有一个CPU时在当前进程内处理。进程池只在本次调用期间存在。
+        reprocess: 重新处理全部数据（默认只处理尚未处理的数据）
+        start_id: 从该id之后开始处理
+        checkpoint_path: 断点文件，每写回一批记录一次进度，中断后再次调用从断点继续，全部完成后删除
+        progress_callback: 每批完成后调用 progress_callback(已处理数, 总数)
+        """
+        batch_size = batch_size or getattr(settings, 'TEXT_PROCESS_BATCH_SIZE', 500)
+        
         if qa_id:
-            qa_objects = QAData.objects.filter(id=qa_id)
+            queryset = QAData.objects.filter(id=qa_id)
+        elif reprocess:
+            queryset = QAData.objects.all()
         else:
-            qa_objects = QAData.objects.filter(processed_question='', processed_answer='')
+            queryset = QAData.objects.filter(processed_question='', processed_answer='')
         
-        processed_count = 0
+        if checkpoint_path and not start_id and os.path.exists(checkpoint_path):
+            with open(checkpoint_path, 'r', encoding='utf-8') as f:
+                start_id = int(f.read().strip() or 0)
+            print(f"从断点继续处理：id > {start_id}")
         
-        for qa in qa_objects:
-            try:
-                # 处理问题
-                question_words = self.segment_text(qa.question)
-                processed_question = ' '.join(question_words)
-                
-                # 处理答案
-                answer_words = self.segment_text(qa.answer)
-                processed_answer = ' '.join(answer_words)
-                
-                # 提取关键词
-                combined_text = qa.question + ' ' + qa.answer
-                keywords = self.extract_keywords(combined_text)
-                
-                # 更新数据库
-                qa.processed_question = processed_question
-                qa.processed_answer = processed_answer
-                qa.set_keywords_list(keywords)
-                qa.save()
-                
-                processed_count += 1
-                
-                if processed_count % 100 == 0:
-                    print(f"已处理 {processed_count} 条数据")
-                    
-            except Exception as e:
-                print(f"处理数据 {qa.id} 失败: {e}")
-                continue
+        queryset = queryset.filter(id__gt=start_id).order_by('id')
+        total = queryset.count()
+        
+        processed_count = 0
+        start_time = time.time()
+        pending = deque()
+        
+        def write_back(chunk_last_id, results):
+            nonlocal processed_count
+            self._save_processed(results)
+            processed_count += len(results)
+            if checkpoint_path:
+                with open(checkpoint_path, 'w', encoding='utf-8') as f:
+                    f.write(str(chunk_last_id))
+            
+            elapsed = time.time() - start_time
+            rate = processed_count / elapsed if elapsed > 0 else 0.0
+            print(f"已处理 {processed_count}/{total} 条数据（{rate:.0f} 条/秒）")
+            if progress_callback:
+                progress_callback(processed_count, total)
+        
+        with self.segmentation_pool(total) as pool:
+            for chunk in self._iter_record_chunks(queryset, batch_size):
+                if pool is not None:
+                    # 最多保持 2 倍进程数的批次在途，按提交顺序写回，保证断点之前的数据都已处理
+                    pending.append((chunk[-1][0], pool.submit(process_worker, chunk)))
+                    while len(pending) >= self.workers * 2:
+                        chunk_last_id, future = pending.popleft()
+                        write_back(chunk_last_id, future.result())
+                else:
+                    write_back(chunk[-1][0], process_records(self, chunk))
+            
+            while pending:
+                chunk_last_id, future = pending.popleft()
+                write_back(chunk_last_id, future.result())
+        
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
         
         print(f"数据预处理完成，共处理 {processed_count} 条数据")
         return processed_count
     
-    def build_index(self):
-        """构建倒排索引"""
-        print("正在构建文本索引...")
+    def _iter_record_chunks(self, queryset, batch_size):
+        """按主键分页读取 (id, question, answer)，不使用 OFFSET"""
+        last_id = None
+        while True:
+            page = queryset if last_id is None else queryset.filter(id__gt=last_id)
+            chunk = list(page.values_list('id', 'question', 'answer')[:batch_size])
+            if not chunk:
+                return
+            yield chunk
+            last_id = chunk[-1][0]
+    
+    def _save_processed(self, results):
+        """用 bulk_update 写回一批处理结果，并记录数据变更（bulk_update 不触发 post_save 信号）"""
+        if not results:
+            return
+        
+        now = timezone.now()
+        qa_objects = []
+        for qa_id, processed_question, processed_answer, keywords in results:
+            qa = QAData(id=qa_id, processed_question=processed_question,
+                        processed_answer=processed_answer, updated_at=now)
+            qa.set_keywords_list(keywords)
+            qa_objects.append(qa)
+        
+        with transaction.atomic():
+            QAData.objects.bulk_update(
+                qa_objects, ['processed_question', 'processed_answer', 'keywords', 'updated_at']
+            )
+            QADataChangeLog.record([qa.id for qa in qa_objects])
+    
+    def build_index(self, backend=None):
+        """构建检索索引
+
+        backend: 'tfidf' 构建TF-IDF矩阵，'bm25' 构建BM25倒排索引，
+                 默认取 settings.SEARCH_BACKEND
+        """
+        backend = backend or getattr(settings, 'SEARCH_BACKEND', 'tfidf')
+        print(f"正在构建文本索引（{backend}）...")
+        
+        # 先记录数据版本号，构建期间发生的变更会让索引被判定为过期而不是被遗漏
+        data_version = get_data_version()
         
         # 获取所有已处理的问答数据
-        qa_objects = QAData.objects.exclude(processed_question='')
+        qa_objects = QAData.objects.exclude(processed_question='').order_by('id')
         
         # 构建文档集合
         documents = []
         document_ids = []
+        payloads = []
         
         for qa in qa_objects:
             # 合并问题和答案作为一个文档
             doc_text = qa.processed_question + ' ' + qa.processed_answer
             documents.append(doc_text)
             document_ids.append(qa.id)
+            # 载荷随索引一起保存，搜索结果无需再回查数据库
+            payloads.append({field: getattr(qa, field) for field in PAYLOAD_FIELDS})
         
         if not documents:
             print("没有找到已处理的文档")
             return None
         
-        # 使用TF-IDF构建索引
+        if backend == 'bm25':
+            # 文档已经是空格分隔的分词结果，直接建立倒排表
+            index_info = {
+                'backend': 'bm25',
+                'inverted_index': BM25InvertedIndex.build([doc.split() for doc in documents]),
+                'document_ids': np.array(document_ids, dtype=np.int64),
+                'payload_store': PayloadStore.from_records(payloads),
+                'data_version': data_version
+            }
+            print(f"索引构建完成，共索引 {len(documents)} 个文档")
+            return index_info
+        
+        # 使用TF-IDF构建索引（sklearn 导入耗时约1秒，只在构建时导入）
+        from sklearn.feature_extraction.text import TfidfVectorizer
         vectorizer = TfidfVectorizer(
             max_features=10000,
             ngram_range=(1, 2),
@@ -199,48 +322,71 @@ class TextProcessor:
         
         # 保存索引信息
         index_info = {
+            'backend': 'tfidf',
             'vectorizer': vectorizer,
             'tfidf_matrix': tfidf_matrix,
-            'document_ids': document_ids
+            'tfidf_matrix_t': tfidf_matrix.T.tocsr(),
+            'document_ids': np.array(document_ids, dtype=np.int64),
+            'payload_store': PayloadStore.from_records(payloads),
+            'data_version': data_version
         }
         
         print(f"索引构建完成，共索引 {len(documents)} 个文档")
         return index_info
     
-    def search_similar_qa(self, query, index_info, top_k=5):
-        """搜索相似的问答"""
+    def search_similar_qa(self, query, index_info, top_k=5, hydrate='payload', min_similarity=0.0, cache=None):
+        """搜索相似的问答
+
+        hydrate: 'payload' 从索引载荷直接构造结果（不查询数据库），
+                 'db' 一次批量查询取回全部命中行，None 只返回ID和相似度
+        min_similarity: 相似度阈值，只返回高于该值的结果（在Top-K选择阶段过滤）
+        cache: QueryResultCache，按分词结果缓存检索结果，命中时不访问索引
+        """
         if not index_info:
             return []
         
-        vectorizer = index_info['vectorizer']
-        tfidf_matrix = index_info['tfidf_matrix']
-        document_ids = index_info['document_ids']
-        
         # 处理查询文本
         query_words = self.segment_text(query)
-        processed_query = ' '.join(query_words)
-        
-        # 向量化查询
-        query_vector = vectorizer.transform([processed_query])
         
-        # 计算相似度
-        similarities = cosine_similarity(query_vector, tfidf_matrix).flatten()
+        params = {'top_k': top_k, 'hydrate': hydrate, 'min_similarity': min_similarity}
+        if cache is not None and query_words:
+            results = cache.get(query_words, index_info, **params)
+            if results is not None:
+                return results
         
-        # 获取最相似的文档
-        top_indices = similarities.argsort()[-top_k:][::-1]
+        # 在基础索引与增量段中检索（TF-IDF余弦相似度或BM25，由索引的后端决定）
+        hits = search_segments(index_info, query_words, top_k=top_k, threshold=min_similarity)
         
-        results = []
-        for idx in top_indices:
-            if similarities[idx] > 0:  # 只返回有相似度的结果
-                qa_id = document_ids[idx]
-                qa = QAData.objects.get(id=qa_id)
-                results.append({
-                    'qa': qa,
-                    'similarity': float(similarities[idx])
-                })
+        hydrator = ResultHydrator(get_payload_store(index_info))
+        results = hydrator.hydrate(hits, source=hydrate)
         
+        if cache is not None and query_words:
+            cache.set(query_words, index_info, results, **params)
         return results
 
+    def search_similar_qa_batch(self, queries, index_info, top_k=5, hydrate='payload', min_similarity=0.0):
+        """批量搜索相似问答，返回与 queries 一一对应的结果列表（每项格式同 search_similar_qa）
+
+        全部查询在当前进程内分词（请求内不创建进程池），再一次性向量化成稀疏矩阵，与索引分块做稀疏矩阵乘法；
+        所有命中合并后一次装配（载荷存储或一次 in_bulk 查询）。
+        """
+        if not index_info or not queries:
+            return [[] for _ in queries]
+        
+        query_words_list = self.segment_texts(queries)
+        batch_hits = search_segments_batch(index_info, query_words_list, top_k=top_k, threshold=min_similarity)
+        
+        hydrator = ResultHydrator(get_payload_store(index_info))
+        flat_results = hydrator.hydrate([hit for hits in batch_hits for hit in hits], source=hydrate)
+        
+        # 按 (qa_id) 把装配结果分回各个查询（数据库装配时已删除的记录会被跳过）
+        results_by_id = {result['qa_id']: result['qa'] for result in flat_results}
+        return [
+            [{'qa': results_by_id[qa_id], 'qa_id': qa_id, 'similarity': similarity}
+             for _, qa_id, similarity in hits if qa_id in results_by_id]
+            for hits in batch_hits
+        ]
+
 def main():
     """测试数据预处理功能"""
     processor = TextProcessor()
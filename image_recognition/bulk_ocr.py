@@ -0,0 +1,345 @@
+"""
+批量图像识别（历史化验单回填）
+
+从ZIP压缩包或目录中按名称顺序逐张读取图像（ZIP成员按需解压到内存，不落盘），
+每批 OCR_BULK_BATCH_SIZE 张交给并行识别池，结果用 bulk_create 写入 ImageRecognitionResult：
+    - 配置了独立OCR服务（OCR_SERVICE_ADDRESS）时用线程并发提交给服务，由服务端凑批推理
+    - 否则启动 OCR_BULK_WORKERS 个推理进程（spawn），每个进程常驻一套模型，整批调用 predict
+    - 内容哈希已存在（以前识别过）或本次已出现过的图像跳过识别
+    - 按提交顺序写回，每写回一批记录一次断点（已完成的图像数），中断后再次执行从断点继续
+    - 每张图像各阶段耗时写入CSV报告，结束时汇总各阶段平均值与 P50/P95
+命令行：python manage.py bulk_ocr <目录或ZIP>；接口：POST /image/bulk/（作为后台任务执行）
+"""
+import csv
+import json
+import multiprocessing
+import os
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff')
+TIMING_STAGES = ('decode', 'resize', 'preprocess', 'inference', 'postprocess', 'analysis')
+REPORT_FIELDS = ('name', 'status', 'size', 'detections') + TIMING_STAGES + ('total',)
+
+
+def _is_image(name):
+    base = os.path.basename(name)
+    return not base.startswith('.') and base.lower().endswith(IMAGE_EXTENSIONS)
+
+
+class ImageArchive:
+    """ZIP或目录中的全部图像（按名称排序），按需读取单张图像的字节"""
+
+    def __init__(self, source):
+        self.source = os.path.abspath(source)
+        self._zip = None
+        if os.path.isdir(self.source):
+            names = []
+            for root, _, files in os.walk(self.source):
+                for file_name in files:
+                    if _is_image(file_name):
+                        names.append(os.path.relpath(os.path.join(root, file_name), self.source))
+        else:
+            self._zip = zipfile.ZipFile(self.source, 'r')
+            names = [info.filename for info in self._zip.infolist() if not info.is_dir() and _is_image(info.filename)]
+        self.names = sorted(names)
+
+    def read(self, name):
+        if self._zip is not None:
+            return self._zip.read(name)
+        with open(os.path.join(self.source, name), 'rb') as f:
+            return f.read()
+
+    def close(self):
+        if self._zip is not None:
+            self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def recognize_items(engine, items, ocr_results=None):
+    """识别并分析一批 (名称, 图像字节)，返回每张图像的结果字典
+
+    ocr_results: 已由OCR服务识别好的结果，传入时只做文本分析
+    """
+    if ocr_results is None:
+        ocr_results = engine.extract_text_from_images([image_bytes for _, image_bytes in items])
+
+    records = []
+    for (name, image_bytes), ocr_result in zip(items, ocr_results):
+        timings = dict(ocr_result.get('timings', {}))
+        start = time.perf_counter()
+        analysis = engine.analyze_medical_text(ocr_result.get('text', ''))
+        timings['analysis'] = round((time.perf_counter() - start) * 1000, 2)
+        records.append({
+            'name': name,
+            'size': len(image_bytes),
+            'ocr_result': ocr_result,
+            'analysis': analysis,
+            'timings': timings,
+            'error': ocr_result.get('error', ''),
+        })
+    return records
+
+
+# ==================== 并行识别池 ====================
+
+_engine = None
+
+
+def _init_worker():
+    """推理进程初始化：spawn 启动的进程需要重新初始化Django，再加载一次模型"""
+    import django
+    django.setup()
+
+    global _engine
+    from image_recognition.medical_ocr import MedicalOCR
+    _engine = MedicalOCR()
+
+
+def _recognize_worker(items):
+    return recognize_items(_engine, items)
+
+
+_analyzer = None
+
+
+def _recognize_via_service(items):
+    """通过独立OCR服务识别一批图像，文本分析在当前进程完成"""
+    from image_recognition.ocr_service import OCRServiceClient, OCRServiceError
+
+    global _analyzer
+    if _analyzer is None:
+        from image_recognition.medical_ocr import MedicalOCR
+        _analyzer = MedicalOCR(load_model=False)
+
+    client = OCRServiceClient()
+    ocr_results = []
+    for _, image_bytes in items:
+        try:
+            ocr_results.append(client.recognize(image_bytes))
+        except OCRServiceError as e:
+            ocr_results.append({'text': '', 'details': [], 'total_detections': 0, 'error': str(e)})
+    return recognize_items(_analyzer, items, ocr_results)
+
+
+def _create_executor(workers):
+    """创建并行识别池，workers 不大于1且未配置OCR服务时返回 (None, None)，在当前进程内识别"""
+    from image_recognition.ocr_service import get_service_address
+
+    if get_service_address():
+        return ThreadPoolExecutor(max_workers=max(1, workers)), _recognize_via_service
+    if workers > 1:
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+        )
+        return executor, _recognize_worker
+    return None, None
+
+
+# ==================== 断点与报告 ====================
+
+def _load_checkpoint(checkpoint_path, source):
+    if not checkpoint_path or not os.path.exists(checkpoint_path):
+        return 0
+    try:
+        with open(checkpoint_path, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return 0
+    return checkpoint.get('position', 0) if checkpoint.get('source') == source else 0
+
+
+def _save_checkpoint(checkpoint_path, source, position):
+    with open(checkpoint_path, 'w', encoding='utf-8') as f:
+        json.dump({'source': source, 'position': position}, f)
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def summarize_timings(stage_timings):
+    """各阶段耗时（毫秒）的平均值与 P50/P95"""
+    summary = {}
+    for stage, values in stage_timings.items():
+        values = sorted(values)
+        summary[stage] = {
+            'mean': round(sum(values) / len(values), 2) if values else 0.0,
+            'p50': round(_percentile(values, 0.5), 2),
+            'p95': round(_percentile(values, 0.95), 2),
+        }
+    return summary
+
+
+# ==================== 批量识别 ====================
+
+def bulk_recognize(source, workers=None, batch_size=None, checkpoint_path=None, report_path=None,
+                   skip_existing=True, progress_callback=None):
+    """批量识别ZIP或目录中的图像并写入 ImageRecognitionResult，返回汇总统计
+
+    checkpoint_path: 断点文件，每写回一批记录一次进度，中断后再次调用从断点继续，全部完成后删除
+    report_path: 每张图像一行的CSV耗时报告（续跑时追加）
+    skip_existing: 跳过内容哈希已有识别结果的图像
+    progress_callback: 每批写回后调用 progress_callback(已完成数, 总数)
+    """
+    from image_recognition.result_cache import image_content_hash
+    from qa_system.models import ImageRecognitionResult
+
+    workers = workers or getattr(settings, 'OCR_BULK_WORKERS', 2)
+    batch_size = batch_size or getattr(settings, 'OCR_BULK_BATCH_SIZE', 16)
+
+    archive = ImageArchive(source)
+    total = len(archive.names)
+    position = _load_checkpoint(checkpoint_path, archive.source)
+    if position:
+        print(f"从断点继续识别：跳过前 {position} 张图像")
+
+    counts = {'recognized': 0, 'empty': 0, 'failed': 0, 'duplicate': 0}
+    stage_timings = {stage: [] for stage in TIMING_STAGES + ('total',)}
+    seen_hashes = set()
+    start_time = time.time()
+
+    report_file = None
+    report_writer = None
+    if report_path:
+        resume_report = position > 0 and os.path.exists(report_path)
+        report_file = open(report_path, 'a' if resume_report else 'w', encoding='utf-8', newline='')
+        report_writer = csv.DictWriter(report_file, fieldnames=REPORT_FIELDS)
+        if not resume_report:
+            report_writer.writeheader()
+
+    def report(row):
+        if report_writer is not None:
+            report_writer.writerow(row)
+
+    def write_back(end_position, hashes, duplicates, records):
+        objects = []
+        for record in records:
+            ocr_result = record['ocr_result']
+            timings = record['timings']
+            total_ms = round(sum(timings.get(stage, 0.0) for stage in TIMING_STAGES), 2)
+            if record['error']:
+                status = 'failed'
+            else:
+                status = 'recognized' if ocr_result.get('text') else 'empty'
+                confidences = [detail['confidence'] for detail in ocr_result.get('details', [])]
+                objects.append(ImageRecognitionResult(
+                    image_name=record['name'][:200],
+                    extracted_text=ocr_result.get('text', ''),
+                    recognition_details=json.dumps(ocr_result),
+                    analysis_result=json.dumps(record['analysis']),
+                    processing_time=total_ms / 1000,
+                    confidence_score=sum(confidences) / len(confidences) if confidences else 0.0,
+                    content_hash=hashes[record['name']],
+                ))
+                for stage in TIMING_STAGES:
+                    stage_timings[stage].append(timings.get(stage, 0.0))
+                stage_timings['total'].append(total_ms)
+            counts[status] += 1
+            report({
+                'name': record['name'], 'status': status, 'size': record['size'],
+                'detections': ocr_result.get('total_detections', 0),
+                **{stage: timings.get(stage, '') for stage in TIMING_STAGES}, 'total': total_ms,
+            })
+
+        for name in duplicates:
+            counts['duplicate'] += 1
+            report({'name': name, 'status': 'duplicate'})
+
+        ImageRecognitionResult.objects.bulk_create(objects, batch_size=500)
+        if report_file is not None:
+            report_file.flush()
+        if checkpoint_path:
+            _save_checkpoint(checkpoint_path, archive.source, end_position)
+
+        elapsed = time.time() - start_time
+        done = end_position - position
+        rate = done / elapsed if elapsed > 0 else 0.0
+        print(f"已识别 {end_position}/{total} 张图像（{rate:.1f} 张/秒）")
+        if progress_callback:
+            progress_callback(end_position, total)
+
+    executor, task = _create_executor(workers)
+    pending = deque()
+    try:
+        for start in range(position, total, batch_size):
+            names = archive.names[start:start + batch_size]
+            items = []
+            hashes = {}
+            for name in names:
+                image_bytes = archive.read(name)
+                hashes[name] = image_content_hash(image_bytes)
+                items.append((name, image_bytes))
+
+            # 以前识别过的与本次已出现过的图像不再识别
+            existing = set()
+            if skip_existing:
+                existing = set(ImageRecognitionResult.objects.filter(
+                    content_hash__in=list(hashes.values())
+                ).values_list('content_hash', flat=True))
+            duplicates = []
+            todo = []
+            for name, image_bytes in items:
+                if hashes[name] in existing or hashes[name] in seen_hashes:
+                    duplicates.append(name)
+                else:
+                    seen_hashes.add(hashes[name])
+                    todo.append((name, image_bytes))
+
+            end_position = start + len(names)
+            if executor is None:
+                from image_recognition.ocr_pool import get_ocr_pool
+                with get_ocr_pool().engine() as engine:
+                    records = recognize_items(engine, todo) if todo else []
+                write_back(end_position, hashes, duplicates, records)
+                continue
+
+            # 最多保持 2 倍并发数的批次在途，按提交顺序写回，保证断点之前的图像都已写入
+            future = executor.submit(task, todo) if todo else None
+            pending.append((end_position, hashes, duplicates, future))
+            while len(pending) >= workers * 2:
+                end_position, hashes, duplicates, future = pending.popleft()
+                write_back(end_position, hashes, duplicates, future.result() if future else [])
+
+        while pending:
+            end_position, hashes, duplicates, future = pending.popleft()
+            write_back(end_position, hashes, duplicates, future.result() if future else [])
+    finally:
+        if executor is not None:
+            # 中途出错或任务被取消时，尚未开始的批次不再执行
+            for _, _, _, future in pending:
+                if future is not None:
+                    future.cancel()
+            executor.shutdown(wait=True)
+        archive.close()
+        if report_file is not None:
+            report_file.close()
+
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    elapsed = time.time() - start_time
+    processed = total - position
+    summary = {
+        'total': total,
+        'processed': processed,
+        **counts,
+        'elapsed_seconds': round(elapsed, 2),
+        'images_per_second': round(processed / elapsed, 2) if elapsed > 0 else 0.0,
+        'timings_ms': summarize_timings(stage_timings),
+    }
+    print(f"批量识别完成：{json.dumps(summary, ensure_ascii=False)}")
+    return summary
@@ -4,146 +4,350 @@ import cv2
 import numpy as np
 from PIL import Image
 import json
+import time
+from contextlib import contextmanager
 from datetime import datetime
 import base64
 from io import BytesIO
 
-# 添加Django环境
-sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+# 直接作为脚本运行时初始化Django环境（作为模块导入时由调用方负责，导入本模块不再触发 django.setup()）
+if __name__ == '__main__':
+    sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-import django
-django.setup()
+    import django
+    django.setup()
 
+from django.conf import settings
 from qa_system.models import ImageRecognitionResult
-from data_processing.text_processor import TextProcessor
+from data_processing.entity_matcher import get_entity_matcher
+from data_processing.processors import get_text_processor
+
+# 可选的图像预处理步骤
+PREPROCESS_STEPS = ('grayscale', 'denoise', 'threshold', 'morphology')
+
+
+@contextmanager
+def _timed(timings, stage):
+    """记录一个阶段的耗时（毫秒）"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = round((time.perf_counter() - start) * 1000, 2)
+
+
+def _to_gray(image):
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+
+
+def _with_stats(ocr_result, scale, tiles, timings):
+    """在识别结果中记录缩放比例、分块数与各阶段耗时"""
+    ocr_result['scale'] = round(scale, 4)
+    ocr_result['tiles'] = len(tiles)
+    ocr_result['timings'] = timings
+    return ocr_result
+
+
+def _same_detection(text, points, other, min_iou=0.5):
+    """两个检测框文字相同且外接矩形的交并比超过 min_iou 时视为同一处文字"""
+    other_text, other_points = other
+    if text != other_text or not other_points:
+        return False
+    ax0, ay0 = min(x for x, _ in points), min(y for _, y in points)
+    ax1, ay1 = max(x for x, _ in points), max(y for _, y in points)
+    bx0, by0 = min(x for x, _ in other_points), min(y for _, y in other_points)
+    bx1, by1 = max(x for x, _ in other_points), max(y for _, y in other_points)
+    inter = max(0.0, min(ax1, bx1) - max(ax0, bx0)) * max(0.0, min(ay1, by1) - max(ay0, by0))
+    union = (ax1 - ax0) * (ay1 - ay0) + (bx1 - bx0) * (by1 - by0) - inter
+    return union > 0 and inter / union > min_iou
+
+
+def _empty_result(error, timings=None):
+    return {'text': "", 'details': [], 'total_detections': 0, 'error': error, 'timings': timings or {}}
 
-try:
-    from paddleocr import PaddleOCR
-except ImportError:
-    print("PaddleOCR未安装，请运行: pip install paddleocr")
-    PaddleOCR = None
 
 class MedicalOCR:
-    def __init__(self):
-        """初始化医学OCR识别器"""
-        if PaddleOCR is None:
-            raise ImportError("PaddleOCR未安装")
+    def __init__(self, text_processor=None, load_model=True, preprocess_steps=None):
+        """初始化医学OCR识别器
+
+        text_processor: 使用的TextProcessor，默认为进程内共享的实例
+        load_model: 为False时不加载OCR模型，只用于文本分析（analyze_medical_text）
+        preprocess_steps: 送入模型前的预处理步骤，默认使用 settings.OCR_PREPROCESS_STEPS（见 preprocess_image）
+        """
+        if preprocess_steps is None:
+            preprocess_steps = getattr(settings, 'OCR_PREPROCESS_STEPS', ())
+        unknown = [step for step in preprocess_steps if step not in PREPROCESS_STEPS]
+        if unknown:
+            raise ValueError(f"未知的图像预处理步骤: {', '.join(unknown)}")
+        self.preprocess_steps = tuple(preprocess_steps)
+        self.max_side = getattr(settings, 'OCR_MAX_SIDE', 1600)
+        self.tile_aspect_ratio = getattr(settings, 'OCR_TILE_ASPECT_RATIO', 2.0)
+        self.tile_overlap = getattr(settings, 'OCR_TILE_OVERLAP', 128)
         
-        # 初始化PaddleOCR，支持中英文（使用新的参数名）
-        self.ocr = PaddleOCR(use_textline_orientation=True, lang='ch')
-        self.text_processor = TextProcessor()
+        self.ocr = None
+        if load_model:
+            # paddleocr 导入时加载Paddle框架，只在需要加载模型时导入
+            try:
+                from paddleocr import PaddleOCR
+            except ImportError:
+                raise ImportError("PaddleOCR未安装，请运行: pip install paddleocr")
+            
+            # 初始化PaddleOCR，支持中英文（使用新的参数名）
+            self.ocr = PaddleOCR(use_textline_orientation=True, lang='ch')
+        self.text_processor = text_processor or get_text_processor()
         
-    def preprocess_image(self, image_path):
-        """预处理图像以提高OCR效果"""
-        try:
-            # 读取图像
-            if isinstance(image_path, str):
-                image = cv2.imread(image_path)
+    def decode_image(self, image):
+        """把图像路径、文件对象或字节解码为BGR数组，已解码的数组原样返回
+
+        流水线中只解码这一次，预处理与推理共用解码结果；文件对象读完后回到开头，便于之后保存原图。
+        """
+        if isinstance(image, np.ndarray):
+            return image
+        
+        if isinstance(image, str):
+            # np.fromfile + imdecode 可读取包含中文的路径
+            buffer = np.fromfile(image, np.uint8)
+        elif isinstance(image, (bytes, bytearray, memoryview)):
+            buffer = np.frombuffer(image, np.uint8)
+        else:
+            image.seek(0)
+            buffer = np.frombuffer(image.read(), np.uint8)
+            image.seek(0)
+        
+        decoded = cv2.imdecode(buffer, cv2.IMREAD_COLOR) if buffer.size else None
+        if decoded is None:
+            raise ValueError("无法读取图像文件")
+        return decoded
+    
+    def preprocess_image(self, image, steps=None):
+        """按配置的步骤预处理图像，返回送入模型的图像
+
+        steps 默认使用 settings.OCR_PREPROCESS_STEPS，可选 grayscale（灰度）、denoise（中值滤波降噪）、
+        threshold（自适应阈值化）、morphology（闭运算去除噪点），按顺序执行；
+        没有配置步骤时不做任何处理（PaddleOCR 3.0 自带检测与方向分类的预处理）。
+        """
+        steps = self.preprocess_steps if steps is None else steps
+        image = self.decode_image(image)
+        if not steps:
+            return image
+        
+        processed = image
+        for step in steps:
+            if step == 'grayscale':
+                processed = _to_gray(processed)
+            elif step == 'denoise':
+                processed = cv2.medianBlur(processed, 3)
+            elif step == 'threshold':
+                processed = cv2.adaptiveThreshold(
+                    _to_gray(processed), 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
+                )
+            elif step == 'morphology':
+                kernel = np.ones((2, 2), np.uint8)
+                processed = cv2.morphologyEx(processed, cv2.MORPH_CLOSE, kernel)
             else:
-                # 如果是文件对象，先保存为临时文件
-                image = cv2.imdecode(np.frombuffer(image_path.read(), np.uint8), cv2.IMREAD_COLOR)
-            
-            if image is None:
-                raise ValueError("无法读取图像文件")
-            
-            # 转换为灰度图
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            
-            # 降噪
-            denoised = cv2.medianBlur(gray, 3)
-            
-            # 自适应阈值化
-            thresh = cv2.adaptiveThreshold(
-                denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
+                raise ValueError(f"未知的图像预处理步骤: {step}")
+        
+        # 检测模型需要三通道输入
+        if processed.ndim == 2:
+            processed = cv2.cvtColor(processed, cv2.COLOR_GRAY2BGR)
+        return processed
+    
+    def resize_and_tile(self, image):
+        """自适应缩放与分块，返回 (缩放比例, [(分块在缩放后图像中的y偏移, 分块), ...])
+
+        普通图像把长边限制在 max_side 以内（只缩小不放大）；
+        高宽比超过 tile_aspect_ratio 的长图（化验单长截图、多页扫描）只按宽度缩放，保证文字不被缩得过小，
+        再沿高度切成高 max_side、相邻重叠 tile_overlap 像素的分块，单次推理的耗时和内存都有上限。
+        """
+        height, width = image.shape[:2]
+        tall = height > width * self.tile_aspect_ratio
+        scale = min(1.0, self.max_side / (width if tall else max(height, width)))
+        if scale < 1.0:
+            image = cv2.resize(
+                image, (max(1, round(width * scale)), max(1, round(height * scale))),
+                interpolation=cv2.INTER_AREA
             )
+        
+        height = image.shape[0]
+        if not tall or height <= self.max_side:
+            return scale, [(0, image)]
+        
+        stride = max(1, self.max_side - self.tile_overlap)
+        tiles = []
+        for top in range(0, height, stride):
+            bottom = min(top + self.max_side, height)
+            tiles.append((top, image[top:bottom]))
+            if bottom >= height:
+                break
+        return scale, tiles
+    
+    def merge_tile_results(self, pages, tiles, scale):
+        """合并各分块的识别结果，检测框坐标换算回原图
+
+        重叠区内的文字会在相邻两个分块中各被识别一次：每个检测框只归属于其中心所在的分块
+        （以重叠区中线为界），再去掉与上一分块中文字相同且位置重合的检测框。
+        """
+        details = []
+        previous = []
+        last = len(tiles) - 1
+        for n, (page, (top, tile)) in enumerate(zip(pages, tiles)):
+            lower = top + self.tile_overlap / 2 if n > 0 else float('-inf')
+            upper = top + tile.shape[0] - self.tile_overlap / 2 if n < last else float('inf')
             
-            # 形态学操作去除噪点
-            kernel = np.ones((1, 1), np.uint8)
-            processed = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
-            
-            return processed
+            current = []
+            for detail in self.parse_ocr_result(page)['details']:
+                points = [[float(x), float(y) + top] for x, y in detail['bbox']]
+                if points:
+                    center_y = sum(y for _, y in points) / len(points)
+                    if not lower <= center_y < upper:
+                        continue
+                    if any(_same_detection(detail['text'], points, other) for other in previous):
+                        continue
+                current.append((detail, points))
             
-        except Exception as e:
-            print(f"图像预处理错误: {e}")
-            return None
+            for detail, points in current:
+                detail['bbox'] = [[round(x / scale, 1), round(y / scale, 1)] for x, y in points]
+                details.append(detail)
+            previous = [(detail['text'], points) for detail, points in current]
+        
+        return {
+            'text': " ".join(detail['text'] for detail in details),
+            'details': details,
+            'total_detections': len(details)
+        }
     
     def extract_text_from_image(self, image_path):
-        """从图像中提取文字"""
+        """从图像中提取文字
+
+        流水线：解码（只解码一次）-> 缩放/分块 -> 可选预处理 -> 推理 -> 合并整理结果，
+        各阶段耗时（毫秒）写入结果的 timings
+        """
+        timings = {}
         try:
-            # 预处理图像
-            processed_image = self.preprocess_image(image_path)
-            
-            # 直接使用原图像，因为PaddleOCR 3.0有更好的预处理
-            if isinstance(image_path, str):
-                result = self.ocr.ocr(image_path)
-            else:
-                image_path.seek(0)
-                image_array = np.frombuffer(image_path.read(), np.uint8)
-                image = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
-                result = self.ocr.ocr(image)
-            
-            # 提取文字内容 - 适配PaddleOCR 3.0新格式
-            extracted_text = ""
-            detection_results = []
-            
-            if result and len(result) > 0:
-                ocr_result = result[0]  # 获取第一页的结果
-                
-                # 检查新的数据结构
-                if isinstance(ocr_result, dict) and 'rec_texts' in ocr_result:
-                    rec_texts = ocr_result.get('rec_texts', [])
-                    rec_scores = ocr_result.get('rec_scores', [])
-                    rec_polys = ocr_result.get('rec_polys', [])
-                    
-                    for i, text in enumerate(rec_texts):
-                        if i < len(rec_scores):
-                            confidence = rec_scores[i]
-                            # 只保留置信度较高的文字
-                            if confidence > 0.5:
-                                extracted_text += text + " "
-                                bbox = rec_polys[i] if i < len(rec_polys) else []
-                                detection_results.append({
-                                    'text': text,
-                                    'confidence': confidence,
-                                    'bbox': bbox.tolist() if hasattr(bbox, 'tolist') else bbox
-                                })
-                else:
-                    # 兼容旧格式（如果还有的话）
-                    if isinstance(ocr_result, list):
-                        for line in ocr_result:
-                            if line and len(line) >= 2:
-                                bbox = line[0]
-                                text_info = line[1]
-                                
-                                if text_info and len(text_info) >= 2:
-                                    text = text_info[0]
-                                    confidence = text_info[1]
-                                    
-                                    if confidence > 0.5:
-                                        extracted_text += text + " "
-                                        detection_results.append({
-                                            'text': text,
-                                            'confidence': confidence,
-                                            'bbox': bbox
-                                        })
-            
-            return {
-                'text': extracted_text.strip(),
-                'details': detection_results,
-                'total_detections': len(detection_results)
-            }
+            with _timed(timings, 'decode'):
+                image = self.decode_image(image_path)
+            with _timed(timings, 'resize'):
+                scale, tiles = self.resize_and_tile(image)
+            with _timed(timings, 'preprocess'):
+                tiles = [(top, self.preprocess_image(tile)) for top, tile in tiles]
+            with _timed(timings, 'inference'):
+                pages = [self._infer(tile) for _, tile in tiles]
+            with _timed(timings, 'postprocess'):
+                ocr_result = self.merge_tile_results(pages, tiles, scale)
+            return _with_stats(ocr_result, scale, tiles, timings)
             
         except Exception as e:
             print(f"OCR识别错误: {e}")
             import traceback
             traceback.print_exc()
-            return {
-                'text': "",
-                'details': [],
-                'total_detections': 0,
-                'error': str(e)
-            }
+            return _empty_result(str(e), timings)
+    
+    def _infer(self, image):
+        """单张图像推理，返回PaddleOCR的单页结果"""
+        result = self.ocr.ocr(image)
+        return result[0] if result else None
+    
+    def parse_ocr_result(self, ocr_result):
+        """把PaddleOCR单张图像的结果整理为 {'text', 'details', 'total_detections'}"""
+        # 提取文字内容 - 适配PaddleOCR 3.0新格式
+        extracted_text = ""
+        detection_results = []
+        
+        if ocr_result is not None:
+            # 检查新的数据结构
+            if isinstance(ocr_result, dict) and 'rec_texts' in ocr_result:
+                rec_texts = ocr_result.get('rec_texts', [])
+                rec_scores = ocr_result.get('rec_scores', [])
+                rec_polys = ocr_result.get('rec_polys', [])
+        
+                for i, text in enumerate(rec_texts):
+                    if i < len(rec_scores):
+                        confidence = rec_scores[i]
+                        # 只保留置信度较高的文字
+                        if confidence > 0.5:
+                            extracted_text += text + " "
+                            bbox = rec_polys[i] if i < len(rec_polys) else []
+                            detection_results.append({
+                                'text': text,
+                                'confidence': confidence,
+                                'bbox': bbox.tolist() if hasattr(bbox, 'tolist') else bbox
+                            })
+            else:
+                # 兼容旧格式（如果还有的话）
+                if isinstance(ocr_result, list):
+                    for line in ocr_result:
+                        if line and len(line) >= 2:
+                            bbox = line[0]
+                            text_info = line[1]
+        
+                            if text_info and len(text_info) >= 2:
+                                text = text_info[0]
+                                confidence = text_info[1]
+        
+                                if confidence > 0.5:
+                                    extracted_text += text + " "
+                                    detection_results.append({
+                                        'text': text,
+                                        'confidence': confidence,
+                                        'bbox': bbox
+                                    })
+        
+        return {
+            'text': extracted_text.strip(),
+            'details': detection_results,
+            'total_detections': len(detection_results)
+        }
+    
+    def extract_text_from_images(self, images):
+        """批量识别多张图像（图像路径、字节或已解码的数组），返回与输入一一对应的结果列表
+
+        每张图像解码、缩放分块、预处理一次；PaddleOCR 支持 predict 批量输入时一次推理所有图像的全部分块
+        （各图像的 inference 耗时按分块数均摊整批耗时），否则逐块识别；
+        无法解码或识别失败的图像返回带 error 的空结果。
+        """
+        results = [None] * len(images)
+        timings = [{} for _ in images]
+        prepared = []
+        for i, image in enumerate(images):
+            try:
+                with _timed(timings[i], 'decode'):
+                    image = self.decode_image(image)
+                with _timed(timings[i], 'resize'):
+                    scale, tiles = self.resize_and_tile(image)
+                with _timed(timings[i], 'preprocess'):
+                    tiles = [(top, self.preprocess_image(tile)) for top, tile in tiles]
+                prepared.append((i, scale, tiles))
+            except Exception as e:
+                results[i] = _empty_result(str(e), timings[i])
+        
+        if prepared and hasattr(self.ocr, 'predict'):
+            try:
+                start = time.perf_counter()
+                pages = list(self.ocr.predict([tile for _, _, tiles in prepared for _, tile in tiles]))
+                tile_ms = (time.perf_counter() - start) * 1000 / max(1, len(pages))
+                offset = 0
+                for i, scale, tiles in prepared:
+                    timings[i]['inference'] = round(tile_ms * len(tiles), 2)
+                    with _timed(timings[i], 'postprocess'):
+                        ocr_result = self.merge_tile_results(pages[offset:offset + len(tiles)], tiles, scale)
+                    results[i] = _with_stats(ocr_result, scale, tiles, timings[i])
+                    offset += len(tiles)
+                return results
+            except Exception as e:
+                print(f"批量OCR识别失败，改为逐张识别: {e}")
+        
+        for i, scale, tiles in prepared:
+            try:
+                with _timed(timings[i], 'inference'):
+                    pages = [self._infer(tile) for _, tile in tiles]
+                with _timed(timings[i], 'postprocess'):
+                    ocr_result = self.merge_tile_results(pages, tiles, scale)
+                results[i] = _with_stats(ocr_result, scale, tiles, timings[i])
+            except Exception as e:
+                print(f"OCR识别错误: {e}")
+                results[i] = _empty_result(str(e), timings[i])
+        return results
     
     def analyze_medical_text(self, extracted_text):
         """分析识别出的医疗文本"""
@@ -183,31 +387,11 @@ class MedicalOCR:
             }
     
     def extract_medical_entities(self, text):
-        """提取医学实体（简单实现）"""
-        medical_entities = []
-        
-        # 常见医学术语
-        medical_terms = {
-            '疾病': ['感冒', '发烧', '咳嗽', '头痛', '胸痛', '腹痛', '高血压', '糖尿病', '心脏病', '肺炎'],
-            '症状': ['疼痛', '发热', '恶心', '呕吐', '腹泻', '便秘', '失眠', '头晕', '乏力', '食欲不振'],
-            '药物': ['阿司匹林', '青霉素', '布洛芬', '对乙酰氨基酚', '甲硝唑', '氨氯地平', '二甲双胍'],
-            '检查': ['血常规', 'X光', 'CT', 'MRI', 'B超', '心电图', '血压', '血糖', '尿常规'],
-            '治疗': ['手术', '化疗', '放疗', '物理治疗', '针灸', '按摩', '康复训练']
-        }
-        
-        for category, terms in medical_terms.items():
-            found_terms = []
-            for term in terms:
-                if term in text:
-                    found_terms.append(term)
-            
-            if found_terms:
-                medical_entities.append({
-                    'category': category,
-                    'entities': found_terms
-                })
-        
-        return medical_entities
+        """提取医学实体（共享医学词库，一次扫描文本）"""
+        return [
+            {'category': category, 'entities': entities}
+            for category, entities in get_entity_matcher().extract(text).items()
+        ]
     
     def generate_suggestions(self, text, medical_entities):
         """根据识别的内容生成建议"""
@@ -238,11 +422,17 @@ class MedicalOCR:
         
         return suggestions
     
-    def process_medical_image(self, image_file, image_name="医学图像"):
-        """完整的医学图像处理流程"""
+    def process_medical_image(self, image_file, image_name="医学图像", ocr_result=None):
+        """完整的医学图像处理流程
+
+        ocr_result: 已由OCR服务识别好的结果，传入时跳过本地识别，只做文本分析与保存
+        """
         try:
             # 1. OCR文字识别
-            ocr_result = self.extract_text_from_image(image_file)
+            if ocr_result is None:
+                ocr_result = self.extract_text_from_image(image_file)
+            timings = dict(ocr_result.get('timings', {}))
+            analysis_start = time.perf_counter()
             
             # 2. 文本分析
             if ocr_result['text']:
@@ -254,6 +444,7 @@ class MedicalOCR:
                     'medical_entities': [],
                     'suggestions': ['图像可能不包含文字，或文字不够清晰']
                 }
+            timings['analysis'] = round((time.perf_counter() - analysis_start) * 1000, 2)
             
             # 3. 生成结果摘要
             result = {
@@ -261,6 +452,7 @@ class MedicalOCR:
                 'ocr_result': ocr_result,
                 'text_analysis': text_analysis,
                 'processing_time': datetime.now().isoformat(),
+                'timings': timings,
                 'success': len(ocr_result['text']) > 0
             }
             
@@ -0,0 +1,102 @@
+"""
+OCR引擎池
+
+PaddleOCR 初始化需要加载检测、识别与方向分类三个模型，耗时远大于单张图像的推理。
+每个进程维护一个有上限的引擎池：引擎在首次需要（或服务启动预加载）时创建，之后反复借出/归还，
+请求的处理耗时只包含推理本身。PaddleOCR 实例不是线程安全的，同一引擎同一时刻只借给一个请求。
+"""
+import queue
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+class OCRPoolTimeout(Exception):
+    """等待空闲引擎超时"""
+
+
+class OCREnginePool:
+    """MedicalOCR 引擎池"""
+
+    def __init__(self, size=None, factory=None):
+        self.size = max(1, size or getattr(settings, 'OCR_POOL_SIZE', 1))
+        self.factory = factory or _create_engine
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def preload(self, count=None):
+        """预先创建引擎（默认创建到池的上限），返回池中引擎总数"""
+        count = self.size if count is None else min(count, self.size)
+        while True:
+            with self._lock:
+                if self._created >= count:
+                    return self._created
+                self._created += 1
+            try:
+                self._idle.put(self.factory())
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+    def checkout(self, timeout=None):
+        """借出一个引擎：优先取空闲引擎，未达上限时新建，否则等待归还"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+        if can_create:
+            try:
+                return self.factory()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise OCRPoolTimeout(f"等待OCR引擎超时（{timeout} 秒）")
+
+    def checkin(self, engine):
+        """归还引擎"""
+        self._idle.put(engine)
+
+    @contextmanager
+    def engine(self, timeout=None):
+        """with pool.engine() as ocr: ...  用完自动归还"""
+        ocr = self.checkout(timeout)
+        try:
+            yield ocr
+        finally:
+            self.checkin(ocr)
+
+    def stats(self):
+        return {'size': self.size, 'created': self._created, 'idle': self._idle.qsize()}
+
+
+def _create_engine():
+    # 池内引擎共用进程内共享的TextProcessor（分词与关键词提取不依赖引擎状态）
+    from image_recognition.medical_ocr import MedicalOCR
+    return MedicalOCR()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_ocr_pool():
+    """获取进程内唯一的OCR引擎池"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = OCREnginePool()
+    return _pool
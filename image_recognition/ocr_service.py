@@ -0,0 +1,284 @@
+"""
+独立的OCR推理服务
+
+Web进程不再在请求线程里执行PaddleOCR推理，而是把图像提交给本机的OCR服务并等待结果：
+    - 服务进程监听 settings.OCR_SERVICE_ADDRESS（TCP地址元组或Unix socket路径），
+      每个连接一个线程，收到的图像分配给在途任务最少的推理进程
+    - N 个推理进程（settings.OCR_SERVICE_WORKERS）各自常驻一套模型、各有一个任务队列，
+      在一个很短的时间窗口内（OCR_BATCH_WINDOW）凑满一批（OCR_BATCH_SIZE）后一次推理
+    - 推理结果经结果队列回到服务进程，再按任务ID发回对应连接
+    - 每个任务最多等待 OCR_SERVICE_TIMEOUT 秒，超时返回错误；监控线程发现推理进程退出时，
+      分配给它的任务立即返回错误，并启动新的推理进程
+启动：python manage.py run_ocr_service
+"""
+import itertools
+import multiprocessing
+import queue
+import threading
+import time
+from multiprocessing.connection import Listener, Client
+
+from django.conf import settings
+
+
+class OCRServiceError(Exception):
+    """OCR服务不可用"""
+
+
+class OCRServiceTimeout(OCRServiceError):
+    """等待OCR结果超时"""
+
+
+# 服务端错误回复：{'error': 说明, 'error_type': 类型}，客户端据此抛出对应异常
+ERROR_TIMEOUT = 'timeout'
+ERROR_INVALID = 'invalid'
+ERROR_WORKER = 'worker'
+
+# 检查推理进程存活的间隔（秒）
+MONITOR_INTERVAL = 1.0
+
+
+def _error_reply(error_type, message):
+    return {'error': message, 'error_type': error_type}
+
+
+def get_service_address():
+    """读取OCR服务地址，未配置时返回None（在Web进程内识别）"""
+    address = getattr(settings, 'OCR_SERVICE_ADDRESS', None)
+    if isinstance(address, list):
+        address = tuple(address)
+    return address
+
+
+def _get_authkey():
+    return settings.SECRET_KEY.encode('utf-8')
+
+
+def _worker_main(task_queue, result_queue, batch_size, batch_window):
+    """推理进程：加载一次模型，按时间窗口凑批推理"""
+    # spawn 启动的进程需要重新初始化Django（导入识别模块不再隐式调用 django.setup()）
+    import django
+    django.setup()
+
+    from image_recognition.medical_ocr import MedicalOCR
+
+    ocr = MedicalOCR()
+    print(f"OCR推理进程已就绪（pid {multiprocessing.current_process().pid}）")
+
+    running = True
+    while running:
+        task = task_queue.get()
+        if task is None:
+            break
+
+        batch = [task]
+        deadline = time.time() + batch_window
+        while len(batch) < batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                task = task_queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if task is None:
+                running = False
+                break
+            batch.append(task)
+
+        try:
+            results = ocr.extract_text_from_images([image_bytes for _, image_bytes in batch])
+        except Exception as e:
+            print(f"OCR推理失败: {e}")
+            results = [_error_reply(ERROR_WORKER, f'OCR推理失败: {e}')] * len(batch)
+        for (task_id, _), result in zip(batch, results):
+            result_queue.put((task_id, result))
+
+
+class OCRService:
+    """OCR服务端：连接线程 + 推理进程池"""
+
+    def __init__(self, address=None, workers=None, batch_size=None, batch_window=None):
+        self.address = address or get_service_address() or ('127.0.0.1', 8765)
+        self.workers = workers or getattr(settings, 'OCR_SERVICE_WORKERS', 2)
+        self.batch_size = batch_size or getattr(settings, 'OCR_BATCH_SIZE', 4)
+        self.batch_window = batch_window if batch_window is not None else getattr(settings, 'OCR_BATCH_WINDOW', 0.02)
+
+        self.timeout = getattr(settings, 'OCR_SERVICE_TIMEOUT', 60)
+
+        # 推理进程使用 spawn 启动（见 data_processing.segment_pool.create_pool）
+        self._context = multiprocessing.get_context('spawn')
+        self.result_queue = self._context.Queue()
+        # 每个推理进程一个任务队列：进程异常退出时只需替换它自己的队列，并能确定哪些任务受影响
+        self.task_queues = [None] * self.workers
+        self.processes = [None] * self.workers
+
+        self._task_ids = itertools.count(1)
+        # 任务ID -> (完成事件, 结果槽, 推理进程序号)；推理进程序号 -> 在途任务ID集合
+        self._pending = {}
+        self._assigned = [set() for _ in range(self.workers)]
+        self._pending_lock = threading.Lock()
+        self.restarts = 0
+
+    def _start_worker(self, index):
+        task_queue = self._context.Queue()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(task_queue, self.result_queue, self.batch_size, self.batch_window),
+            daemon=True,
+        )
+        process.start()
+        self.task_queues[index] = task_queue
+        self.processes[index] = process
+
+    def serve_forever(self):
+        for index in range(self.workers):
+            self._start_worker(index)
+        threading.Thread(target=self._dispatch_results, daemon=True).start()
+        threading.Thread(target=self._monitor_workers, daemon=True).start()
+
+        with Listener(self.address, authkey=_get_authkey()) as listener:
+            print(f"OCR服务已启动: {self.address}，{self.workers} 个推理进程，"
+                  f"批大小 {self.batch_size}，窗口 {self.batch_window * 1000:.0f} ms")
+            try:
+                while True:
+                    try:
+                        conn = listener.accept()
+                    except Exception as e:
+                        print(f"OCR服务接受连接失败: {e}")
+                        continue
+                    threading.Thread(target=self._handle_connection, args=(conn,), daemon=True).start()
+            finally:
+                self.shutdown()
+
+    def shutdown(self):
+        for task_queue in self.task_queues:
+            if task_queue is not None:
+                task_queue.put(None)
+        for process in self.processes:
+            if process is not None:
+                process.join(timeout=5)
+
+    def submit(self, image_bytes):
+        """提交一张图像（分配给在途任务最少的推理进程），返回 (任务ID, 完成事件, 结果槽)"""
+        task_id = next(self._task_ids)
+        done = threading.Event()
+        slot = {}
+        with self._pending_lock:
+            index = min(range(self.workers), key=lambda i: len(self._assigned[i]))
+            self._pending[task_id] = (done, slot, index)
+            self._assigned[index].add(task_id)
+            task_queue = self.task_queues[index]
+        task_queue.put((task_id, image_bytes))
+        return task_id, done, slot
+
+    def cancel(self, task_id):
+        """放弃等待一个任务（超时后调用），迟到的结果会被丢弃"""
+        with self._pending_lock:
+            waiter = self._pending.pop(task_id, None)
+            if waiter is not None:
+                self._assigned[waiter[2]].discard(task_id)
+
+    def _complete(self, task_id, result):
+        with self._pending_lock:
+            waiter = self._pending.pop(task_id, None)
+            if waiter is not None:
+                self._assigned[waiter[2]].discard(task_id)
+        if waiter is not None:
+            done, slot, _ = waiter
+            slot['result'] = result
+            done.set()
+
+    def _dispatch_results(self):
+        while True:
+            task_id, result = self.result_queue.get()
+            self._complete(task_id, result)
+
+    def _monitor_workers(self):
+        """推理进程异常退出（崩溃、被杀）时，分配给它的任务返回错误，并启动新的推理进程"""
+        while True:
+            time.sleep(MONITOR_INTERVAL)
+            for index, process in enumerate(self.processes):
+                if process is None or process.is_alive():
+                    continue
+                print(f"OCR推理进程 {process.pid} 已退出（exitcode {process.exitcode}），正在重启")
+                with self._pending_lock:
+                    lost = list(self._assigned[index])
+                for task_id in lost:
+                    self._complete(task_id, _error_reply(ERROR_WORKER, 'OCR推理进程异常退出'))
+                self._start_worker(index)
+                self.restarts += 1
+
+    def _handle_connection(self, conn):
+        with conn:
+            while True:
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    return
+
+                if isinstance(message, dict) and message.get('type') == 'ping':
+                    alive = sum(1 for process in self.processes if process is not None and process.is_alive())
+                    reply = {'ok': True, 'workers': self.workers, 'alive': alive, 'restarts': self.restarts}
+                else:
+                    reply = self._recognize(message)
+                try:
+                    conn.send(reply)
+                except (EOFError, OSError):
+                    # 客户端已超时断开，结果丢弃
+                    return
+
+    def _recognize(self, message):
+        """校验请求并等待识别结果，出错时返回错误回复（不中断连接）"""
+        image_bytes = message.get('image') if isinstance(message, dict) else None
+        if not isinstance(image_bytes, (bytes, bytearray)) or not image_bytes:
+            return _error_reply(ERROR_INVALID, '请求中缺少图像数据')
+
+        task_id, done, slot = self.submit(bytes(image_bytes))
+        if not done.wait(self.timeout):
+            self.cancel(task_id)
+            return _error_reply(ERROR_TIMEOUT, f'OCR识别超时（{self.timeout} 秒）')
+        return slot['result']
+
+
+class OCRServiceClient:
+    """OCR服务客户端（Web进程使用），每次识别建立一个短连接"""
+
+    def __init__(self, address=None):
+        self.address = address or get_service_address()
+
+    def recognize(self, image_bytes, timeout=None):
+        """提交图像字节并等待OCR结果（格式同 MedicalOCR.extract_text_from_image）"""
+        timeout = timeout or getattr(settings, 'OCR_SERVICE_TIMEOUT', 60)
+        conn = self._connect()
+        try:
+            conn.send({'type': 'ocr', 'image': image_bytes})
+            if not conn.poll(timeout):
+                raise OCRServiceTimeout(f"OCR识别超时（{timeout} 秒）")
+            result = conn.recv()
+        except (EOFError, OSError) as e:
+            raise OCRServiceError(f"OCR服务连接中断: {e}")
+        finally:
+            conn.close()
+
+        if isinstance(result, dict) and 'error_type' in result:
+            if result['error_type'] == ERROR_TIMEOUT:
+                raise OCRServiceTimeout(result['error'])
+            raise OCRServiceError(result['error'])
+        return result
+
+    def ping(self, timeout=2):
+        conn = self._connect()
+        try:
+            conn.send({'type': 'ping'})
+            return conn.recv() if conn.poll(timeout) else None
+        finally:
+            conn.close()
+
+    def _connect(self):
+        if not self.address:
+            raise OCRServiceError("未配置OCR服务地址")
+        try:
+            return Client(self.address, authkey=_get_authkey())
+        except OSError as e:
+            raise OCRServiceError(f"无法连接OCR服务 {self.address}: {e}")
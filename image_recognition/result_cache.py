@@ -0,0 +1,138 @@
+"""
+图像识别结果缓存
+
+同一张化验单照片经常被反复上传，识别结果按图像内容寻址复用：
+    - 每条 ImageRecognitionResult 记录图像字节的 SHA-256（content_hash，带索引），
+      再次上传相同的图像时直接返回已保存的识别文本、识别详情与分析结果，不再OCR
+      （未识别出文本的结果同样复用，同一张空白图像不会反复识别）
+    - settings.OCR_CACHE_PERCEPTUAL 为True时另外记录64位差值哈希（perceptual_hash），
+      重新拍照、压缩等近似重复的图像在汉明距离不超过 OCR_CACHE_PERCEPTUAL_DISTANCE 时也视为命中
+    - 超过 OCR_CACHE_TTL 的结果不再命中；保存的图像文件按 TTL 与总大小上限（OCR_CACHE_MAX_BYTES）
+      从最旧的开始删除（识别记录本身保留）
+"""
+import hashlib
+import threading
+import time
+from datetime import timedelta
+
+import cv2
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from qa_system.models import ImageRecognitionResult
+
+
+def image_content_hash(image_bytes):
+    """图像字节的SHA-256"""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def perceptual_hash(image_bytes):
+    """64位差值哈希（dHash）：灰度缩放到 9x8 后比较相邻像素，无法解码时返回空字符串"""
+    image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        return ''
+    small = cv2.resize(image, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return f"{int(''.join('1' if bit else '0' for bit in bits), 2):016x}"
+
+
+def hamming_distance(hash_a, hash_b):
+    return bin(int(hash_a, 16) ^ int(hash_b, 16)).count('1')
+
+
+class OCRResultCache:
+    """按图像内容查找已有的识别结果，并回收过期/超量的图像文件"""
+
+    def __init__(self, ttl=None, max_bytes=None, perceptual=None, max_distance=None):
+        self.ttl = ttl or getattr(settings, 'OCR_CACHE_TTL', 7 * 24 * 3600)
+        self.max_bytes = max_bytes or getattr(settings, 'OCR_CACHE_MAX_BYTES', 1024 * 1024 * 1024)
+        self.perceptual = perceptual if perceptual is not None else getattr(settings, 'OCR_CACHE_PERCEPTUAL', False)
+        self.max_distance = max_distance if max_distance is not None else getattr(settings, 'OCR_CACHE_PERCEPTUAL_DISTANCE', 4)
+        # 近似匹配时比较的最近记录数上限
+        self.perceptual_candidates = getattr(settings, 'OCR_CACHE_PERCEPTUAL_CANDIDATES', 1000)
+        self.evict_interval = getattr(settings, 'OCR_CACHE_EVICT_INTERVAL', 300)
+
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._evicted_at = 0.0
+
+    def fingerprint(self, image_bytes):
+        """计算图像的 (内容哈希, 感知哈希)，未启用近似匹配时感知哈希为空"""
+        return image_content_hash(image_bytes), perceptual_hash(image_bytes) if self.perceptual else ''
+
+    def lookup(self, content_hash, phash=''):
+        """查找TTL内相同（或近似）图像的识别结果，未命中时返回None"""
+        recent = ImageRecognitionResult.objects.filter(
+            created_at__gte=timezone.now() - timedelta(seconds=self.ttl)
+        )
+
+        result = recent.filter(content_hash=content_hash).first()
+        if result is None and phash:
+            candidates = recent.exclude(perceptual_hash='').values_list('id', 'perceptual_hash')
+            for result_id, candidate in candidates[:self.perceptual_candidates]:
+                if hamming_distance(phash, candidate) <= self.max_distance:
+                    result = ImageRecognitionResult.objects.get(id=result_id)
+                    break
+
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return result
+
+    def evict(self, force=False):
+        """删除过期或超出总大小上限的图像文件（按 evict_interval 节流），返回删除的文件数"""
+        now = time.time()
+        with self._lock:
+            if not force and now - self._evicted_at < self.evict_interval:
+                return 0
+            self._evicted_at = now
+
+        stored = ImageRecognitionResult.objects.exclude(image_file='').exclude(image_file__isnull=True)
+        expired_before = timezone.now() - timedelta(seconds=self.ttl)
+
+        evicted = []
+        total_bytes = 0
+        for result in stored.only('id', 'image_file', 'image_size', 'created_at').order_by('-created_at'):
+            total_bytes += result.image_size
+            if result.created_at < expired_before or total_bytes > self.max_bytes:
+                evicted.append(result)
+
+        for result in evicted:
+            try:
+                result.image_file.delete(save=False)
+            except Exception as e:
+                print(f"删除图像文件 {result.image_file.name} 失败: {e}")
+                continue
+            ImageRecognitionResult.objects.filter(id=result.id).update(image_file='', image_size=0)
+
+        if evicted:
+            print(f"识别结果缓存回收了 {len(evicted)} 个图像文件")
+        return len(evicted)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            'perceptual': self.perceptual,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """获取进程内唯一的识别结果缓存"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = OCRResultCache()
+    return _cache
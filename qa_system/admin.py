@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import QAData, Document, ChatSession, ChatMessage, TextMiningResult, CrawlerLog
+from .models import QAData, Document, ChatSession, ChatMessage, TextMiningResult, CrawlerLog, Job
 
 @admin.register(QAData)
 class QADataAdmin(admin.ModelAdmin):
@@ -51,7 +51,7 @@ class TextMiningResultAdmin(admin.ModelAdmin):
 
 @admin.register(CrawlerLog)
 class CrawlerLogAdmin(admin.ModelAdmin):
-    list_display = ('id', 'task_name', 'status', 'total_count', 'success_count', 'start_time', 'end_time')
+    list_display = ('id', 'task_name', 'status', 'total_count', 'success_count', 'duplicate_count', 'start_time', 'end_time')
     list_filter = ('status', 'start_time')
     search_fields = ('task_name',)
     readonly_fields = ('start_time', 'end_time')
@@ -60,3 +60,9 @@ class CrawlerLogAdmin(admin.ModelAdmin):
         if obj:  # 编辑现有对象
             return self.readonly_fields + ('task_name',)
         return self.readonly_fields
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'job_type', 'status', 'progress', 'cancel_requested', 'created_at', 'finished_at')
+    list_filter = ('job_type', 'status', 'created_at')
+    readonly_fields = ('created_at', 'started_at', 'finished_at')
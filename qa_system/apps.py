@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class QaSystemConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'qa_system'
+
+    def ready(self):
+        # 注册QAData变更信号，用于维护搜索索引的数据版本号
+        from . import signals  # noqa: F401
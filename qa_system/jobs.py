@@ -0,0 +1,400 @@
+"""
+后台任务
+
+耗时操作注册为任务处理函数，提交后立即返回 Job 记录，由以下执行器之一运行：
+    - thread：Web进程内的后台线程池（默认，无需额外部署）
+    - worker：任务留在数据库中等待，由 python manage.py run_job_worker 启动的本地进程领取执行
+领取任务使用带状态条件的 UPDATE（只有 pending 状态能被改成 running），多个进程同时领取也只有一个成功。
+处理函数通过 JobContext 汇报进度；请求取消后，下一次汇报进度时抛出 JobCancelled 结束任务。
+领取任务时记录执行进程（主机名:进程号:进程启动时间），进程重启后由 recover_jobs() 收尾上一个进程遗留的任务；
+Web进程启动时通过 recover_jobs_once() 调用，同一台机器上只由一个进程执行。
+"""
+import os
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+from django.utils import timezone
+
+from .models import Job
+
+# 任务类型 -> 处理函数 handler(context, **params)
+JOB_HANDLERS = {}
+
+# 进度写入数据库的最小间隔（秒）
+PROGRESS_INTERVAL = 0.5
+
+
+class JobCancelled(Exception):
+    """任务已被请求取消"""
+
+
+def register_job(job_type):
+    """注册任务处理函数"""
+    def decorator(handler):
+        JOB_HANDLERS[job_type] = handler
+        return handler
+    return decorator
+
+
+class JobContext:
+    """传给任务处理函数的上下文：汇报进度、检查取消"""
+
+    def __init__(self, job):
+        self.job = job
+        self._reported_at = 0.0
+
+    def progress(self, done, total=None, message=''):
+        """汇报进度（done/total 或直接传 0~1 的比例），写库有节流；任务已被请求取消时抛出 JobCancelled"""
+        fraction = done / total if total else done
+        fraction = min(max(float(fraction), 0.0), 1.0)
+
+        now = time.time()
+        if now - self._reported_at < PROGRESS_INTERVAL and fraction < 1.0:
+            return
+        self._reported_at = now
+
+        Job.objects.filter(id=self.job.id).update(progress=fraction, message=message[:200])
+        self.check_cancelled()
+
+    def check_cancelled(self):
+        if Job.objects.filter(id=self.job.id, cancel_requested=True).exists():
+            raise JobCancelled()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'JOB_WORKERS', 2), thread_name_prefix='job'
+                )
+    return _executor
+
+
+def submit_job(job_type, **params):
+    """创建任务并交给执行器，立即返回 Job"""
+    if job_type not in JOB_HANDLERS:
+        raise ValueError(f"未知的任务类型: {job_type}")
+
+    job = Job(job_type=job_type)
+    job.set_params(params)
+    job.save()
+
+    if getattr(settings, 'JOB_EXECUTOR', 'thread') == 'thread':
+        _get_executor().submit(_run_in_thread, job.id)
+    return job
+
+
+def cancel_job(job):
+    """取消任务：等待中的任务直接取消，运行中的任务在下一次汇报进度时结束"""
+    if Job.objects.filter(id=job.id, status='pending').update(
+        status='cancelled', cancel_requested=True, finished_at=timezone.now()
+    ):
+        return True
+    return bool(Job.objects.filter(id=job.id, status='running').update(cancel_requested=True))
+
+
+def claim_next_job():
+    """领取最早的一个等待中的任务，没有时返回None"""
+    for job_id in Job.objects.filter(status='pending').order_by('id').values_list('id', flat=True)[:10]:
+        if _claim(job_id):
+            return Job.objects.get(id=job_id)
+    return None
+
+
+def _worker_id():
+    pid = os.getpid()
+    return f"{socket.gethostname()}:{pid}:{_process_start_time(pid)}"
+
+
+def _process_start_time(pid):
+    """进程启动时间（/proc/<pid>/stat 第22个字段，开机以来的时钟周期数），无法读取时返回空字符串
+
+    容器重启后进程号会被重新使用，同时比较启动时间才能确定记录的进程还在运行。
+    """
+    try:
+        with open(f'/proc/{pid}/stat', 'r') as f:
+            stat = f.read()
+    except OSError:
+        return ''
+    # 第2个字段（进程名）可能包含空格，从最后一个右括号之后开始切分
+    fields = stat.rpartition(')')[2].split()
+    return fields[19] if len(fields) > 19 else ''
+
+
+def _process_alive(pid, start_time=''):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    except OSError:
+        return False
+    return not start_time or _process_start_time(pid) in ('', start_time)
+
+
+def _worker_exited(worker, hostname=None):
+    """worker 记录的本机进程是否已退出（其他主机的进程无法判断，视为仍在运行）"""
+    if not worker:
+        return True
+    parts = worker.rsplit(':', 2)
+    if len(parts) == 2:
+        # 旧格式 主机名:进程号
+        parts.append('')
+    host, pid, start_time = parts
+    if host != (hostname or socket.gethostname()):
+        return False
+    return not pid.isdigit() or not _process_alive(int(pid), start_time)
+
+
+def _claim(job_id):
+    return Job.objects.filter(id=job_id, status='pending').update(
+        status='running', started_at=timezone.now(), worker=_worker_id()
+    ) == 1
+
+
+def recover_jobs(requeue_pending=None):
+    """进程启动时调用：执行进程已退出的 running 任务标记为失败；
+    线程执行器下重新提交等待中的任务（上一个Web进程退出时线程池中排队的任务）
+
+    只处理本机进程领取的任务（多台机器共用数据库时各自收尾），多个进程同时调用也只会由一个进程领取到任务。
+    """
+    hostname = socket.gethostname()
+    try:
+        running = list(Job.objects.filter(status='running').values_list('id', 'worker'))
+    except DatabaseError as e:
+        # 数据库尚未迁移等情况下不影响启动
+        print(f"检查遗留任务失败: {e}")
+        return
+    interrupted = [job_id for job_id, worker in running if _worker_exited(worker, hostname)]
+    if interrupted:
+        Job.objects.filter(id__in=interrupted, status='running').update(
+            status='failed', error='执行进程已退出，任务中断，请重新提交', finished_at=timezone.now()
+        )
+        print(f"{len(interrupted)} 个中断的任务已标记为失败")
+
+    if requeue_pending is None:
+        requeue_pending = getattr(settings, 'JOB_EXECUTOR', 'thread') == 'thread'
+    if requeue_pending:
+        pending = list(Job.objects.filter(status='pending').order_by('id').values_list('id', flat=True))
+        for job_id in pending:
+            _get_executor().submit(_run_in_thread, job_id)
+        if pending:
+            print(f"重新提交了 {len(pending)} 个等待中的任务")
+
+
+def recover_jobs_once(lock_path=None):
+    """Web进程启动时调用：同一台机器上只由一个进程执行 recover_jobs()，返回本进程是否执行了收尾
+
+    锁文件（settings.JOB_RECOVERY_LOCK）记录执行收尾的进程，该进程运行期间其他Web进程启动时跳过；
+    它退出后（服务重启）下一个启动的进程接管锁文件并重新收尾。
+    """
+    lock_path = str(lock_path or getattr(settings, 'JOB_RECOVERY_LOCK', None)
+                    or os.path.join(settings.BASE_DIR, 'job_recovery.lock'))
+    try:
+        fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        try:
+            with open(lock_path, 'r', encoding='utf-8') as f:
+                holder = f.read().strip()
+        except FileNotFoundError:
+            holder = ''
+        if holder and not _worker_exited(holder):
+            return False
+        try:
+            os.remove(lock_path)
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except (FileNotFoundError, FileExistsError):
+            return False
+    except OSError as e:
+        print(f"创建任务收尾锁文件失败: {e}")
+        return False
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(_worker_id())
+
+    recover_jobs()
+    return True
+
+
+def _run_in_thread(job_id):
+    try:
+        if _claim(job_id):
+            run_job(Job.objects.get(id=job_id))
+    finally:
+        close_old_connections()
+
+
+def run_job(job):
+    """执行一个已领取（running）的任务并记录结果"""
+    handler = JOB_HANDLERS.get(job.job_type)
+    print(f"任务开始: {job.job_type}#{job.id}（pid {os.getpid()}）")
+    try:
+        if handler is None:
+            raise ValueError(f"未知的任务类型: {job.job_type}")
+        result = handler(JobContext(job), **job.get_params())
+        job.status = 'completed'
+        job.progress = 1.0
+        job.set_result(result)
+    except JobCancelled:
+        job.status = 'cancelled'
+        job.message = '任务已取消'
+    except Exception as e:
+        traceback.print_exc()
+        job.status = 'failed'
+        job.error = str(e)
+
+    job.finished_at = timezone.now()
+    Job.objects.filter(id=job.id).update(
+        status=job.status, progress=job.progress,
+        message=job.message, result=job.result, error=job.error, finished_at=job.finished_at,
+    )
+    print(f"任务结束: {job.job_type}#{job.id} -> {job.status}")
+    return job
+
+
+# ==================== 任务处理函数 ====================
+
+@register_job('crawler')
+def crawler_job(context, target_count=1000):
+    """爬取问答数据并增量更新索引"""
+    from crawler.dingxiang_crawler import DingXiangCrawler
+    from data_processing.processors import get_index_manager
+
+    context.progress(0, message='正在爬取数据')
+    success_count = DingXiangCrawler().crawl_qa_data(
+        target_count,
+        progress_callback=lambda done, total: context.progress(done, total, f'已保存 {done}/{total} 条'),
+    )
+    get_index_manager().refresh()
+    return {'success_count': success_count}
+
+
+@register_job('process_data')
+def process_data_job(context):
+    """预处理问答数据（可取消，再次提交会处理剩余数据）"""
+    from data_processing.processors import get_text_processor, get_index_manager
+
+    start_time = time.time()
+    processed_count = get_text_processor().process_qa_data(
+        progress_callback=lambda done, total: context.progress(done, total, f'已处理 {done}/{total} 条'),
+    )
+    # 后台增量更新索引（只处理本次新处理的数据），任务不等待索引更新完成
+    get_index_manager().refresh()
+    index_status = get_index_manager().status()
+    return {
+        'processed_count': processed_count,
+        'process_time': f"{round(time.time() - start_time, 2)} 秒",
+        'index_built': index_status['ready'],
+        'index_documents': index_status.get('documents', 0),
+    }
+
+
+def _mining_result(result):
+    return {
+        'result_id': result['result_id'],
+        'summary': result['summary'],
+        'tsne_image': result['tsne_image'],
+        'wordclouds': result['wordclouds'],
+        'wordcloud_format': result['wordcloud_format'],
+        'clustering_info': result['clustering']['cluster_info'],
+    }
+
+
+@register_job('text_mining')
+def text_mining_job(context, dataset_name, clustering_method='kmeans', n_clusters=5, streaming=None):
+    """对现有问答数据做文本挖掘"""
+    from text_mining.text_mining_analyzer import TextMiningAnalyzer
+
+    context.progress(0, message='正在分析问答数据')
+    analyzer = TextMiningAnalyzer(
+        progress_callback=lambda done, total: context.progress(done, total, '正在分析问答数据'),
+    )
+    result = analyzer.run_complete_analysis(
+        dataset_name=dataset_name,
+        clustering_method=clustering_method,
+        n_clusters=n_clusters,
+        streaming=streaming,
+    )
+    return _mining_result(result)
+
+
+@register_job('dataset_mining')
+def dataset_mining_job(context, file_path, dataset_name, clustering_method='kmeans', n_clusters=5, streaming=None):
+    """对上传的ZIP数据集做文本挖掘（数据集较大时流式读取）"""
+    from text_mining.text_mining_analyzer import TextMiningAnalyzer
+
+    try:
+        context.progress(0, message='正在分析数据集')
+        analyzer = TextMiningAnalyzer(
+            progress_callback=lambda done, total: context.progress(done, total, '正在分析数据集'),
+        )
+        result = analyzer.run_archive_analysis(
+            file_path,
+            dataset_name=dataset_name,
+            clustering_method=clustering_method,
+            n_clusters=n_clusters,
+            streaming=streaming,
+        )
+        return _mining_result(result)
+    finally:
+        _remove_file(file_path)
+
+
+@register_job('ocr')
+def ocr_job(context, file_path, image_name):
+    """识别上传的医学图像"""
+    from qa_system.views import recognize_medical_image
+
+    try:
+        context.progress(0, message='正在识别图像')
+        with open(file_path, 'rb') as image_file:
+            return recognize_medical_image(
+                image_file, image_name,
+                progress_callback=lambda done, total: context.progress(done, total, '正在识别图像'),
+            )
+    finally:
+        _remove_file(file_path)
+
+
+@register_job('bulk_ocr')
+def bulk_ocr_job(context, file_path):
+    """批量识别上传的ZIP中的医学图像"""
+    from image_recognition.bulk_ocr import bulk_recognize
+
+    try:
+        context.progress(0, message='正在读取压缩包')
+        return bulk_recognize(
+            file_path,
+            progress_callback=lambda done, total: context.progress(done, total, f'已识别 {done}/{total} 张'),
+        )
+    finally:
+        _remove_file(file_path)
+
+
+def save_upload(uploaded_file, subdir='job_uploads'):
+    """把上传文件保存到 MEDIA_ROOT 下，返回本地路径（任务结束后删除）"""
+    directory = os.path.join(settings.MEDIA_ROOT, subdir)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{int(time.time() * 1000)}_{os.getpid()}_{os.path.basename(uploaded_file.name)}")
+    with open(path, 'wb') as destination:
+        for chunk in uploaded_file.chunks():
+            destination.write(chunk)
+    return path
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
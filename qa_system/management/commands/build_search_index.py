@@ -0,0 +1,48 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from data_processing.text_processor import TextProcessor
+from data_processing.search_index import save_index, load_index, get_data_version, get_index_dir
+
+
+class Command(BaseCommand):
+    help = '构建搜索索引并写入磁盘，Web进程启动时直接内存映射使用'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--process', action='store_true', help='构建前先预处理未处理的问答数据')
+        parser.add_argument('--force', action='store_true', help='即使磁盘索引已是最新版本也重新构建')
+        parser.add_argument('--backend', choices=['tfidf', 'bm25'], default=None,
+                            help='检索后端（默认使用 settings.SEARCH_BACKEND）')
+        parser.add_argument('--index-dir', default=None, help='索引目录（默认使用 settings.SEARCH_INDEX_DIR）')
+
+    def handle(self, *args, **options):
+        index_dir = options['index_dir']
+        processor = TextProcessor()
+
+        if options['process']:
+            processed_count = processor.process_qa_data()
+            self.stdout.write(f'预处理完成，共处理 {processed_count} 条数据')
+
+        data_version = get_data_version()
+        current = load_index(index_dir)
+        backend = options['backend'] or getattr(settings, 'SEARCH_BACKEND', 'tfidf')
+        if (current is not None and current['backend'] == backend
+                and current['data_version'] >= data_version and not options['force']):
+            self.stdout.write(self.style.SUCCESS(
+                f"索引已是最新版本（{current['generation']}，数据版本 {data_version}），无需重建"
+            ))
+            return
+
+        start_time = time.time()
+        index_info = processor.build_index(backend=backend)
+        if not index_info:
+            self.stdout.write(self.style.WARNING('没有可索引的数据，请先爬取并处理问答数据'))
+            return
+
+        generation = save_index(index_info, index_dir)
+        self.stdout.write(self.style.SUCCESS(
+            f"索引构建完成: {generation}，共 {len(index_info['document_ids'])} 个文档，"
+            f"耗时 {time.time() - start_time:.2f} 秒，目录 {get_index_dir(index_dir)}"
+        ))
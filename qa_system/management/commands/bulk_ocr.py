@@ -0,0 +1,48 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from image_recognition.bulk_ocr import bulk_recognize
+
+
+class Command(BaseCommand):
+    help = '批量识别目录或ZIP中的医学图像并写入识别结果，支持断点续跑'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='图像目录或ZIP压缩包路径')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='推理进程数（默认使用 settings.OCR_BULK_WORKERS）')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='每批图像数（默认使用 settings.OCR_BULK_BATCH_SIZE）')
+        parser.add_argument('--report', default=None, help='每张图像耗时的CSV报告路径')
+        parser.add_argument('--no-skip-existing', action='store_true',
+                            help='内容哈希已有识别结果的图像也重新识别')
+        parser.add_argument('--restart', action='store_true', help='忽略断点文件，从头开始识别')
+
+    def handle(self, *args, **options):
+        source = options['source']
+        if not os.path.exists(source):
+            raise CommandError(f'路径不存在: {source}')
+
+        checkpoint_path = str(getattr(settings, 'OCR_BULK_CHECKPOINT', settings.BASE_DIR / 'bulk_ocr.checkpoint'))
+        if options['restart']:
+            try:
+                os.remove(checkpoint_path)
+            except FileNotFoundError:
+                pass
+
+        summary = bulk_recognize(
+            source,
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+            checkpoint_path=checkpoint_path,
+            report_path=options['report'],
+            skip_existing=not options['no_skip_existing'],
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"批量识别完成：共 {summary['total']} 张，识别 {summary['recognized']} 张，无文字 {summary['empty']} 张，"
+            f"失败 {summary['failed']} 张，重复 {summary['duplicate']} 张，"
+            f"耗时 {summary['elapsed_seconds']} 秒（{summary['images_per_second']} 张/秒）"
+        ))
@@ -0,0 +1,42 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from data_processing.text_processor import TextProcessor
+
+
+class Command(BaseCommand):
+    help = '并行预处理问答数据（分词与关键词提取），支持断点续跑'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reprocess', action='store_true', help='重新处理全部数据（默认只处理未处理的数据）')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='每批处理的行数（默认使用 settings.TEXT_PROCESS_BATCH_SIZE）')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='进程数（默认使用 settings.TEXT_PROCESS_WORKERS，未设置时使用全部CPU）')
+        parser.add_argument('--restart', action='store_true', help='忽略断点文件，从头开始处理')
+
+    def handle(self, *args, **options):
+        checkpoint_path = str(getattr(settings, 'TEXT_PROCESS_CHECKPOINT', settings.BASE_DIR / 'process_qa_data.checkpoint'))
+        if options['restart']:
+            try:
+                os.remove(checkpoint_path)
+            except FileNotFoundError:
+                pass
+
+        processor = TextProcessor()
+        if options['workers']:
+            processor.workers = options['workers']
+
+        start_time = time.time()
+        processed_count = processor.process_qa_data(
+            reprocess=options['reprocess'],
+            batch_size=options['batch_size'],
+            checkpoint_path=checkpoint_path,
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'预处理完成，共处理 {processed_count} 条数据，耗时 {time.time() - start_time:.2f} 秒'
+        ))
@@ -0,0 +1,67 @@
+import multiprocessing
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+
+def _worker_loop(poll_interval):
+    """领取并执行等待中的任务，没有任务时休眠"""
+    from qa_system.jobs import claim_next_job, run_job
+
+    while True:
+        close_old_connections()
+        job = claim_next_job()
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        run_job(job)
+
+
+def _spawned_worker(poll_interval):
+    """多进程时的执行进程入口：spawn 启动（见 data_processing.segment_pool.create_pool），先初始化Django"""
+    import django
+    django.setup()
+    _worker_loop(poll_interval)
+
+
+class Command(BaseCommand):
+    help = '启动后台任务执行进程（配合 settings.JOB_EXECUTOR = "worker" 使用）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1,
+                            help='执行任务的进程数')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='没有任务时的轮询间隔，秒')
+
+    def handle(self, *args, **options):
+        processes = max(1, options['processes'])
+        poll_interval = options['poll_interval']
+
+        # 上一批执行进程退出时正在运行的任务标记为失败（等待中的任务由本进程正常领取）
+        from qa_system.jobs import recover_jobs
+        recover_jobs(requeue_pending=False)
+
+        if processes == 1:
+            self.stdout.write('任务执行进程已启动')
+            try:
+                _worker_loop(poll_interval)
+            except KeyboardInterrupt:
+                self.stdout.write('任务执行进程已停止')
+            return
+
+        context = multiprocessing.get_context('spawn')
+        workers = [
+            context.Process(target=_spawned_worker, args=(poll_interval,), daemon=True)
+            for _ in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f'已启动 {processes} 个任务执行进程')
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            for worker in workers:
+                worker.terminate()
+            self.stdout.write('任务执行进程已停止')
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from image_recognition.ocr_service import OCRService, get_service_address
+
+
+class Command(BaseCommand):
+    help = '启动独立的OCR推理服务（多进程推理，按时间窗口凑批）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None,
+                            help='推理进程数（默认使用 settings.OCR_SERVICE_WORKERS）')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='每批最多图像数（默认使用 settings.OCR_BATCH_SIZE）')
+        parser.add_argument('--batch-window', type=float, default=None,
+                            help='凑批等待时间，秒（默认使用 settings.OCR_BATCH_WINDOW）')
+
+    def handle(self, *args, **options):
+        if not get_service_address():
+            self.stdout.write(self.style.WARNING(
+                '未配置 OCR_SERVICE_ADDRESS，服务将监听 127.0.0.1:8765，但Web进程不会使用它'
+            ))
+
+        service = OCRService(
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+            batch_window=options['batch_window'],
+        )
+        try:
+            service.serve_forever()
+        except KeyboardInterrupt:
+            self.stdout.write('OCR服务已停止')
@@ -0,0 +1,69 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# 每个场景在新的Python进程中执行（冷启动），计时包含解释器启动与全部导入；
+# wsgi_boot 只计到 worker 可以接受请求为止（STARTUP_PRELOAD='background' 时不包含后台预加载）
+SCENARIOS = {
+    'django_setup': ['-c', 'import django; django.setup()'],
+    'manage_check': ['manage.py', 'check'],
+    'import_urls': ['-c', 'import django; django.setup(); import qa_system.urls'],
+    'wsgi_boot': ['-c', 'import backend.wsgi'],
+    'text_processor': ['-c', 'import django; django.setup(); '
+                             'from data_processing.processors import get_text_processor; get_text_processor()'],
+}
+
+
+class Command(BaseCommand):
+    help = '测量冷启动耗时：Django初始化、manage.py、URL导入、WSGI worker启动与TextProcessor创建'
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenarios', nargs='*',
+                            help=f"要测量的场景（默认全部）: {', '.join(SCENARIOS)}")
+        parser.add_argument('--repeat', type=int, default=5, help='每个场景的重复次数（取中位数）')
+        parser.add_argument('--json', action='store_true', help='以JSON输出结果')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat 必须大于0')
+        unknown = [name for name in options['scenarios'] if name not in SCENARIOS]
+        if unknown:
+            raise CommandError(f"未知的场景: {', '.join(unknown)}")
+
+        env = dict(os.environ)
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+        results = {}
+        for name in options['scenarios'] or SCENARIOS:
+            samples = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                completed = subprocess.run(
+                    [sys.executable, *SCENARIOS[name]], cwd=str(settings.BASE_DIR), env=env,
+                    stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                )
+                elapsed = time.perf_counter() - start
+                if completed.returncode != 0:
+                    raise CommandError(f"场景 {name} 执行失败:\n{completed.stderr.decode('utf-8', 'replace')}")
+                samples.append(elapsed)
+
+            results[name] = {
+                'median_seconds': round(statistics.median(samples), 3),
+                'min_seconds': round(min(samples), 3),
+                'max_seconds': round(max(samples), 3),
+                'repeat': len(samples),
+            }
+            if not options['json']:
+                self.stdout.write(
+                    f"{name:<16} 中位数 {results[name]['median_seconds']:.3f} 秒"
+                    f"（最小 {results[name]['min_seconds']:.3f}，最大 {results[name]['max_seconds']:.3f}）"
+                )
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, ensure_ascii=False, indent=2))
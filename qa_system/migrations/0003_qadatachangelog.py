@@ -0,0 +1,28 @@
+# Generated by Django 3.2.7 on 2026-10-17 22:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qa_system', '0002_imagerecognitionresult'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QADataChangeLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('qa_id', models.BigIntegerField(db_index=True, verbose_name='问答ID')),
+                ('action', models.CharField(choices=[('save', '新增/修改'), ('delete', '删除')], default='save', max_length=10, verbose_name='操作')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='变更时间')),
+            ],
+            options={
+                'verbose_name': '问答数据变更日志',
+                'verbose_name_plural': '问答数据变更日志',
+                'db_table': 'qa_data_change_log',
+                'ordering': ['id'],
+            },
+        ),
+    ]
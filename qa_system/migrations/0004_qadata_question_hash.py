@@ -0,0 +1,53 @@
+# Generated by Django 3.2.7 on 2026-10-17 23:10
+
+import hashlib
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+
+# 迁移中固定一份归一化与哈希逻辑（不引用当前的 models，以后修改 models 不影响本迁移）
+def question_hash(text):
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    return hashlib.sha1(re.sub(r'[\W_]+', '', text).encode('utf-8')).hexdigest()
+
+
+def fill_question_hash(apps, schema_editor):
+    """为已有数据计算问题哈希"""
+    QAData = apps.get_model('qa_system', 'QAData')
+    batch = []
+    for qa in QAData.objects.only('id', 'question').iterator(chunk_size=2000):
+        qa.question_hash = question_hash(qa.question)
+        batch.append(qa)
+        if len(batch) >= 2000:
+            QAData.objects.bulk_update(batch, ['question_hash'])
+            batch = []
+    if batch:
+        QAData.objects.bulk_update(batch, ['question_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qa_system', '0003_qadatachangelog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='crawlerlog',
+            name='batch_stats',
+            field=models.TextField(blank=True, help_text='JSON格式存储', verbose_name='批次统计'),
+        ),
+        migrations.AddField(
+            model_name='crawlerlog',
+            name='duplicate_count',
+            field=models.IntegerField(default=0, verbose_name='重复数量'),
+        ),
+        migrations.AddField(
+            model_name='qadata',
+            name='question_hash',
+            field=models.CharField(blank=True, db_index=True, help_text='归一化问题文本的SHA-1，用于入库去重', max_length=40, verbose_name='问题哈希'),
+        ),
+        migrations.RunPython(fill_question_hash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 3.2.7 on 2026-10-17 23:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qa_system', '0004_qadata_question_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_type', models.CharField(db_index=True, max_length=50, verbose_name='任务类型')),
+                ('status', models.CharField(choices=[('pending', '等待中'), ('running', '运行中'), ('completed', '已完成'), ('failed', '失败'), ('cancelled', '已取消')], db_index=True, default='pending', max_length=20, verbose_name='状态')),
+                ('progress', models.FloatField(default=0.0, help_text='0~1', verbose_name='进度')),
+                ('message', models.CharField(blank=True, max_length=200, verbose_name='进度说明')),
+                ('params', models.TextField(blank=True, help_text='JSON格式存储', verbose_name='任务参数')),
+                ('result', models.TextField(blank=True, help_text='JSON格式存储', verbose_name='任务结果')),
+                ('error', models.TextField(blank=True, verbose_name='错误信息')),
+                ('cancel_requested', models.BooleanField(default=False, verbose_name='请求取消')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='开始时间')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='结束时间')),
+            ],
+            options={
+                'verbose_name': '后台任务',
+                'verbose_name_plural': '后台任务',
+                'db_table': 'jobs',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.7 on 2026-10-17 23:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qa_system', '0005_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imagerecognitionresult',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, help_text='图像字节的SHA-256，用于复用识别结果', max_length=64, verbose_name='图像内容哈希'),
+        ),
+        migrations.AddField(
+            model_name='imagerecognitionresult',
+            name='image_size',
+            field=models.PositiveIntegerField(default=0, verbose_name='图像文件大小(字节)'),
+        ),
+        migrations.AddField(
+            model_name='imagerecognitionresult',
+            name='perceptual_hash',
+            field=models.CharField(blank=True, help_text='64位差值哈希，用于匹配近似重复的图像', max_length=16, verbose_name='感知哈希'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.7 on 2026-10-18 00:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qa_system', '0006_imagerecognitionresult_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='worker',
+            field=models.CharField(blank=True, help_text='主机名:进程号', max_length=100, verbose_name='执行进程'),
+        ),
+    ]
@@ -1,6 +1,21 @@
 from django.db import models
 from django.contrib.auth.models import User
+import hashlib
 import json
+import re
+import unicodedata
+
+
+def normalize_question(text):
+    """问题文本归一化：全角转半角、统一小写，去掉空白与标点（用于判断重复问题）"""
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    return re.sub(r'[\W_]+', '', text)
+
+
+def question_hash(text):
+    """归一化问题文本的SHA-1摘要"""
+    return hashlib.sha1(normalize_question(text).encode('utf-8')).hexdigest()
+
 
 class QAData(models.Model):
     """问答数据模型"""
@@ -11,6 +26,8 @@ class QAData(models.Model):
     keywords = models.TextField(verbose_name="关键词", blank=True, help_text="JSON格式存储")
     processed_question = models.TextField(verbose_name="处理后的问题", blank=True)
     processed_answer = models.TextField(verbose_name="处理后的答案", blank=True)
+    question_hash = models.CharField(max_length=40, verbose_name="问题哈希", blank=True, db_index=True,
+                                     help_text="归一化问题文本的SHA-1，用于入库去重")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
     
@@ -22,6 +39,10 @@ class QAData(models.Model):
     def __str__(self):
         return f"{self.question[:50]}..."
     
+    def save(self, *args, **kwargs):
+        self.question_hash = question_hash(self.question)
+        super().save(*args, **kwargs)
+    
     def get_keywords_list(self):
         """获取关键词列表"""
         if self.keywords:
@@ -35,6 +56,54 @@ class QAData(models.Model):
         """设置关键词列表"""
         self.keywords = json.dumps(keywords_list, ensure_ascii=False)
 
+class QADataChangeLog(models.Model):
+    """问答数据变更日志
+
+    每次QAData新增、修改或删除都会追加一条记录，最大的记录ID即为数据版本号，
+    搜索索引据此判断是否过期。
+    """
+    ACTION_CHOICES = [
+        ('save', '新增/修改'),
+        ('delete', '删除'),
+    ]
+    
+    qa_id = models.BigIntegerField(verbose_name="问答ID", db_index=True)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES, verbose_name="操作", default='save')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="变更时间")
+    
+    class Meta:
+        db_table = 'qa_data_change_log'
+        verbose_name = '问答数据变更日志'
+        verbose_name_plural = '问答数据变更日志'
+        ordering = ['id']
+        
+    def __str__(self):
+        return f"#{self.id} {self.action} {self.qa_id}"
+    
+    @classmethod
+    def current_version(cls):
+        """获取当前数据版本号（最新变更记录的ID，没有记录时为0）"""
+        latest = cls.objects.order_by('-id').values_list('id', flat=True).first()
+        return latest or 0
+    
+    @classmethod
+    def record(cls, qa_ids, action='save'):
+        """批量记录变更（bulk_create/bulk_update等不触发信号的场景使用）"""
+        logs = [cls(qa_id=qa_id, action=action) for qa_id in qa_ids]
+        if logs:
+            cls.objects.bulk_create(logs, batch_size=500)
+        return len(logs)
+    
+    @classmethod
+    def prune(cls, data_version):
+        """删除ID不超过 data_version 的记录（索引已包含这些变更），返回删除条数
+
+        最新的一条记录始终保留：数据版本号取最大记录ID，不能因清理而回退。
+        """
+        latest = cls.current_version()
+        deleted, _ = cls.objects.filter(id__lte=data_version, id__lt=latest).delete()
+        return deleted
+
 class Document(models.Model):
     """文档模型"""
     title = models.CharField(max_length=200, verbose_name="标题")
@@ -129,6 +198,8 @@ class CrawlerLog(models.Model):
     end_time = models.DateTimeField(null=True, blank=True, verbose_name="结束时间")
     total_count = models.IntegerField(default=0, verbose_name="总数量")
     success_count = models.IntegerField(default=0, verbose_name="成功数量")
+    duplicate_count = models.IntegerField(default=0, verbose_name="重复数量")
+    batch_stats = models.TextField(blank=True, verbose_name="批次统计", help_text="JSON格式存储")
     error_log = models.TextField(blank=True, verbose_name="错误日志")
     
     class Meta:
@@ -138,6 +209,21 @@ class CrawlerLog(models.Model):
         
     def __str__(self):
         return f"{self.task_name} - {self.status}"
+    
+    def get_batch_stats(self):
+        """获取批次统计列表"""
+        if self.batch_stats:
+            try:
+                return json.loads(self.batch_stats)
+            except:
+                return []
+        return []
+    
+    def add_batch_stat(self, stat):
+        """追加一条批次统计（入库数量、重复数量、耗时、吞吐量）"""
+        stats = self.get_batch_stats()
+        stats.append(stat)
+        self.batch_stats = json.dumps(stats, ensure_ascii=False)
 
 class ImageRecognitionResult(models.Model):
     """图像识别结果模型"""
@@ -148,6 +234,9 @@ class ImageRecognitionResult(models.Model):
     analysis_result = models.TextField(verbose_name="分析结果", blank=True, help_text="JSON格式存储文本分析结果")
     processing_time = models.FloatField(verbose_name="处理时间(秒)", default=0.0)
     confidence_score = models.FloatField(verbose_name="平均置信度", default=0.0)
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True, verbose_name="图像内容哈希", help_text="图像字节的SHA-256，用于复用识别结果")
+    perceptual_hash = models.CharField(max_length=16, blank=True, verbose_name="感知哈希", help_text="64位差值哈希，用于匹配近似重复的图像")
+    image_size = models.PositiveIntegerField(default=0, verbose_name="图像文件大小(字节)")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
     
     class Meta:
@@ -176,3 +265,86 @@ class ImageRecognitionResult(models.Model):
             except:
                 return {}
         return {}
+
+class Job(models.Model):
+    """后台任务模型
+
+    爬虫、数据处理、文本挖掘、图像识别等耗时操作以任务形式提交，由后台线程或
+    独立的任务进程（python manage.py run_job_worker）执行，HTTP请求立即返回任务ID。
+    """
+    STATUS_CHOICES = [
+        ('pending', '等待中'),
+        ('running', '运行中'),
+        ('completed', '已完成'),
+        ('failed', '失败'),
+        ('cancelled', '已取消'),
+    ]
+    FINISHED_STATUSES = ('completed', 'failed', 'cancelled')
+    
+    job_type = models.CharField(max_length=50, verbose_name="任务类型", db_index=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, verbose_name="状态", default='pending', db_index=True)
+    progress = models.FloatField(verbose_name="进度", default=0.0, help_text="0~1")
+    message = models.CharField(max_length=200, verbose_name="进度说明", blank=True)
+    params = models.TextField(verbose_name="任务参数", blank=True, help_text="JSON格式存储")
+    result = models.TextField(verbose_name="任务结果", blank=True, help_text="JSON格式存储")
+    error = models.TextField(verbose_name="错误信息", blank=True)
+    cancel_requested = models.BooleanField(verbose_name="请求取消", default=False)
+    worker = models.CharField(max_length=100, verbose_name="执行进程", blank=True, help_text="主机名:进程号")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="开始时间")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="结束时间")
+    
+    class Meta:
+        db_table = 'jobs'
+        verbose_name = '后台任务'
+        verbose_name_plural = '后台任务'
+        ordering = ['-created_at']
+        
+    def __str__(self):
+        return f"{self.job_type}#{self.id} - {self.status}"
+    
+    def get_params(self):
+        """获取任务参数"""
+        if self.params:
+            try:
+                return json.loads(self.params)
+            except:
+                return {}
+        return {}
+    
+    def set_params(self, params):
+        """设置任务参数"""
+        self.params = json.dumps(params, ensure_ascii=False)
+    
+    def get_result(self):
+        """获取任务结果"""
+        if self.result:
+            try:
+                return json.loads(self.result)
+            except:
+                return None
+        return None
+    
+    def set_result(self, result):
+        """设置任务结果"""
+        self.result = json.dumps(result, ensure_ascii=False)
+    
+    @property
+    def is_finished(self):
+        return self.status in self.FINISHED_STATUSES
+    
+    def to_dict(self):
+        """任务状态（供状态查询接口返回）"""
+        return {
+            'job_id': self.id,
+            'job_type': self.job_type,
+            'status': self.status,
+            'progress': round(self.progress, 4),
+            'message': self.message,
+            'result': self.get_result(),
+            'error': self.error,
+            'cancel_requested': self.cancel_requested,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
@@ -0,0 +1,16 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import QAData, QADataChangeLog
+
+
+@receiver(post_save, sender=QAData)
+def log_qa_data_saved(sender, instance, **kwargs):
+    """问答数据新增或修改后记录变更，推进数据版本号"""
+    QADataChangeLog.objects.create(qa_id=instance.id, action='save')
+
+
+@receiver(post_delete, sender=QAData)
+def log_qa_data_deleted(sender, instance, **kwargs):
+    """问答数据删除后记录变更，推进数据版本号"""
+    QADataChangeLog.objects.create(qa_id=instance.id, action='delete')
@@ -1,3 +1,881 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+from collections import Counter
+from contextlib import contextmanager
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core.files.base import ContentFile
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from . import jobs
+from .models import QAData, QADataChangeLog, CrawlerLog, ChatMessage, ImageRecognitionResult, Job
+from .views import recognize_medical_image
+from crawler.dingxiang_crawler import DingXiangCrawler
+from data_processing.entity_matcher import AhoCorasick, EntityMatcher
+from data_processing.incremental_index import apply_index_updates, compact_index, search_segments
+from data_processing.inverted_index import BM25InvertedIndex
+from data_processing.query_cache import QueryResultCache
+from data_processing.retrieval import select_top_k, top_k_similar, top_k_similar_batch
+from data_processing.search_index import save_index, load_index, read_current_generation, cleanup_generations
+from data_processing import text_processor
+from data_processing.text_processor import TextProcessor
+from image_recognition.result_cache import OCRResultCache, hamming_distance, image_content_hash, perceptual_hash
+from text_mining import wordcloud_render
+from text_mining.analysis_context import TFIDF_PARAMS
+from text_mining.projection import stratified_sample
+from text_mining.streaming import Reservoir, StreamingCorpus, iter_text_rows, stream_clustering
+from text_mining.text_mining_analyzer import TextMiningAnalyzer
+from text_mining.wordcloud_render import get_image_format, render_wordclouds, term_frequencies
+
+# 测试语料的词表：英文词条，TfidfVectorizer 默认的分词规则与 split() 结果一致
+WORDS = [f'term{i:02d}' for i in range(60)]
+
+
+def random_documents(n_documents, seed=0, min_length=3, max_length=20):
+    """生成可复现的随机分词文档（词频服从长尾分布，常见词的倒排表跨多个块）"""
+    rng = random.Random(seed)
+    weights = [1.0 / (rank + 1) for rank in range(len(WORDS))]
+    return [rng.choices(WORDS, weights, k=rng.randint(min_length, max_length)) for _ in range(n_documents)]
+
+
+def create_qa_rows(documents):
+    """按分词文档创建已处理的问答数据（processed_question 即分词结果）"""
+    return [
+        QAData.objects.create(
+            question=f'问题{i}', answer=f'答案{i}', category='测试', processed_question=' '.join(tokens)
+        )
+        for i, tokens in enumerate(documents)
+    ]
+
+
+def exhaustive_bm25(index, tokenized_docs, query):
+    """逐文档计算BM25得分（不使用倒排表与MaxScore），按 search() 的方式归一化"""
+    query_terms = Counter(token for token in query if token in index.vocabulary)
+    total_bound = sum(index.term_max_score[index.vocabulary[t]] * n for t, n in query_terms.items())
+    scores = np.zeros(len(tokenized_docs))
+    for row, tokens in enumerate(tokenized_docs):
+        tfs = Counter(tokens)
+        for term, n in query_terms.items():
+            tf = tfs.get(term, 0)
+            if tf:
+                term_id = index.vocabulary[term]
+                scores[row] += n * index.idf[term_id] * tf * (index.k1 + 1) / (tf + index.doc_norms[row])
+    return scores / total_bound
+
+
+class TemporaryIndexDirMixin:
+    def setUp(self):
+        super().setUp()
+        self.index_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.index_dir, ignore_errors=True)
+
+
+class SearchIndexPersistenceTests(TemporaryIndexDirMixin, TestCase):
+    """索引写入磁盘后重新加载（内存映射），检索结果与内存中的索引一致"""
+
+    def setUp(self):
+        super().setUp()
+        self.documents = random_documents(300)
+        create_qa_rows(self.documents)
+        self.processor = TextProcessor()
+
+    def assert_same_hits(self, index_a, index_b, queries):
+        for query in queries:
+            hits_a = search_segments(index_a, query, top_k=10)
+            hits_b = search_segments(index_b, query, top_k=10)
+            self.assertEqual([hit[:2] for hit in hits_a], [hit[:2] for hit in hits_b])
+            np.testing.assert_allclose([hit[2] for hit in hits_a], [hit[2] for hit in hits_b], rtol=1e-6)
+
+    def test_tfidf_round_trip(self):
+        index_info = self.processor.build_index(backend='tfidf')
+        generation = save_index(index_info, self.index_dir)
+        loaded = load_index(self.index_dir)
+
+        self.assertEqual(read_current_generation(self.index_dir), generation)
+        self.assertEqual(loaded['generation'], generation)
+        np.testing.assert_array_equal(loaded['document_ids'], index_info['document_ids'])
+        self.assertEqual((loaded['tfidf_matrix'] != index_info['tfidf_matrix']).nnz, 0)
+        self.assertEqual(loaded['payload_store'].get(0), index_info['payload_store'].get(0))
+        self.assert_same_hits(index_info, loaded, random_documents(20, seed=1, max_length=4))
+
+    def test_bm25_round_trip(self):
+        index_info = self.processor.build_index(backend='bm25')
+        save_index(index_info, self.index_dir)
+        loaded = load_index(self.index_dir)
+
+        self.assertEqual(loaded['backend'], 'bm25')
+        self.assertEqual(len(loaded['payload_store']), len(self.documents))
+        self.assert_same_hits(index_info, loaded, random_documents(20, seed=1, max_length=4))
+
+    def test_cleanup_keeps_current_generation(self):
+        index_info = self.processor.build_index(backend='tfidf')
+        generations = [save_index(index_info, self.index_dir, keep_generations=10) for _ in range(3)]
+
+        stale = cleanup_generations(self.index_dir, keep=1)
+        self.assertEqual(stale, generations[:2])
+        self.assertEqual(load_index(self.index_dir)['generation'], generations[-1])
+
+
+class RandomCorpusMixin:
+    """1000篇随机文档与50个随机查询（类级别只生成一次）"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.documents = random_documents(1000)
+        cls.queries = random_documents(50, seed=7, min_length=1, max_length=6)
+
+
+class TopKRetrievalTests(RandomCorpusMixin, SimpleTestCase):
+    """TF-IDF Top-K检索（只取查询词的倒排行做稀疏乘法 + argpartition）与稠密穷举的结果一致"""
+
+    def setUp(self):
+        self.vectorizer = TfidfVectorizer()
+        self.matrix = self.vectorizer.fit_transform([' '.join(tokens) for tokens in self.documents])
+        self.matrix_t = self.matrix.T.tocsr()
+        self.query_matrix = self.vectorizer.transform([' '.join(query) for query in self.queries])
+        self.dense = (self.query_matrix @ self.matrix.T).toarray()
+
+    def test_top_k_matches_dense(self):
+        for i, dense in enumerate(self.dense):
+            for top_k in (1, 10):
+                rows, scores = top_k_similar(self.query_matrix[i], self.matrix_t, top_k=top_k)
+                np.testing.assert_allclose(scores, np.sort(dense[dense > 0])[::-1][:top_k], rtol=1e-6)
+                np.testing.assert_allclose(dense[rows], scores, rtol=1e-6)
+
+    def test_threshold(self):
+        for i, dense in enumerate(self.dense):
+            rows, scores = top_k_similar(self.query_matrix[i], self.matrix_t, top_k=50, threshold=0.2)
+            self.assertTrue(np.all(scores > 0.2))
+            self.assertEqual(len(rows), min(50, int(np.sum(dense > 0.2))))
+
+    def test_ties_sorted_by_row(self):
+        rows, scores = select_top_k(np.array([5, 3, 9, 1]), np.array([0.5, 0.5, 0.9, 0.1]), top_k=3)
+        self.assertEqual(rows.tolist(), [9, 3, 5])
+        self.assertEqual(len(top_k_similar(self.vectorizer.transform(['unknown']), self.matrix_t)[0]), 0)
+
+
+class BM25InvertedIndexTests(RandomCorpusMixin, SimpleTestCase):
+    """BM25倒排索引：MaxScore提前终止的Top-K与逐文档穷举打分一致，压缩倒排表可以无损解码"""
+
+    def test_bm25_maxscore_matches_exhaustive(self):
+        index = BM25InvertedIndex.build(self.documents)
+        for top_k in (1, 5, 20):
+            for query in self.queries:
+                rows, scores = index.search(query, top_k=top_k)
+                exhaustive = exhaustive_bm25(index, self.documents, query)
+                expected = np.sort(exhaustive[exhaustive > 0])[::-1][:top_k]
+                np.testing.assert_allclose(scores, expected, rtol=1e-5)
+                np.testing.assert_allclose(exhaustive[rows], scores, rtol=1e-5)
+
+    def test_bm25_threshold(self):
+        index = BM25InvertedIndex.build(self.documents)
+        for query in self.queries:
+            rows, scores = index.search(query, top_k=50, threshold=0.3)
+            exhaustive = exhaustive_bm25(index, self.documents, query)
+            self.assertTrue(np.all(scores > 0.3))
+            self.assertEqual(len(rows), min(50, int(np.sum(exhaustive > 0.3))))
+
+    def test_bm25_postings_round_trip(self):
+        index = BM25InvertedIndex.build(self.documents)
+        term = WORDS[0]
+        expected = [(row, tokens.count(term)) for row, tokens in enumerate(self.documents) if term in tokens]
+        rows, tfs = index.postings(term)
+        self.assertGreater(len(expected), 128)
+        self.assertEqual(list(zip(rows.tolist(), tfs.astype(int).tolist())), expected)
+
+    def test_save_and_load(self):
+        index = BM25InvertedIndex.build(self.documents)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        index.save(directory)
+        loaded = BM25InvertedIndex.load(directory)
+        for query in self.queries:
+            rows, scores = index.search(query, top_k=10)
+            loaded_rows, loaded_scores = loaded.search(query, top_k=10)
+            np.testing.assert_array_equal(loaded_rows, rows)
+            np.testing.assert_allclose(loaded_scores, scores)
+
+
+class IncrementalIndexTests(TestCase):
+    """增量段 + 删除标记的检索结果与按当前数据重建（沿用基础索引的词表与统计量）的结果一致"""
+
+    def setUp(self):
+        self.processor = TextProcessor()
+        self.rows = create_qa_rows(random_documents(300))
+
+    def apply_changes(self):
+        """修改、删除并新增若干问答"""
+        for qa, tokens in zip(self.rows[:20], random_documents(20, seed=3)):
+            qa.processed_question = ' '.join(tokens)
+            qa.save()
+        for qa in self.rows[20:35]:
+            qa.delete()
+        create_qa_rows(random_documents(25, seed=4))
+
+    def current_documents(self):
+        qa_objects = QAData.objects.exclude(processed_question='').order_by('id')
+        return ([qa.processed_question + ' ' + qa.processed_answer for qa in qa_objects],
+                np.array([qa.id for qa in qa_objects], dtype=np.int64))
+
+    def assert_same_ranking(self, hits, expected_ids, expected_scores):
+        """得分一致；与第k名同分的文档可能因行号不同而取舍不同，只比较得分严格更高的部分"""
+        expected_scores = np.asarray(expected_scores)
+        np.testing.assert_allclose([hit[2] for hit in hits], expected_scores, rtol=1e-5)
+        if len(expected_scores):
+            strict = expected_scores > expected_scores[-1] + 1e-6
+            self.assertEqual({hit[1] for hit, keep in zip(hits, strict) if keep},
+                             {int(qa_id) for qa_id, keep in zip(expected_ids, strict) if keep})
+
+    def test_tfidf_updates_match_rebuild(self):
+        base = self.processor.build_index(backend='tfidf')
+        self.apply_changes()
+        updated = apply_index_updates(base)
+        compacted = compact_index(updated)
+
+        documents, document_ids = self.current_documents()
+        rebuilt_matrix = base['vectorizer'].transform(documents)
+        np.testing.assert_array_equal(compacted['document_ids'], document_ids)
+        self.assertAlmostEqual(abs(compacted['tfidf_matrix'] - rebuilt_matrix).max(), 0.0)
+
+        rebuilt = {
+            'backend': 'tfidf', 'vectorizer': base['vectorizer'], 'tfidf_matrix': rebuilt_matrix,
+            'document_ids': document_ids, 'data_version': updated['data_version'],
+        }
+        for query in random_documents(30, seed=5, max_length=4):
+            expected = search_segments(rebuilt, query, top_k=8)
+            for index_info in (updated, compacted):
+                hits = search_segments(index_info, query, top_k=8)
+                self.assert_same_ranking(hits, [hit[1] for hit in expected], [hit[2] for hit in expected])
+
+    def test_bm25_updates_match_rebuild(self):
+        base = self.processor.build_index(backend='bm25')
+        self.apply_changes()
+        updated = apply_index_updates(base)
+
+        documents, document_ids = self.current_documents()
+        rebuilt = BM25InvertedIndex.build([doc.split() for doc in documents], frozen=base['inverted_index'])
+        for query in random_documents(30, seed=5, max_length=4):
+            rows, scores = rebuilt.search(query, top_k=8, norm_bounds=base['inverted_index'].term_max_score)
+            self.assert_same_ranking(search_segments(updated, query, top_k=8), document_ids[rows], scores)
+
+    def test_compaction_hydrates_payloads_without_store(self):
+        base = self.processor.build_index(backend='tfidf')
+        base['payload_store'] = None
+        self.apply_changes()
+        compacted = compact_index(apply_index_updates(base))
+
+        qa = QAData.objects.order_by('id').first()
+        row = int(np.searchsorted(compacted['document_ids'], qa.id))
+        self.assertEqual(compacted['payload_store'].get(row)['question'], qa.question)
+
+
+class QueryResultCacheTests(TestCase):
+    """检索结果缓存：进程内LRU/TTL、索引版本失效与共享缓存的命名空间"""
+
+    index_info = {'generation': 'gen_1', 'data_version': 3}
+
+    def results(self, qa_id=1):
+        return [{'qa': QAData(id=qa_id, question='问', answer='答', category='类'), 'qa_id': qa_id, 'similarity': 0.5}]
+
+    def test_local_hit_and_miss(self):
+        cache = QueryResultCache(alias='')
+        self.assertIsNone(cache.get(['头痛'], self.index_info, top_k=5))
+        cache.set(['头痛'], self.index_info, self.results(), top_k=5)
+
+        cached = cache.get(['头痛'], self.index_info, top_k=5)
+        self.assertEqual(cached[0]['qa_id'], 1)
+        self.assertEqual(cached[0]['qa'].answer, '答')
+        self.assertIsNone(cache.get(['头痛'], self.index_info, top_k=3))
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 2)
+
+    def test_local_invalidated_by_index_version(self):
+        cache = QueryResultCache(alias='')
+        cache.set(['头痛'], self.index_info, self.results(), top_k=5)
+        newer = dict(self.index_info, data_version=4)
+        self.assertIsNone(cache.get(['头痛'], newer, top_k=5))
+        self.assertEqual(cache.stats()['entries'], 0)
+
+    def test_local_lru_and_ttl(self):
+        cache = QueryResultCache(alias='', max_entries=2, ttl=10)
+        for word in ('甲', '乙', '丙'):
+            cache.set([word], self.index_info, self.results(), top_k=5)
+        self.assertIsNone(cache.get(['甲'], self.index_info, top_k=5))
+        self.assertIsNotNone(cache.get(['丙'], self.index_info, top_k=5))
+
+        with mock.patch('data_processing.query_cache.time.time', return_value=timezone.now().timestamp() + 60):
+            self.assertIsNone(cache.get(['丙'], self.index_info, top_k=5))
+
+    @override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'default'},
+        'search': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'search'},
+    })
+    def test_shared_clear_only_bumps_namespace(self):
+        from django.core.cache import caches
+        caches['search'].set('other', 'keep')
+        cache = QueryResultCache(alias='search')
+        cache.set(['头痛'], self.index_info, self.results(), top_k=5)
+        self.assertIsNotNone(QueryResultCache(alias='search').get(['头痛'], self.index_info, top_k=5))
+
+        cache.clear()
+        self.assertIsNone(cache.get(['头痛'], self.index_info, top_k=5))
+        self.assertEqual(caches['search'].get('other'), 'keep')
+
+
+class BatchSearchTests(TestCase):
+    """批量检索与逐条检索的结果一致（含增量段与删除标记）"""
+
+    def setUp(self):
+        self.processor = TextProcessor()
+        self.rows = create_qa_rows(random_documents(200))
+        self.queries = [' '.join(query) for query in random_documents(30, seed=9, min_length=1, max_length=5)]
+        self.queries += ['', '没有命中的问题']
+
+    def build_updated_index(self, backend):
+        base = self.processor.build_index(backend=backend)
+        for qa, tokens in zip(self.rows[:10], random_documents(10, seed=10)):
+            qa.processed_question = ' '.join(tokens)
+            qa.save()
+        self.rows[10].delete()
+        return apply_index_updates(base)
+
+    def assert_batch_matches_single(self, index_info, hydrate):
+        batch = self.processor.search_similar_qa_batch(self.queries, index_info, top_k=5, hydrate=hydrate)
+        self.assertEqual(len(batch), len(self.queries))
+        for query, batch_results in zip(self.queries, batch):
+            single = self.processor.search_similar_qa(query, index_info, top_k=5, hydrate=hydrate)
+            self.assertEqual([result['qa_id'] for result in batch_results], [result['qa_id'] for result in single])
+            np.testing.assert_allclose([result['similarity'] for result in batch_results],
+                                       [result['similarity'] for result in single], rtol=1e-6)
+            for batch_result, result in zip(batch_results, single):
+                self.assertEqual(batch_result['qa'].answer, result['qa'].answer)
+
+    def test_tfidf_batch_matches_single(self):
+        index_info = self.build_updated_index('tfidf')
+        self.assert_batch_matches_single(index_info, 'payload')
+        self.assert_batch_matches_single(index_info, 'db')
+
+    def test_bm25_batch_matches_single(self):
+        self.assert_batch_matches_single(self.build_updated_index('bm25'), 'payload')
+
+    def test_top_k_similar_batch_blocks(self):
+        index_info = self.processor.build_index(backend='tfidf')
+        query_matrix = index_info['vectorizer'].transform(self.queries)
+        batch = top_k_similar_batch(query_matrix, index_info['tfidf_matrix_t'], top_k=5, block_size=7)
+        for i, (rows, scores) in enumerate(batch):
+            expected_rows, expected_scores = top_k_similar(query_matrix[i], index_info['tfidf_matrix_t'], top_k=5)
+            np.testing.assert_array_equal(rows, expected_rows)
+            np.testing.assert_allclose(scores, expected_scores)
+
+    def test_chat_batch_endpoint(self):
+        index_info = self.processor.build_index(backend='tfidf')
+        client = Client()
+        with mock.patch('qa_system.views.get_index_manager') as get_index_manager:
+            get_index_manager.return_value.get.return_value = index_info
+            response = client.post('/chat/batch/', json.dumps({'questions': self.queries[:3], 'top_k': 2}),
+                                   content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertEqual([result['question'] for result in data['results']], self.queries[:3])
+            self.assertTrue(all(len(result['matches']) <= 2 for result in data['results']))
+
+            response = client.post('/chat/batch/', json.dumps({'questions': []}), content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+
+
+class ProcessQADataTests(TestCase):
+    """批量预处理：断点续跑、中断后继续，以及进程池只在一次调用期间存在"""
+
+    def setUp(self):
+        self.processor = TextProcessor()
+        self.processor.workers = 1
+        self.rows = [
+            QAData.objects.create(question=f'头痛发热第{i}天怎么办', answer=f'多喝水休息{i}', category='测试')
+            for i in range(12)
+        ]
+        self.tmp_dir = tempfile.mkdtemp()
+        self.checkpoint_path = f'{self.tmp_dir}/process.checkpoint'
+        self.addCleanup(shutil.rmtree, self.tmp_dir, ignore_errors=True)
+
+    def processed_ids(self):
+        return set(QAData.objects.exclude(processed_question='').values_list('id', flat=True))
+
+    def test_resume_from_checkpoint(self):
+        with open(self.checkpoint_path, 'w', encoding='utf-8') as f:
+            f.write(str(self.rows[4].id))
+
+        count = self.processor.process_qa_data(batch_size=5, checkpoint_path=self.checkpoint_path)
+        self.assertEqual(count, 7)
+        self.assertEqual(self.processed_ids(), {qa.id for qa in self.rows[5:]})
+        self.assertFalse(os.path.exists(self.checkpoint_path))
+
+    def test_interrupted_run_continues(self):
+        def interrupt(processed, total):
+            raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            self.processor.process_qa_data(batch_size=5, checkpoint_path=self.checkpoint_path,
+                                           progress_callback=interrupt)
+        with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+            self.assertEqual(int(f.read()), self.rows[4].id)
+        self.assertEqual(self.processed_ids(), {qa.id for qa in self.rows[:5]})
+
+        self.assertEqual(self.processor.process_qa_data(batch_size=5, checkpoint_path=self.checkpoint_path), 7)
+        self.assertEqual(self.processed_ids(), {qa.id for qa in self.rows})
+        self.assertFalse(os.path.exists(self.checkpoint_path))
+
+    def test_pool_matches_serial_and_is_shut_down(self):
+        self.processor.process_qa_data(batch_size=5)
+        expected = list(QAData.objects.order_by('id').values_list('processed_question', 'processed_answer', 'keywords'))
+        QAData.objects.update(processed_question='', processed_answer='', keywords='')
+
+        pools = []
+        create_pool = text_processor.create_pool
+
+        def recording_create_pool(workers):
+            pools.append(create_pool(workers))
+            return pools[-1]
+
+        self.processor.workers = 2
+        with mock.patch.object(text_processor, 'PARALLEL_MIN_TEXTS', 1), \
+                mock.patch('data_processing.text_processor.create_pool', side_effect=recording_create_pool):
+            self.assertEqual(self.processor.process_qa_data(batch_size=5), 12)
+
+        self.assertEqual(len(pools), 1)
+        self.assertTrue(pools[0]._shutdown_thread)
+        self.assertEqual(
+            list(QAData.objects.order_by('id').values_list('processed_question', 'processed_answer', 'keywords')),
+            expected,
+        )
+
+    def test_segment_texts_without_pool_is_serial(self):
+        texts = [qa.question for qa in self.rows] * 100
+        self.processor.workers = 4
+        with mock.patch('data_processing.text_processor.create_pool', side_effect=AssertionError):
+            segmented = self.processor.segment_texts(texts)
+        self.assertEqual(segmented, [self.processor.segment_text(text) for text in texts])
+
+
+class CrawlerSaveTests(TestCase):
+    """爬虫批量入库：按归一化问题去重，变更日志只记录本批插入的行"""
+
+    def setUp(self):
+        self.crawler = DingXiangCrawler()
+        self.existing = QAData.objects.create(question='头痛怎么办？', answer='休息', source='dxy', category='神经科')
+        self.log_start = QADataChangeLog.current_version()
+
+    def qa(self, question):
+        return {'question': question, 'answer': f'{question}的回答', 'source': 'dxy', 'category': '测试'}
+
+    def logged_ids(self):
+        return sorted(QADataChangeLog.objects.filter(id__gt=self.log_start).values_list('qa_id', flat=True))
+
+    def new_ids(self):
+        return sorted(QAData.objects.exclude(id=self.existing.id).values_list('id', flat=True))
+
+    def test_deduplicate(self):
+        crawler_log = CrawlerLog.objects.create(task_name='测试')
+        qa_list = [self.qa(question) for question in
+                   ['头痛 怎么办', '发烧怎么办', '发烧怎么办！', '咳嗽怎么办', 'Fever怎么办', 'fever 怎么办?']]
+
+        count = self.crawler.save_to_database(qa_list, batch_size=4, crawler_log=crawler_log)
+        self.assertEqual(count, 3)
+        self.assertEqual(sorted(QAData.objects.exclude(id=self.existing.id).values_list('question', flat=True)),
+                         sorted(['发烧怎么办', '咳嗽怎么办', 'Fever怎么办']))
+        self.assertEqual(self.logged_ids(), self.new_ids())
+
+        crawler_log.refresh_from_db()
+        self.assertEqual((crawler_log.success_count, crawler_log.duplicate_count), (3, 3))
+        self.assertEqual([stat['inserted'] for stat in crawler_log.get_batch_stats()], [2, 1])
+
+    def test_without_deduplicate_logs_only_inserted_rows(self):
+        qa_list = [self.qa(question) for question in ['头痛怎么办', '头痛怎么办', '咳嗽怎么办']]
+
+        self.assertEqual(self.crawler.save_to_database(qa_list, deduplicate=False), 3)
+        self.assertEqual(QAData.objects.filter(question_hash=self.existing.question_hash).count(), 3)
+        self.assertEqual(len(self.new_ids()), 3)
+        self.assertEqual(self.logged_ids(), self.new_ids())
+
+
+@override_settings(JOB_EXECUTOR='worker')
+class JobTests(TestCase):
+    """后台任务：领取只成功一次、取消、启动时收尾遗留任务，以及旧接口改为提交任务"""
+
+    def running_job(self, worker):
+        job = jobs.submit_job('process_data')
+        Job.objects.filter(id=job.id).update(status='running', worker=worker)
+        return job
+
+    def status(self, job):
+        return Job.objects.get(id=job.id).status
+
+    def test_claim_once(self):
+        first = jobs.submit_job('process_data')
+        second = jobs.submit_job('process_data')
+        self.assertEqual(jobs.claim_next_job().id, first.id)
+        self.assertFalse(jobs._claim(first.id))
+
+        claimed = jobs.claim_next_job()
+        self.assertEqual(claimed.id, second.id)
+        self.assertEqual((claimed.status, claimed.worker), ('running', jobs._worker_id()))
+        self.assertIsNone(jobs.claim_next_job())
+
+    def test_cancel_pending_job(self):
+        job = jobs.submit_job('process_data')
+        self.assertTrue(jobs.cancel_job(job))
+        self.assertEqual(self.status(job), 'cancelled')
+        self.assertFalse(jobs._claim(job.id))
+        self.assertFalse(jobs.cancel_job(job))
+
+    def test_cancel_running_job(self):
+        def handler(context):
+            jobs.cancel_job(context.job)
+            context.progress(1, 1)
+            return {'done': True}
+
+        job = jobs.submit_job('process_data')
+        with mock.patch.dict(jobs.JOB_HANDLERS, {'process_data': handler}):
+            self.assertTrue(jobs._claim(job.id))
+            jobs.run_job(Job.objects.get(id=job.id))
+        job = Job.objects.get(id=job.id)
+        self.assertEqual((job.status, job.cancel_requested), ('cancelled', True))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_recover_jobs(self):
+        hostname = jobs.socket.gethostname()
+        pid = os.getpid()
+        alive = self.running_job(jobs._worker_id())
+        legacy_alive = self.running_job(f'{hostname}:{pid}')
+        other_host = self.running_job(f'{hostname}-other:{pid}:1')
+        exited = self.running_job(f'{hostname}:99999999:1')
+        reused_pid = self.running_job(f'{hostname}:{pid}:1')
+        no_worker = self.running_job('')
+        pending = jobs.submit_job('process_data')
+
+        with mock.patch.object(jobs, '_get_executor') as get_executor:
+            jobs.recover_jobs(requeue_pending=True)
+        get_executor.return_value.submit.assert_called_once_with(jobs._run_in_thread, pending.id)
+
+        for job in (alive, legacy_alive, other_host):
+            self.assertEqual(self.status(job), 'running')
+        for job in (exited, reused_pid, no_worker):
+            self.assertEqual(self.status(job), 'failed')
+        self.assertEqual(self.status(pending), 'pending')
+
+    def test_recover_jobs_once(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir, ignore_errors=True)
+        lock_path = f'{tmp_dir}/job_recovery.lock'
+
+        with mock.patch.object(jobs, 'recover_jobs') as recover_jobs:
+            self.assertTrue(jobs.recover_jobs_once(lock_path))
+            self.assertFalse(jobs.recover_jobs_once(lock_path))
+            self.assertEqual(recover_jobs.call_count, 1)
+
+            # 持有锁的进程已退出（如服务重启）时由下一个进程接管
+            with open(lock_path, 'w', encoding='utf-8') as f:
+                f.write(f'{jobs.socket.gethostname()}:99999999:1')
+            self.assertTrue(jobs.recover_jobs_once(lock_path))
+            self.assertEqual(recover_jobs.call_count, 2)
+        with open(lock_path, 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read(), jobs._worker_id())
+
+    def test_page_endpoints_submit_jobs(self):
+        client = Client()
+        for url, job_type in [('/crawler/start/', 'crawler'), ('/data/process/', 'process_data'),
+                              ('/mining/run/', 'text_mining')]:
+            response = client.post(url, json.dumps({}), content_type='application/json')
+            self.assertEqual(response.status_code, 202)
+            data = response.json()
+            self.assertEqual((data['job_type'], data['status']), (job_type, 'pending'))
+            self.assertEqual(client.get(data['status_url']).json()['job_id'], data['job_id'])
+
+
+class OCRResultCacheTests(TestCase):
+    """识别结果缓存：内容哈希命中、TTL、近似重复图像与图像文件回收"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def image_bytes(self, brightness=0, image_format='PNG'):
+        gradient = np.tile(np.linspace(0, 200, 64, dtype=np.uint8), (64, 1))
+        image = Image.fromarray(np.clip(gradient.astype(int) + brightness, 0, 255).astype(np.uint8))
+        buffer = io.BytesIO()
+        image.save(buffer, format=image_format)
+        return buffer.getvalue()
+
+    def create_result(self, image_bytes, cache, **fields):
+        content_hash, phash = cache.fingerprint(image_bytes)
+        fields.setdefault('extracted_text', '白细胞 5.0')
+        return ImageRecognitionResult.objects.create(
+            image_name='化验单', content_hash=content_hash, perceptual_hash=phash, **fields
+        )
+
+    def test_exact_hit_and_ttl(self):
+        cache = OCRResultCache(ttl=60, perceptual=False)
+        image_bytes = self.image_bytes()
+        result = self.create_result(image_bytes, cache)
+
+        self.assertEqual(cache.lookup(*cache.fingerprint(image_bytes)), result)
+        self.assertIsNone(cache.lookup(*cache.fingerprint(self.image_bytes(brightness=30))))
+
+        ImageRecognitionResult.objects.filter(id=result.id).update(created_at=timezone.now() - timedelta(seconds=120))
+        self.assertIsNone(cache.lookup(*cache.fingerprint(image_bytes)))
+        self.assertEqual(cache.stats()['hits'], 1)
+
+    def test_perceptual_hit(self):
+        cache = OCRResultCache(ttl=60, perceptual=True, max_distance=4)
+        result = self.create_result(self.image_bytes(), cache)
+
+        # 重新编码为JPEG并整体调亮：字节不同，差值哈希相同
+        similar = self.image_bytes(brightness=10, image_format='JPEG')
+        self.assertLessEqual(hamming_distance(perceptual_hash(similar), result.perceptual_hash), 4)
+        self.assertEqual(cache.lookup(*cache.fingerprint(similar)), result)
+        self.assertEqual(perceptual_hash(b'not an image'), '')
+
+    def test_empty_result_is_reused(self):
+        calls = []
+
+        class BlankOCR:
+            def process_medical_image(self, image_bytes, image_name):
+                calls.append(image_name)
+                result = ImageRecognitionResult.objects.create(image_name=image_name, extracted_text='')
+                return {'success': False, 'result_id': result.id, 'ocr_result': {'text': '', 'details': []}}
+
+        pool = mock.Mock()
+        pool.engine.return_value.__enter__ = mock.Mock(return_value=BlankOCR())
+        pool.engine.return_value.__exit__ = mock.Mock(return_value=False)
+        image_bytes = self.image_bytes()
+        with mock.patch('image_recognition.ocr_pool.get_ocr_pool', return_value=pool), \
+                mock.patch('image_recognition.result_cache._cache', OCRResultCache(ttl=60, perceptual=False)):
+            first = recognize_medical_image(io.BytesIO(image_bytes), '空白.png')
+            second = recognize_medical_image(io.BytesIO(image_bytes), '空白.png')
+
+        self.assertEqual(calls, ['空白.png'])
+        self.assertEqual((first['success'], first['cached']), (False, False))
+        self.assertEqual((second['success'], second['cached'], second['result_id']), (False, True, first['result_id']))
+        result = ImageRecognitionResult.objects.get(id=first['result_id'])
+        self.assertEqual(result.content_hash, image_content_hash(image_bytes))
+        self.assertFalse(result.image_file)
+
+    def test_chat_image_keeps_undecodable_upload(self):
+        upload = ContentFile(b'not an image', name='scan.jpg')
+        with mock.patch('qa_system.views.get_index_manager') as get_index_manager:
+            get_index_manager.return_value.get.return_value = None
+            response = Client().post('/chat/image/', {'image': upload})
+        self.assertEqual(response.status_code, 200)
+        message = ChatMessage.objects.get(session__session_id=response.json()['session_id'], sender_type='user')
+        self.assertTrue(message.image.name.startswith('chat_images/'))
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, message.image.name)))
+
+    def test_evict_oldest_files_over_budget(self):
+        cache = OCRResultCache(ttl=3600, max_bytes=150)
+        results = []
+        for i in range(3):
+            result = self.create_result(self.image_bytes(brightness=i), cache, image_size=100)
+            result.image_file.save(f'{i}.png', ContentFile(b'x' * 100))
+            ImageRecognitionResult.objects.filter(id=result.id).update(created_at=timezone.now() - timedelta(seconds=10 - i))
+            results.append(result)
+
+        self.assertEqual(cache.evict(force=True), 2)
+        remaining = [ImageRecognitionResult.objects.get(id=result.id).image_file.name for result in results]
+        self.assertEqual([bool(name) for name in remaining], [False, False, True])
+
+
+class EntityMatcherTests(SimpleTestCase):
+    """Aho-Corasick 一次扫描的匹配结果与逐位置暴力匹配一致"""
+
+    def test_matches_brute_force(self):
+        rng = random.Random(0)
+        alphabet = 'abcAB'
+        words = sorted({''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))) for _ in range(40)})
+        automaton = AhoCorasick((word, word) for word in words)
+
+        for _ in range(50):
+            text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 30)))
+            expected = sorted(
+                (start, start + len(word), word)
+                for word in words for start in range(len(text) - len(word) + 1)
+                if text[start:start + len(word)].lower() == word.lower()
+            )
+            self.assertEqual(sorted(automaton.iter(text)), expected)
+
+    def test_entity_matcher(self):
+        matcher = EntityMatcher([('头痛', '症状'), ('偏头痛', '疾病'), ('CT', '检查'), ('阿司匹林', '药物'),
+                                 ('头痛', '症状'), ('只用于分词', '')])
+        self.assertEqual(matcher.term_count, 4)
+
+        spans = matcher.find('偏头痛要做ct吗')
+        self.assertEqual([(span['text'], span['category']) for span in spans],
+                         [('偏头痛', '疾病'), ('头痛', '症状'), ('CT', '检查')])
+        longest = matcher.find('偏头痛要做ct吗', longest=True)
+        self.assertEqual([span['text'] for span in longest], ['偏头痛', 'CT'])
+        self.assertEqual(matcher.extract('头痛吃阿司匹林，头痛'), {'症状': ['头痛'], '药物': ['阿司匹林']})
+
+
+class FakeSegmenter:
+    """测试用分词器：文本已是空格分隔的词"""
+
+    @contextmanager
+    def segmentation_pool(self, n_texts):
+        yield None
+
+    def segment_texts(self, texts, pool=None):
+        return [text.split() for text in texts]
+
+
+@override_settings(TEXT_MINING_SAMPLE_PER_CLUSTER=20, TEXT_MINING_STREAMING_EPOCHS=2)
+class StreamingClusteringTests(SimpleTestCase):
+    """流式语料的词表/IDF与内存模式一致，流式聚类全量统计簇大小"""
+
+    TOPICS = [
+        ['fever', 'cough', 'throat', 'cold'],
+        ['stomach', 'nausea', 'diarrhea', 'appetite'],
+        ['rash', 'itch', 'skin', 'allergy'],
+    ]
+
+    def texts(self, n_per_topic=40):
+        rng = random.Random(0)
+        texts = []
+        for _ in range(n_per_topic):
+            for topic in self.TOPICS:
+                texts.append(' '.join(rng.choices(topic, k=6)))
+        return texts
+
+    def test_vectorizer_matches_in_memory(self):
+        texts = self.texts()
+        with StreamingCorpus(iter_text_rows(texts), FakeSegmenter(), chunk_size=16) as corpus:
+            vectorizer = corpus.build_vectorizer()
+        expected = TfidfVectorizer(**TFIDF_PARAMS).fit(texts)
+
+        self.assertEqual(vectorizer.vocabulary_, expected.vocabulary_)
+        np.testing.assert_allclose(vectorizer.idf_, expected.idf_)
+
+    def test_stream_clustering(self):
+        texts = self.texts()
+        progress = []
+        with StreamingCorpus(iter_text_rows(texts), FakeSegmenter(), chunk_size=16) as corpus:
+            result, sample_context, sample_labels = stream_clustering(
+                corpus, n_clusters=3, progress_callback=lambda done, total: progress.append((done, total))
+            )
+
+        self.assertEqual(sum(result['cluster_sizes'].values()), len(texts))
+        self.assertEqual(sorted(result['cluster_sizes'].values()), [40, 40, 40])
+        self.assertEqual(progress[-1], (len(texts) * 3, len(texts) * 3))
+        self.assertEqual(len(sample_labels), 60)
+        for info in result['cluster_info'].values():
+            topic = next(topic for topic in self.TOPICS if info['keywords'][0] in topic)
+            self.assertTrue(all(word in topic for word in info['sample_texts'][0].split()))
+
+    def test_reservoir(self):
+        reservoir = Reservoir(10, seed=1)
+        for item in range(1000):
+            slot = reservoir.reserve()
+            if slot is not None:
+                reservoir.items[slot] = item
+        self.assertEqual(reservoir.seen, 1000)
+        self.assertEqual(len(set(reservoir.items)), 10)
+        self.assertGreater(max(reservoir.items), 100)
+
+
+class StratifiedSampleTests(SimpleTestCase):
+    """投影前的按簇分层抽样"""
+
+    def test_small_input_returns_all(self):
+        np.testing.assert_array_equal(stratified_sample([0, 1, 1], budget=10), [0, 1, 2])
+
+    def test_proportional_quotas(self):
+        labels = np.repeat([0, 1, 2], [9000, 900, 5])
+        indices = stratified_sample(labels, budget=1000, min_per_cluster=10)
+
+        self.assertTrue(np.all(np.diff(indices) > 0))
+        counts = Counter(labels[indices].tolist())
+        self.assertEqual(counts[0], 908)
+        self.assertEqual(counts[1], 90)
+        # 小簇不足 min_per_cluster 时全部保留
+        self.assertEqual(counts[2], 5)
+
+    def test_deterministic(self):
+        labels = np.random.RandomState(0).randint(0, 5, size=5000)
+        np.testing.assert_array_equal(stratified_sample(labels, 500), stratified_sample(labels, 500))
+        self.assertLessEqual(len(stratified_sample(labels, 500)), 500 + 5 * 10)
+
+    def test_projection_image_size(self):
+        rng = np.random.RandomState(0)
+        projection = {'points': rng.rand(200, 2), 'labels': rng.randint(0, 3, size=200), 'method': 'pca', 'total': 200}
+        analyzer = TextMiningAnalyzer()
+
+        sizes = []
+        for dpi in (50, 100):
+            with override_settings(TEXT_MINING_PROJECTION_FIGSIZE=(6, 4), TEXT_MINING_PROJECTION_DPI=dpi):
+                image = Image.open(io.BytesIO(base64.b64decode(analyzer.plot_projection(projection))))
+            sizes.append(image.size)
+
+        # bbox_inches='tight' 会按图例等内容调整边缘，像素尺寸约为 英寸 x DPI
+        self.assertLessEqual(sizes[1][0], 6 * 100 * 1.3)
+        self.assertAlmostEqual(sizes[1][0] / sizes[0][0], 2, delta=0.1)
+
+
+@override_settings(TEXT_MINING_WORDCLOUD_SIZE=(120, 80), TEXT_MINING_WORDCLOUD_FORMAT='png')
+class WordCloudRenderTests(SimpleTestCase):
+    """由词频渲染词云：词频统计、图片格式，以及每次调用的进程池"""
+
+    frequencies = {'头痛': {'头痛': 5, '发热': 3}, '空': {}, 'cough': {'cough': 4, 'fever': 2, 'cold': 1}}
+
+    def decode(self, image):
+        return Image.open(io.BytesIO(base64.b64decode(image)))
+
+    def test_term_frequencies(self):
+        frequencies = term_frequencies([['头痛', '发热', '头痛'], ['发热', '头痛', '咳嗽']], max_words=2)
+        self.assertEqual(frequencies, {'头痛': 3, '发热': 2})
+
+    def test_image_format(self):
+        self.assertEqual(get_image_format(), 'png')
+        with override_settings(TEXT_MINING_WORDCLOUD_FORMAT='WEBP'):
+            self.assertIn(get_image_format(), ('webp', 'png'))
+        with override_settings(TEXT_MINING_WORDCLOUD_FORMAT='gif'):
+            with self.assertRaises(ValueError):
+                get_image_format()
+
+    @override_settings(TEXT_MINING_WORDCLOUD_WORKERS=1)
+    def test_render_serial(self):
+        with mock.patch('text_mining.wordcloud_render.ProcessPoolExecutor', side_effect=AssertionError):
+            images = render_wordclouds(self.frequencies)
+        self.assertEqual(list(images), ['头痛', 'cough'])
+        for image in images.values():
+            decoded = self.decode(image)
+            self.assertEqual((decoded.format, decoded.size), ('PNG', (120, 80)))
+        self.assertEqual(render_wordclouds({'空': {}}), {})
+
+    @override_settings(TEXT_MINING_WORDCLOUD_WORKERS=4)
+    def test_render_pool_per_call(self):
+        pools = []
+        executor = wordcloud_render.ProcessPoolExecutor
+
+        def recording_executor(**kwargs):
+            pools.append((kwargs['max_workers'], executor(**kwargs)))
+            return pools[-1][1]
+
+        with mock.patch('text_mining.wordcloud_render.ProcessPoolExecutor', side_effect=recording_executor):
+            images = render_wordclouds(self.frequencies)
+        self.assertEqual(list(images), ['头痛', 'cough'])
+        self.assertEqual(self.decode(images['cough']).size, (120, 80))
+
+        # 进程数不超过词云数，渲染完成后进程池已关闭
+        self.assertEqual([workers for workers, _ in pools], [2])
+        self.assertTrue(pools[0][1]._shutdown_thread)
@@ -10,6 +10,7 @@ urlpatterns = [
     
     # 聊天接口
     path('chat/text/', views.chat_text, name='chat_text'),
+    path('chat/batch/', views.chat_batch, name='chat_batch'),
     path('chat/image/', views.chat_image, name='chat_image'),
     path('chat/history/', views.get_chat_history, name='chat_history'),
     
@@ -18,26 +19,38 @@ urlpatterns = [
     path('document/download/', views.download_analysis_result, name='download_analysis'),
     
     # 爬虫
-    path('crawler/start/', views.start_crawler, name='start_crawler'),
+    path('crawler/start/', views.submit_crawler_job, name='start_crawler'),
     
     # 数据管理
-    path('data/process/', views.process_data, name='process_data'),
+    path('data/process/', views.submit_process_data_job, name='process_data'),
     path('data/stats/', views.get_data_stats, name='get_data_stats'),
     path('data/clear/', views.clear_all_data, name='clear_all_data'),
     
     # 文本挖掘相关URL
-    path('mining/upload/', views.upload_dataset, name='upload_dataset'),
-    path('mining/run/', views.run_text_mining, name='run_text_mining'),
+    path('mining/upload/', views.submit_dataset_job, name='upload_dataset'),
+    path('mining/run/', views.submit_text_mining_job, name='run_text_mining'),
     path('mining/result/<int:result_id>/', views.get_mining_result, name='get_mining_result'),
     path('mining/results/', views.list_mining_results, name='list_mining_results'),
     
     # 图像识别相关URL
-    path('image/upload/', views.upload_medical_image, name='upload_medical_image'),
+    path('image/upload/', views.submit_ocr_job, name='upload_medical_image'),
+    path('image/bulk/', views.submit_bulk_ocr_job, name='bulk_ocr'),
     path('image/result/<int:result_id>/', views.get_recognition_result, name='get_recognition_result'),
     path('image/results/', views.list_recognition_results, name='list_recognition_results'),
     path('image/reanalyze/', views.reanalyze_extracted_text, name='reanalyze_extracted_text'),
     
+    # 后台任务
+    path('jobs/', views.list_jobs, name='list_jobs'),
+    path('jobs/crawler/', views.submit_crawler_job, name='submit_crawler_job'),
+    path('jobs/process-data/', views.submit_process_data_job, name='submit_process_data_job'),
+    path('jobs/text-mining/', views.submit_text_mining_job, name='submit_text_mining_job'),
+    path('jobs/dataset/', views.submit_dataset_job, name='submit_dataset_job'),
+    path('jobs/ocr/', views.submit_ocr_job, name='submit_ocr_job'),
+    path('jobs/<int:job_id>/', views.get_job_status, name='get_job_status'),
+    path('jobs/<int:job_id>/cancel/', views.cancel_job_view, name='cancel_job'),
+    
     # 系统监控相关URL
     path('system/stats/', views.system_stats, name='system_stats'),
     path('system/health/', views.health_check, name='health_check'),
+    path('system/lexicon/reload/', views.reload_lexicon_view, name='reload_lexicon'),
 ] 
\ No newline at end of file
@@ -2,9 +2,12 @@ from django.shortcuts import render
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from django.core.files.storage import default_storage
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
 from django.conf import settings
 import json
+import hashlib
 import uuid
 import os
 import base64
@@ -14,12 +17,83 @@ from datetime import datetime
 import traceback
 import time
 
-from .models import QAData, ChatSession, ChatMessage, Document, TextMiningResult, ImageRecognitionResult
-from data_processing.text_processor import TextProcessor
+from .models import QAData, ChatSession, ChatMessage, Document, TextMiningResult, ImageRecognitionResult, Job
+from .jobs import submit_job, cancel_job, save_upload
+from data_processing.processors import (
+    get_text_processor, get_index_manager, get_query_cache, get_text_analyzer, processor_status
+)
+from data_processing.entity_matcher import get_entity_matcher
+from data_processing.medical_lexicon import get_lexicon, reload_lexicon
 
-# 全局变量存储索引
-text_processor = TextProcessor()
-search_index = None
+# 文本处理器、搜索索引管理器与检索结果缓存由共享处理器注册表在首次使用时创建（见 data_processing.processors）
+# 批量问答接口单次请求的最大问题数
+CHAT_BATCH_MAX_QUESTIONS = 5000
+# 等待空闲OCR引擎的最长时间（秒）
+OCR_CHECKOUT_TIMEOUT = 60
+# PIL 图像格式对应的文件扩展名（未列出的格式使用格式名小写）
+IMAGE_EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'BMP': 'bmp', 'TIFF': 'tiff', 'WEBP': 'webp'}
+
+def preload_search_index():
+    """服务启动时预加载搜索索引，避免首个问答请求承担索引加载开销"""
+    try:
+        get_index_manager().load()
+    except Exception as e:
+        print(f"预加载搜索索引失败: {e}")
+
+def preload_ocr_engines():
+    """服务启动时预加载OCR引擎池（settings.OCR_PRELOAD 为True时），图像识别请求不再承担模型加载开销
+
+    配置了独立的OCR服务（OCR_SERVICE_ADDRESS）时模型常驻在服务进程中，Web进程不加载。
+    """
+    if not getattr(settings, 'OCR_PRELOAD', False) or getattr(settings, 'OCR_SERVICE_ADDRESS', None):
+        return
+    try:
+        from image_recognition.ocr_pool import get_ocr_pool
+        created = get_ocr_pool().preload()
+        print(f"OCR引擎池预加载完成，共 {created} 个引擎")
+    except Exception as e:
+        print(f"预加载OCR引擎失败: {e}")
+
+# 服务启动耗时（秒）：boot 为 wsgi/asgi 创建应用的耗时，preload 为预加载索引与OCR引擎的耗时
+STARTUP_TIMINGS = {'boot_seconds': None, 'preload_seconds': None, 'preload_mode': None}
+
+def _run_preload():
+    start = time.perf_counter()
+    preload_search_index()
+    preload_ocr_engines()
+    STARTUP_TIMINGS['preload_seconds'] = round(time.perf_counter() - start, 3)
+    print(f"服务预加载完成，耗时 {STARTUP_TIMINGS['preload_seconds']} 秒")
+
+def start_preload(boot_seconds=None):
+    """wsgi/asgi 创建应用后调用：按 settings.STARTUP_PRELOAD 预加载搜索索引与OCR引擎
+
+    'background'（默认）在后台线程中预加载，worker 立即开始接受请求（预加载完成前的请求按需加载）；
+    'sync' 预加载完成后才返回；None 不预加载，全部按首次使用时加载。
+    """
+    mode = getattr(settings, 'STARTUP_PRELOAD', 'background')
+    STARTUP_TIMINGS['boot_seconds'] = round(boot_seconds, 3) if boot_seconds is not None else None
+    STARTUP_TIMINGS['preload_mode'] = mode
+    if mode == 'sync':
+        _run_preload()
+    elif mode:
+        import threading
+        threading.Thread(target=_run_preload, name='startup-preload', daemon=True).start()
+
+def parse_optional_bool(value):
+    """解析可选的布尔参数，未提供时返回None（由服务端按数据量决定）"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool):
+        return value
+    return str(value).lower() in ('1', 'true', 'yes', 'on')
+
+def get_ocr_result_cache_stats():
+    """图像识别结果缓存的命中统计（图像识别模块不可用时返回None）"""
+    try:
+        from image_recognition.result_cache import get_result_cache
+        return get_result_cache().stats()
+    except ImportError:
+        return None
 
 def index(request):
     """主页"""
@@ -33,8 +107,6 @@ def dashboard(request):
 @require_http_methods(["POST"])
 def chat_text(request):
     """文本问答接口"""
-    global search_index
-    
     try:
         data = json.loads(request.body)
         question = data.get('question', '').strip()
@@ -61,13 +133,14 @@ def chat_text(request):
             content=question
         )
         
-        # 构建搜索索引（如果还没有）
-        if search_index is None:
-            search_index = text_processor.build_index()
+        # 获取当前索引快照（不等待后台刷新/重建）
+        search_index = get_index_manager().get()
         
         # 搜索相似问答
         if search_index:
-            similar_results = text_processor.search_similar_qa(question, search_index, top_k=3)
+            similar_results = get_text_processor().search_similar_qa(
+                question, search_index, top_k=3, min_similarity=0.1, cache=get_query_cache()
+            )
             
             if similar_results and similar_results[0]['similarity'] > 0.1:
                 # 找到相似问题，返回答案
@@ -109,6 +182,58 @@ def chat_text(request):
         traceback.print_exc()
         return JsonResponse({'error': '服务器内部错误'}, status=500)
 
+@csrf_exempt
+@require_http_methods(["POST"])
+def chat_batch(request):
+    """批量文本问答接口（日志回放、离线评测），不创建会话和消息记录"""
+    try:
+        data = json.loads(request.body)
+        questions = data.get('questions') or []
+        top_k = int(data.get('top_k', 3))
+        min_similarity = float(data.get('min_similarity', 0.1))
+        
+        if not isinstance(questions, list) or not questions:
+            return JsonResponse({'error': 'questions 必须是非空列表'}, status=400)
+        if len(questions) > CHAT_BATCH_MAX_QUESTIONS:
+            return JsonResponse({'error': f'单次最多 {CHAT_BATCH_MAX_QUESTIONS} 个问题'}, status=400)
+        
+        search_index = get_index_manager().get()
+        if not search_index:
+            return JsonResponse({'error': '系统正在初始化，请稍后再试。'}, status=503)
+        
+        start_time = time.time()
+        questions = [str(question).strip() for question in questions]
+        batch_results = get_text_processor().search_similar_qa_batch(
+            questions, search_index, top_k=top_k, min_similarity=min_similarity
+        )
+        
+        results = []
+        for question, similar_results in zip(questions, batch_results):
+            results.append({
+                'question': question,
+                'matches': [{
+                    'qa_id': result['qa_id'],
+                    'question': result['qa'].question,
+                    'answer': result['qa'].answer,
+                    'category': result['qa'].category,
+                    'similarity': round(result['similarity'], 4),
+                } for result in similar_results]
+            })
+        
+        return JsonResponse({
+            'results': results,
+            'count': len(results),
+            'process_time': f"{round(time.time() - start_time, 3)} 秒",
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except (ValueError, TypeError) as e:
+        return JsonResponse({'error': f'请求参数错误: {str(e)}'}, status=400)
+    except Exception as e:
+        print(f"批量问答错误: {e}")
+        traceback.print_exc()
+        return JsonResponse({'error': '服务器内部错误'}, status=500)
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def chat_image(request):
@@ -122,6 +247,13 @@ def chat_image(request):
         if not image_file:
             return JsonResponse({'error': '请上传图像'}, status=400)
         
+        image_bytes = image_file.read()
+        image_file.seek(0)
+        try:
+            image_format = Image.open(io.BytesIO(image_bytes)).format
+        except Exception:
+            image_format = None
+        
         # 获取或创建会话
         if session_id:
             try:
@@ -132,8 +264,14 @@ def chat_image(request):
             session_id = str(uuid.uuid4())
             session = ChatSession.objects.create(session_id=session_id)
         
-        # 保存图像
-        image_path = default_storage.save(f'chat_images/{uuid.uuid4()}.jpg', image_file)
+        # 保存图像（按内容哈希命名，重复上传的同一张图像只保存一份，扩展名取自解码出的实际格式）；
+        # 无法解码的文件与以前一样按随机文件名保存
+        if image_format:
+            extension = IMAGE_EXTENSIONS.get(image_format, image_format.lower())
+            image_path = save_content_addressed(f'chat_images/{hashlib.sha256(image_bytes).hexdigest()}.{extension}', image_bytes)
+        else:
+            image_path = default_storage.save(f'chat_images/{uuid.uuid4()}.jpg', image_file)
+            image_file.seek(0)
         
         # 保存用户消息
         ChatMessage.objects.create(
@@ -154,14 +292,12 @@ def chat_image(request):
             combined_query = image_description
         
         # 搜索相关医疗信息
-        global search_index
-        if search_index is None:
-            search_index = text_processor.build_index()
+        search_index = get_index_manager().get()
         
         answer = f"图像分析结果：{image_description}\n\n"
         
         if search_index:
-            similar_results = text_processor.search_similar_qa(combined_query, search_index, top_k=2)
+            similar_results = get_text_processor().search_similar_qa(combined_query, search_index, top_k=2, min_similarity=0.2)
             if similar_results and similar_results[0]['similarity'] > 0.2:
                 answer += f"相关医疗信息：\n{similar_results[0]['qa'].answer}\n\n"
         
@@ -187,6 +323,26 @@ def chat_image(request):
         traceback.print_exc()
         return JsonResponse({'error': '服务器内部错误'}, status=500)
 
+def save_content_addressed(path, content):
+    """保存按内容命名的文件，返回实际保存的路径
+
+    本地文件存储先写入临时文件再原子地 os.replace 到目标路径：并发上传同一内容时结果相同，
+    不会出现 exists() 与 save() 之间的竞争；其他存储后端使用 save() 返回的路径（同名时可能另起新名）。
+    """
+    if isinstance(default_storage, FileSystemStorage):
+        full_path = default_storage.path(path)
+        if not os.path.exists(full_path):
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            tmp_path = f'{full_path}.{uuid.uuid4().hex}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, full_path)
+        return path
+    
+    if default_storage.exists(path):
+        return path
+    return default_storage.save(path, ContentFile(content))
+
 def analyze_medical_image(image_file):
     """分析医疗图像（模拟功能）"""
     try:
@@ -295,7 +451,7 @@ def analyze_document(document):
         content = document.content
         
         # 词性标注（简化版）
-        words = text_processor.segment_text(content)
+        words = get_text_processor().segment_text(content)
         pos_tags = words[:20]  # 取前20个词作为示例
         
         # 实体识别（简化版）
@@ -321,26 +477,8 @@ def analyze_document(document):
         return {}
 
 def extract_medical_entities(text):
-    """提取医疗实体（简化版）"""
-    # 医疗实体关键词
-    medical_entities = {
-        '疾病': ['感冒', '发烧', '咳嗽', '头痛', '胃痛', '高血压', '糖尿病', '心脏病'],
-        '症状': ['疼痛', '发热', '乏力', '恶心', '呕吐', '腹泻', '失眠', '头晕'],
-        '药物': ['阿司匹林', '布洛芬', '抗生素', '胰岛素', '降压药', '维生素'],
-        '检查': ['血常规', '尿常规', 'B超', 'CT', 'MRI', 'X光', '心电图']
-    }
-    
-    found_entities = {}
-    
-    for category, keywords in medical_entities.items():
-        found = []
-        for keyword in keywords:
-            if keyword in text:
-                found.append(keyword)
-        if found:
-            found_entities[category] = found
-    
-    return found_entities
+    """提取医疗实体 {类别: [实体, ...]}（共享医学词库，一次扫描文本）"""
+    return get_entity_matcher().extract(text)
 
 def generate_summary(text):
     """生成文档摘要（简化版）"""
@@ -430,157 +568,6 @@ def get_chat_history(request):
         print(f"获取聊天历史错误: {e}")
         return JsonResponse({'error': '服务器内部错误'}, status=500)
 
-@csrf_exempt
-@require_http_methods(["POST"])
-def start_crawler(request):
-    """启动爬虫"""
-    try:
-        data = json.loads(request.body)
-        target_count = data.get('target_count', 1000)
-        
-        # 这里可以异步启动爬虫任务
-        # 目前直接导入并运行
-        from crawler.dingxiang_crawler import DingXiangCrawler
-        
-        crawler = DingXiangCrawler()
-        success_count = crawler.crawl_qa_data(target_count)
-        
-        # 重新构建索引
-        global search_index
-        search_index = text_processor.build_index()
-        
-        return JsonResponse({
-            'message': f'爬虫任务完成，成功获取 {success_count} 条数据',
-            'success_count': success_count
-        })
-        
-    except Exception as e:
-        print(f"启动爬虫错误: {e}")
-        traceback.print_exc()
-        return JsonResponse({'error': '服务器内部错误'}, status=500)
-
-@csrf_exempt
-@require_http_methods(["POST"])
-def upload_dataset(request):
-    """上传数据集进行文本挖掘"""
-    try:
-        dataset_file = request.FILES.get('dataset')
-        dataset_name = request.POST.get('dataset_name', '').strip()
-        clustering_method = request.POST.get('clustering_method', 'kmeans')
-        n_clusters = int(request.POST.get('n_clusters', 5))
-        
-        if not dataset_file:
-            return JsonResponse({'error': '请选择数据集文件'}, status=400)
-        
-        if not dataset_name:
-            dataset_name = f"数据集_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        
-        # 处理上传的文件
-        import zipfile
-        import tempfile
-        import shutil
-        
-        texts = []
-        
-        # 创建临时目录
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # 保存上传的文件
-            temp_file_path = os.path.join(temp_dir, dataset_file.name)
-            with open(temp_file_path, 'wb+') as destination:
-                for chunk in dataset_file.chunks():
-                    destination.write(chunk)
-            
-            # 解压ZIP文件
-            if dataset_file.name.endswith('.zip'):
-                with zipfile.ZipFile(temp_file_path, 'r') as zip_ref:
-                    zip_ref.extractall(temp_dir)
-                
-                # 读取所有txt文件
-                for root, dirs, files in os.walk(temp_dir):
-                    for file in files:
-                        if file.endswith('.txt') and not file.startswith('.'):
-                            file_path = os.path.join(root, file)
-                            try:
-                                with open(file_path, 'r', encoding='utf-8') as f:
-                                    content = f.read().strip()
-                                    if content:
-                                        # 按行分割，每行作为一个文档
-                                        lines = [line.strip() for line in content.split('\n') if line.strip()]
-                                        texts.extend(lines)
-                            except Exception as e:
-                                print(f"读取文件 {file_path} 出错: {e}")
-                                continue
-            else:
-                return JsonResponse({'error': '仅支持ZIP格式的数据集文件'}, status=400)
-        
-        if not texts:
-            return JsonResponse({'error': '数据集中没有找到有效的文本数据'}, status=400)
-        
-        print(f"成功读取 {len(texts)} 条文本数据")
-        
-        # 导入文本挖掘分析器
-        from text_mining.text_mining_analyzer import TextMiningAnalyzer
-        
-        analyzer = TextMiningAnalyzer()
-        
-        # 运行分析（使用上传的数据）
-        result = analyzer.run_complete_analysis_with_texts(
-            texts=texts,
-            dataset_name=dataset_name,
-            clustering_method=clustering_method,
-            n_clusters=n_clusters
-        )
-        
-        return JsonResponse({
-            'result_id': result['result_id'],
-            'message': '数据集分析完成',
-            'summary': result['summary'],
-            'tsne_image': result['tsne_image'],
-            'wordclouds': result['wordclouds'],
-            'clustering_info': result['clustering']['cluster_info']
-        })
-        
-    except Exception as e:
-        print(f"数据集上传和分析错误: {e}")
-        traceback.print_exc()
-        return JsonResponse({'error': f'服务器内部错误: {str(e)}'}, status=500)
-
-@csrf_exempt
-@require_http_methods(["POST"])
-def run_text_mining(request):
-    """运行文本挖掘分析（使用现有问答数据）"""
-    try:
-        data = json.loads(request.body)
-        clustering_method = data.get('clustering_method', 'kmeans')
-        n_clusters = int(data.get('n_clusters', 5))
-        dataset_name = data.get('dataset_name', f"医疗问答数据挖掘_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
-        
-        # 导入文本挖掘分析器
-        from text_mining.text_mining_analyzer import TextMiningAnalyzer
-        
-        analyzer = TextMiningAnalyzer()
-        
-        # 运行分析
-        result = analyzer.run_complete_analysis(
-            dataset_name=dataset_name,
-            clustering_method=clustering_method,
-            n_clusters=n_clusters
-        )
-        
-        return JsonResponse({
-            'result_id': result['result_id'],
-            'message': '文本挖掘分析完成',
-            'summary': result['summary'],
-            'tsne_image': result['tsne_image'],
-            'wordclouds': result['wordclouds'],
-            'clustering_info': result['clustering']['cluster_info']
-        })
-        
-    except Exception as e:
-        print(f"文本挖掘分析错误: {e}")
-        traceback.print_exc()
-        return JsonResponse({'error': '服务器内部错误'}, status=500)
-
 @csrf_exempt
 @require_http_methods(["GET"])
 def get_mining_result(request, result_id):
@@ -599,6 +586,7 @@ def get_mining_result(request, result_id):
             'clustering_result': clustering_result,
             'tsne_image': wordcloud_plots.get('tsne_image', ''),
             'wordclouds': wordcloud_plots.get('wordclouds', {}),
+            'wordcloud_format': wordcloud_plots.get('wordcloud_format', 'png'),
         })
         
     except TextMiningResult.DoesNotExist:
@@ -706,8 +694,8 @@ def health_check(request):
         disk_free_gb = disk_usage.free / (1024**3)
         
         # 检查索引状态
-        global search_index
-        index_ready = search_index is not None
+        index_status = get_index_manager().status()
+        index_ready = index_status['ready']
         
         status = "healthy" if disk_free_gb > 1 and qa_count > 0 else "warning"
         
@@ -723,9 +711,13 @@ def health_check(request):
                 'status': 'ok' if disk_free_gb > 1 else 'warning'
             },
             'search_index': {
-                'ready': index_ready,
+                **index_status,
                 'status': 'ok' if index_ready else 'not_built'
             },
+            'query_cache': get_query_cache().stats(),
+            'ocr_result_cache': get_ocr_result_cache_stats(),
+            'lexicon': get_lexicon().status(),
+            'startup': {**STARTUP_TIMINGS, 'processors': processor_status()},
             'timestamp': datetime.now().isoformat()
         })
     except Exception as e:
@@ -736,44 +728,6 @@ def health_check(request):
             'timestamp': datetime.now().isoformat()
         }, status=500)
 
-@csrf_exempt
-@require_http_methods(["POST"])
-def process_data(request):
-    """数据处理接口"""
-    global search_index
-    
-    try:
-        start_time = time.time()
-        
-        # 处理数据
-        processed_count = text_processor.process_qa_data()
-        
-        # 重新构建索引
-        search_index = text_processor.build_index()
-        
-        # 计算处理时间
-        process_time = round(time.time() - start_time, 2)
-        
-        # 获取索引信息
-        index_documents = len(search_index) if search_index else 0
-        
-        return JsonResponse({
-            'message': '数据处理完成',
-            'processed_count': processed_count,
-            'process_time': f"{process_time} 秒",
-            'index_built': search_index is not None,
-            'index_documents': index_documents,
-            'timestamp': datetime.now().isoformat()
-        })
-        
-    except Exception as e:
-        print(f"数据处理错误: {e}")
-        traceback.print_exc()
-        return JsonResponse({
-            'error': f'数据处理失败: {str(e)}',
-            'timestamp': datetime.now().isoformat()
-        }, status=500)
-
 @csrf_exempt
 @require_http_methods(["GET"])
 def get_data_stats(request):
@@ -798,8 +752,7 @@ def get_data_stats(request):
         mining_result_count = TextMiningResult.objects.count()
         
         # 索引状态
-        global search_index
-        index_ready = search_index is not None
+        index_ready = get_index_manager().ready
         
         # 最后更新时间（使用最新的QA数据时间）
         latest_qa = QAData.objects.order_by('-id').first()
@@ -831,8 +784,6 @@ def get_data_stats(request):
 @require_http_methods(["POST"])
 def clear_all_data(request):
     """清除所有数据接口"""
-    global search_index
-    
     try:
         # 统计要删除的数据
         qa_count = QAData.objects.count()
@@ -847,8 +798,8 @@ def clear_all_data(request):
         Document.objects.all().delete()
         TextMiningResult.objects.all().delete()
         
-        # 清除索引
-        search_index = None
+        # 清除索引（同时撤销磁盘上的索引文件，避免其他worker加载到已删除的数据）
+        get_index_manager().clear()
         
         # 清理媒体文件（可选）
         import shutil
@@ -884,90 +835,143 @@ def clear_all_data(request):
 
 # ==================== 图像识别相关视图 ====================
 
-@csrf_exempt
-@require_http_methods(["POST"])
-def upload_medical_image(request):
-    """上传医学图像进行OCR识别"""
+def validate_image_upload(image_file):
+    """校验上传图像的类型与大小，不合法时返回错误信息"""
+    # 验证文件类型
+    allowed_types = ['image/jpeg', 'image/jpg', 'image/png', 'image/bmp', 'image/tiff']
+    if image_file.content_type not in allowed_types:
+        return '仅支持 JPEG、PNG、BMP、TIFF 格式的图像'
+    
+    # 验证文件大小（限制为10MB）
+    if image_file.size > 10 * 1024 * 1024:
+        return '图像文件大小不能超过10MB'
+    
+    return None
+
+class ImageRecognitionError(Exception):
+    """图像识别不可用（模块未安装、OCR服务超时或繁忙），status 为对应的HTTP状态码"""
+    
+    def __init__(self, message, status=500):
+        super().__init__(message)
+        self.status = status
+
+def recognize_medical_image(image_file, image_name, progress_callback=None):
+    """识别医学图像并保存结果，返回接口响应数据（同步接口与后台任务共用）
+    
+    progress_callback: 识别前后调用 progress_callback(已完成步骤数, 总步骤数)，后台任务借此汇报进度与检查取消
+    """
+    # 导入图像识别模块
     try:
-        # 检查是否有文件上传
-        if 'image' not in request.FILES:
-            return JsonResponse({'error': '请选择图像文件'}, status=400)
-        
-        image_file = request.FILES['image']
-        image_name = request.POST.get('image_name', image_file.name)
-        
-        # 验证文件类型
-        allowed_types = ['image/jpeg', 'image/jpg', 'image/png', 'image/bmp', 'image/tiff']
-        if image_file.content_type not in allowed_types:
-            return JsonResponse({'error': '仅支持 JPEG、PNG、BMP、TIFF 格式的图像'}, status=400)
-        
-        # 验证文件大小（限制为10MB）
-        if image_file.size > 10 * 1024 * 1024:
-            return JsonResponse({'error': '图像文件大小不能超过10MB'}, status=400)
-        
-        print(f"开始处理图像: {image_name}, 大小: {image_file.size} bytes")
-        
-        # 导入图像识别模块
+        from image_recognition.ocr_pool import get_ocr_pool, OCRPoolTimeout
+        from image_recognition.ocr_service import get_service_address, OCRServiceClient, OCRServiceError, OCRServiceTimeout
+        from image_recognition.result_cache import get_result_cache
+    except ImportError as e:
+        raise ImageRecognitionError(f'图像识别模块未正确安装: {str(e)}', status=500)
+    
+    start_time = time.time()
+    image_bytes = image_file.read()
+    image_file.seek(0)
+    
+    # 相同（或近似）的图像已有识别结果时直接返回，不再识别
+    result_cache = get_result_cache() if getattr(settings, 'OCR_CACHE_ENABLED', True) else None
+    content_hash, phash = '', ''
+    if result_cache is not None:
+        content_hash, phash = result_cache.fingerprint(image_bytes)
+        cached = result_cache.lookup(content_hash, phash)
+        if cached is not None:
+            print(f"图像识别复用已有结果: {image_name} -> #{cached.id}")
+            return cached_recognition_response(cached, time.time() - start_time)
+    
+    if progress_callback:
+        progress_callback(1, 3)
+    
+    if get_service_address():
+        # 提交给独立的OCR服务识别，请求线程只等待结果，文本分析与保存在本进程完成
         try:
-            from image_recognition.medical_ocr import MedicalOCR
-        except ImportError as e:
-            return JsonResponse({'error': f'图像识别模块未正确安装: {str(e)}'}, status=500)
-        
-        # 初始化OCR识别器
-        start_time = time.time()
+            ocr_result = OCRServiceClient().recognize(image_bytes)
+        except OCRServiceTimeout as e:
+            raise ImageRecognitionError(f'OCR识别超时，请稍后再试: {str(e)}', status=504)
+        except OCRServiceError as e:
+            raise ImageRecognitionError(f'OCR服务不可用: {str(e)}', status=503)
+        result = get_text_analyzer().process_medical_image(image_file, image_name, ocr_result=ocr_result)
+    else:
+        # 从引擎池借出OCR识别器（模型已预加载，耗时只包含识别本身）
         try:
-            ocr = MedicalOCR()
+            with get_ocr_pool().engine(timeout=OCR_CHECKOUT_TIMEOUT) as ocr:
+                # 进行图像识别（直接使用已读取的图像字节）
+                result = ocr.process_medical_image(image_bytes, image_name)
+        except OCRPoolTimeout as e:
+            raise ImageRecognitionError(f'OCR服务繁忙，请稍后再试: {str(e)}', status=503)
         except Exception as e:
-            return JsonResponse({'error': f'OCR初始化失败: {str(e)}'}, status=500)
-        
-        # 进行图像识别
-        result = ocr.process_medical_image(image_file, image_name)
-        processing_time = time.time() - start_time
-        
-        # 计算平均置信度
-        avg_confidence = 0.0
-        if result.get('ocr_result', {}).get('details'):
-            confidences = [detail['confidence'] for detail in result['ocr_result']['details']]
-            if confidences:
-                avg_confidence = sum(confidences) / len(confidences)
-        
-        # 保存图像文件（如果识别成功）
-        if result.get('success'):
-            try:
-                # 更新数据库记录，保存图像文件
-                if result.get('result_id'):
-                    recognition_result = ImageRecognitionResult.objects.get(id=result['result_id'])
-                    recognition_result.image_file = image_file
-                    recognition_result.processing_time = processing_time
-                    recognition_result.confidence_score = avg_confidence
-                    recognition_result.save()
-            except Exception as db_error:
-                print(f"保存图像文件错误: {db_error}")
-        
-        # 返回识别结果
-        response_data = {
-            'success': result.get('success', False),
-            'result_id': result.get('result_id'),
-            'extracted_text': result.get('ocr_result', {}).get('text', ''),
-            'total_detections': result.get('ocr_result', {}).get('total_detections', 0),
-            'confidence_score': round(avg_confidence, 3),
-            'processing_time': round(processing_time, 2),
-            'analysis': result.get('text_analysis', {}),
-            'message': '图像识别完成' if result.get('success') else '图像识别失败'
-        }
-        
-        # 如果有错误，添加错误信息
-        if 'error' in result:
-            response_data['error'] = result['error']
-        
-        print(f"图像识别完成: {image_name}, 识别文本长度: {len(response_data['extracted_text'])}")
-        
-        return JsonResponse(response_data)
-        
-    except Exception as e:
-        print(f"图像上传和识别错误: {e}")
-        traceback.print_exc()
-        return JsonResponse({'error': f'服务器内部错误: {str(e)}'}, status=500)
+            raise ImageRecognitionError(f'OCR初始化失败: {str(e)}', status=500)
+    processing_time = time.time() - start_time
+    
+    if progress_callback:
+        progress_callback(2, 3)
+    
+    # 计算平均置信度
+    avg_confidence = 0.0
+    if result.get('ocr_result', {}).get('details'):
+        confidences = [detail['confidence'] for detail in result['ocr_result']['details']]
+        if confidences:
+            avg_confidence = sum(confidences) / len(confidences)
+    
+    # 每条保存的识别记录都写入耗时与图像指纹（未识别出文本的结果同样可以复用），识别成功时另外保存图像文件
+    if result.get('result_id'):
+        try:
+            recognition_result = ImageRecognitionResult.objects.get(id=result['result_id'])
+            recognition_result.processing_time = processing_time
+            recognition_result.confidence_score = avg_confidence
+            recognition_result.content_hash = content_hash
+            recognition_result.perceptual_hash = phash
+            if result.get('success'):
+                recognition_result.image_file = image_file if isinstance(image_file, File) else File(image_file, name=image_name)
+                recognition_result.image_size = len(image_bytes)
+            recognition_result.save()
+        except Exception as db_error:
+            print(f"保存识别结果错误: {db_error}")
+        
+        if result_cache is not None:
+            result_cache.evict()
+    
+    # 返回识别结果
+    response_data = {
+        'success': result.get('success', False),
+        'result_id': result.get('result_id'),
+        'extracted_text': result.get('ocr_result', {}).get('text', ''),
+        'total_detections': result.get('ocr_result', {}).get('total_detections', 0),
+        'confidence_score': round(avg_confidence, 3),
+        'processing_time': round(processing_time, 2),
+        'timings': result.get('timings', {}),
+        'analysis': result.get('text_analysis', {}),
+        'cached': False,
+        'message': '图像识别完成' if result.get('success') else '图像识别失败'
+    }
+    
+    # 如果有错误，添加错误信息
+    if 'error' in result:
+        response_data['error'] = result['error']
+    
+    print(f"图像识别完成: {image_name}, 识别文本长度: {len(response_data['extracted_text'])}")
+    
+    return response_data
+
+def cached_recognition_response(recognition_result, processing_time):
+    """由已保存的识别结果构造接口响应数据"""
+    details = recognition_result.get_recognition_details()
+    success = bool(recognition_result.extracted_text)
+    return {
+        'success': success,
+        'result_id': recognition_result.id,
+        'extracted_text': recognition_result.extracted_text,
+        'total_detections': details.get('total_detections', 0),
+        'confidence_score': round(recognition_result.confidence_score, 3),
+        'processing_time': round(processing_time, 2),
+        'timings': {},
+        'analysis': recognition_result.get_analysis_result(),
+        'cached': True,
+        'message': '图像识别完成（复用已有识别结果）' if success else '图像识别失败（复用已有识别结果）'
+    }
 
 @csrf_exempt
 @require_http_methods(["GET"])
@@ -1055,11 +1059,8 @@ def reanalyze_extracted_text(request):
         if not recognition_result.extracted_text:
             return JsonResponse({'error': '没有可分析的文本'}, status=400)
         
-        # 重新分析文本
-        from image_recognition.medical_ocr import MedicalOCR
-        ocr = MedicalOCR()
-        
-        analysis = ocr.analyze_medical_text(recognition_result.extracted_text)
+        # 重新分析文本（只做文本分析，不需要加载OCR模型）
+        analysis = get_text_analyzer().analyze_medical_text(recognition_result.extracted_text)
         
         # 更新分析结果
         recognition_result.analysis_result = json.dumps(analysis, ensure_ascii=False)
@@ -1076,3 +1077,170 @@ def reanalyze_extracted_text(request):
     except Exception as e:
         print(f"重新分析文本错误: {e}")
         return JsonResponse({'error': '服务器内部错误'}, status=500)
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def reload_lexicon_view(request):
+    """重新加载医学词库（修改词库文件后调用，不需要重启服务）"""
+    try:
+        data = json.loads(request.body or '{}')
+        lexicon = reload_lexicon(force=bool(data.get('force')))
+        return JsonResponse({'success': True, 'lexicon': lexicon.status()})
+    except Exception as e:
+        print(f"重新加载医学词库错误: {e}")
+        traceback.print_exc()
+        return JsonResponse({'error': f'重新加载医学词库失败: {str(e)}'}, status=500)
+
+# ==================== 后台任务相关视图 ====================
+
+def job_response(job, status=202):
+    """提交任务后的响应：任务ID与状态查询地址"""
+    return JsonResponse({
+        'job_id': job.id,
+        'job_type': job.job_type,
+        'status': job.status,
+        'status_url': f'/jobs/{job.id}/',
+    }, status=status)
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def submit_crawler_job(request):
+    """提交爬虫任务"""
+    try:
+        data = json.loads(request.body or '{}')
+        job = submit_job('crawler', target_count=int(data.get('target_count', 1000)))
+        return job_response(job)
+    except (ValueError, TypeError) as e:
+        return JsonResponse({'error': f'请求参数错误: {str(e)}'}, status=400)
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def submit_process_data_job(request):
+    """提交数据处理任务"""
+    return job_response(submit_job('process_data'))
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def submit_text_mining_job(request):
+    """提交文本挖掘任务（使用现有问答数据）"""
+    try:
+        data = json.loads(request.body or '{}')
+        job = submit_job(
+            'text_mining',
+            dataset_name=data.get('dataset_name', f"医疗问答数据挖掘_{datetime.now().strftime('%Y%m%d_%H%M%S')}"),
+            clustering_method=data.get('clustering_method', 'kmeans'),
+            n_clusters=int(data.get('n_clusters', 5)),
+            streaming=parse_optional_bool(data.get('streaming')),
+        )
+        return job_response(job)
+    except (ValueError, TypeError) as e:
+        return JsonResponse({'error': f'请求参数错误: {str(e)}'}, status=400)
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def submit_dataset_job(request):
+    """提交数据集文本挖掘任务（上传ZIP数据集）"""
+    dataset_file = request.FILES.get('dataset')
+    if not dataset_file:
+        return JsonResponse({'error': '请选择数据集文件'}, status=400)
+    if not dataset_file.name.endswith('.zip'):
+        return JsonResponse({'error': '仅支持ZIP格式的数据集文件'}, status=400)
+    
+    try:
+        n_clusters = int(request.POST.get('n_clusters', 5))
+    except ValueError as e:
+        return JsonResponse({'error': f'请求参数错误: {str(e)}'}, status=400)
+    
+    dataset_name = request.POST.get('dataset_name', '').strip() or f"数据集_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    job = submit_job(
+        'dataset_mining',
+        file_path=save_upload(dataset_file),
+        dataset_name=dataset_name,
+        clustering_method=request.POST.get('clustering_method', 'kmeans'),
+        n_clusters=n_clusters,
+        streaming=parse_optional_bool(request.POST.get('streaming')),
+    )
+    return job_response(job)
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def submit_ocr_job(request):
+    """提交图像识别任务"""
+    if 'image' not in request.FILES:
+        return JsonResponse({'error': '请选择图像文件'}, status=400)
+    
+    image_file = request.FILES['image']
+    validation_error = validate_image_upload(image_file)
+    if validation_error:
+        return JsonResponse({'error': validation_error}, status=400)
+    
+    job = submit_job(
+        'ocr',
+        file_path=save_upload(image_file),
+        image_name=request.POST.get('image_name', image_file.name),
+    )
+    return job_response(job)
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def submit_bulk_ocr_job(request):
+    """提交批量图像识别任务（上传包含医学图像的ZIP）"""
+    archive_file = request.FILES.get('archive')
+    if not archive_file:
+        return JsonResponse({'error': '请选择图像压缩包'}, status=400)
+    if not archive_file.name.lower().endswith('.zip'):
+        return JsonResponse({'error': '仅支持ZIP格式的压缩包'}, status=400)
+    
+    return job_response(submit_job('bulk_ocr', file_path=save_upload(archive_file)))
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def get_job_status(request, job_id):
+    """查询任务状态与进度"""
+    try:
+        return JsonResponse(Job.objects.get(id=job_id).to_dict())
+    except Job.DoesNotExist:
+        return JsonResponse({'error': '任务不存在'}, status=404)
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def cancel_job_view(request, job_id):
+    """取消任务"""
+    try:
+        job = Job.objects.get(id=job_id)
+    except Job.DoesNotExist:
+        return JsonResponse({'error': '任务不存在'}, status=404)
+    
+    if job.is_finished:
+        return JsonResponse({'error': '任务已结束，无法取消', 'status': job.status}, status=409)
+    
+    cancel_job(job)
+    job.refresh_from_db()
+    return JsonResponse(job.to_dict())
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def list_jobs(request):
+    """列出最近的任务"""
+    try:
+        page = int(request.GET.get('page', 1))
+        page_size = int(request.GET.get('page_size', 20))
+    except ValueError as e:
+        return JsonResponse({'error': f'请求参数错误: {str(e)}'}, status=400)
+    
+    jobs = Job.objects.all()
+    job_type = request.GET.get('job_type')
+    if job_type:
+        jobs = jobs.filter(job_type=job_type)
+    status = request.GET.get('status')
+    if status:
+        jobs = jobs.filter(status=status)
+    
+    total_count = jobs.count()
+    offset = (page - 1) * page_size
+    return JsonResponse({
+        'jobs': [job.to_dict() for job in jobs[offset:offset + page_size]],
+        'total_count': total_count,
+        'page': page,
+        'page_size': page_size,
+    })
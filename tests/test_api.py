@@ -11,6 +11,18 @@ import os
 
 BASE_URL = "http://127.0.0.1:8000"
 
+def wait_for_job(data, timeout=600):
+    """轮询后台任务状态直到结束，返回任务结果（失败或取消时返回包含 error 的字典）"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = requests.get(f"{BASE_URL}{data['status_url']}").json()
+        if job['status'] == 'completed':
+            return job['result']
+        if job['status'] in ('failed', 'cancelled'):
+            return {'error': job.get('error') or job.get('message')}
+        time.sleep(1)
+    return {'error': '等待任务超时'}
+
 def test_health_check():
     """测试健康检查"""
     print("🔍 测试系统健康检查...")
@@ -149,6 +161,8 @@ def test_text_mining():
                                headers={"Content-Type": "application/json"})
         
         data = response.json()
+        if response.status_code == 202:
+            data = wait_for_job(data)
         if data.get('result_id'):
             print(f"   挖掘结果ID: {data['result_id']}")
             print(f"   处理文档数: {data.get('n_documents', 0)}")
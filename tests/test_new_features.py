@@ -10,6 +10,18 @@ import time
 
 BASE_URL = "http://localhost:8000"
 
+def wait_for_job(data, timeout=600):
+    """轮询后台任务状态直到结束，返回任务结果（失败或取消时返回包含 error 的字典）"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = requests.get(f"{BASE_URL}{data['status_url']}").json()
+        if job['status'] == 'completed':
+            return job['result']
+        if job['status'] in ('failed', 'cancelled'):
+            return {'error': job.get('error') or job.get('message')}
+        time.sleep(1)
+    return {'error': '等待任务超时'}
+
 def test_api():
     """测试新的API功能"""
     
@@ -38,14 +50,14 @@ def test_api():
     try:
         response = requests.post(f"{BASE_URL}/data/process/", 
                                headers={"Content-Type": "application/json"})
-        if response.status_code == 200:
-            data = response.json()
+        data = wait_for_job(response.json()) if response.status_code == 202 else {}
+        if data.get('processed_count') is not None:
             print(f"   ✅ 数据处理成功")
             print(f"   ⚙️ 处理数量: {data['processed_count']} 条")
             print(f"   ⏱️ 处理时间: {data['process_time']}")
             print(f"   📚 索引文档: {data['index_documents']} 个")
         else:
-            print(f"   ❌ 数据处理失败: {response.status_code}")
+            print(f"   ❌ 数据处理失败: {data.get('error', response.status_code)}")
     except Exception as e:
         print(f"   ❌ 数据处理异常: {e}")
     
@@ -0,0 +1,126 @@
+"""
+文本挖掘分析上下文
+
+一次分析中聚类、关键词、t-SNE 与词云都基于同一份分词结果：每篇文档只分词一次
+（问答数据直接复用预处理时保存的 processed_question / processed_answer，只有未预处理的行才现场分词），
+TF-IDF 也只拟合一次，各阶段共用分词结果与矩阵。
+"""
+import time
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from qa_system.models import QAData
+
+# 分块分词时每块的文本数（每块之后汇报一次进度）
+SEGMENT_CHUNK_SIZE = 4096
+
+# 聚类与关键词使用的TF-IDF参数
+TFIDF_PARAMS = {
+    'max_features': 1000,
+    'ngram_range': (1, 2),
+    'min_df': 2,
+    'max_df': 0.8,
+}
+
+
+class AnalysisContext:
+    """一次文本挖掘分析的语料：原文、分词结果、类别与（按需构建的）TF-IDF矩阵"""
+
+    def __init__(self, texts, tokens, categories=None, reused=0, tokenize_seconds=0.0):
+        self.texts = texts
+        self.tokens = tokens
+        self.categories = categories
+        self.timings = {'tokenize': round(tokenize_seconds, 3)}
+        self.segmented_count = len(tokens) - reused
+        self.reused_count = reused
+
+        self._documents = None
+        self._vectorizer = None
+        self._matrix = None
+
+    @staticmethod
+    def segment_in_chunks(text_processor, texts, progress_callback=None):
+        """分块分词（文本较多时使用本次分词期间的进程池并行），每块之后调用 progress_callback(已分词数, 总数)"""
+        tokens = []
+        with text_processor.segmentation_pool(len(texts)) as pool:
+            for start in range(0, len(texts), SEGMENT_CHUNK_SIZE):
+                tokens.extend(text_processor.segment_texts(texts[start:start + SEGMENT_CHUNK_SIZE], pool=pool))
+                if progress_callback:
+                    progress_callback(len(tokens), len(texts))
+        return tokens
+
+    @classmethod
+    def from_texts(cls, texts, text_processor, categories=None, progress_callback=None):
+        """对文本逐篇分词"""
+        texts = list(texts)
+        start = time.time()
+        tokens = cls.segment_in_chunks(text_processor, texts, progress_callback)
+        return cls(texts, tokens, categories, tokenize_seconds=time.time() - start)
+
+    @classmethod
+    def from_qa_data(cls, text_processor, queryset=None, progress_callback=None):
+        """加载问答数据，已预处理的行直接使用保存的分词结果"""
+        queryset = QAData.objects.all() if queryset is None else queryset
+        rows = queryset.order_by('id').values_list(
+            'question', 'answer', 'category', 'processed_question', 'processed_answer'
+        )
+
+        texts, categories, tokens, pending = [], [], [], []
+        for question, answer, category, processed_question, processed_answer in rows:
+            texts.append(question + " " + answer)
+            categories.append(category or "未分类")
+            if processed_question or processed_answer:
+                tokens.append(f"{processed_question} {processed_answer}".split())
+            else:
+                tokens.append(None)
+                pending.append(len(texts) - 1)
+
+        start = time.time()
+        segmented = cls.segment_in_chunks(text_processor, [texts[i] for i in pending], progress_callback)
+        for i, words in zip(pending, segmented):
+            tokens[i] = words
+        return cls(texts, tokens, categories, reused=len(texts) - len(pending),
+                   tokenize_seconds=time.time() - start)
+
+    @classmethod
+    def from_vectors(cls, texts, tokens, vectorizer, matrix):
+        """由已向量化的文档构建（如流式分析的样本），不再重新拟合TF-IDF"""
+        context = cls(texts, tokens, reused=len(texts))
+        context._vectorizer = vectorizer
+        context._matrix = matrix
+        return context
+
+    def __len__(self):
+        return len(self.texts)
+
+    @property
+    def documents(self):
+        """空格连接的分词结果（TF-IDF 的输入）"""
+        if self._documents is None:
+            self._documents = [" ".join(words) for words in self.tokens]
+        return self._documents
+
+    def vectorize(self):
+        """拟合一次TF-IDF，返回 (vectorizer, 稀疏矩阵)"""
+        if self._matrix is None:
+            start = time.time()
+            self._vectorizer = TfidfVectorizer(**TFIDF_PARAMS)
+            self._matrix = self._vectorizer.fit_transform(self.documents)
+            self.timings['vectorize'] = round(time.time() - start, 3)
+        return self._vectorizer, self._matrix
+
+    @staticmethod
+    def group_documents(labels):
+        """按标签汇总文档下标 {标签: [下标, ...]}，保持标签首次出现的顺序"""
+        groups = {}
+        for i, label in enumerate(labels):
+            groups.setdefault(label, []).append(i)
+        return groups
+
+    def stats(self):
+        return {
+            'documents': len(self.texts),
+            'segmented': self.segmented_count,
+            'reused_processed': self.reused_count,
+            'timings': self.timings,
+        }
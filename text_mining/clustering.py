@@ -0,0 +1,161 @@
+"""
+稀疏文本聚类
+
+TF-IDF 矩阵是稀疏的（每篇文档只有几十个非零特征），聚类全程直接使用CSR矩阵，不再 toarray()：
+内存与非零元个数成正比，而不是 文档数 x 特征数（百万行 x 1000 特征的稠密 float64 就要 8 GB）。
+
+    - kmeans            文档数不超过 TEXT_MINING_MINIBATCH_THRESHOLD 时用 KMeans，超过时自动改用 MiniBatchKMeans
+    - minibatch_kmeans  MiniBatchKMeans，按小批量读取CSR行
+    - spherical_kmeans  球面k-means：行与中心都做L2归一化，按余弦相似度分配（适合TF-IDF），分块计算相似度
+    - dbscan            在稀疏的半径近邻图上执行（只保存 eps 以内的邻居）；
+                        TEXT_MINING_DBSCAN_REDUCTION='svd' 时先用 TruncatedSVD 降维再聚类
+
+新增聚类方法时用 @register_clusterer('名称') 登记 (matrix, n_clusters) -> 标签数组 的函数。
+"""
+import numpy as np
+from django.conf import settings
+from scipy.sparse import csr_matrix
+from sklearn.cluster import DBSCAN, KMeans, MiniBatchKMeans
+from sklearn.decomposition import TruncatedSVD
+from sklearn.neighbors import NearestNeighbors
+from sklearn.preprocessing import normalize
+
+RANDOM_STATE = 42
+
+CLUSTERERS = {}
+
+
+def register_clusterer(name):
+    """注册聚类方法的装饰器"""
+    def decorator(func):
+        CLUSTERERS[name] = func
+        return func
+    return decorator
+
+
+def cluster_matrix(matrix, method='kmeans', n_clusters=5):
+    """对稀疏矩阵聚类，返回每行的簇标签（DBSCAN 噪声点为 -1）"""
+    clusterer = CLUSTERERS.get(method)
+    if clusterer is None:
+        raise ValueError("不支持的聚类方法")
+    return np.asarray(clusterer(csr_matrix(matrix), n_clusters))
+
+
+def _batch_size():
+    return getattr(settings, 'TEXT_MINING_BATCH_SIZE', 4096)
+
+
+@register_clusterer('kmeans')
+def kmeans(matrix, n_clusters):
+    if matrix.shape[0] > getattr(settings, 'TEXT_MINING_MINIBATCH_THRESHOLD', 50000):
+        return minibatch_kmeans(matrix, n_clusters)
+    return KMeans(n_clusters=n_clusters, random_state=RANDOM_STATE, n_init=10).fit_predict(matrix)
+
+
+@register_clusterer('minibatch_kmeans')
+def minibatch_kmeans(matrix, n_clusters):
+    clusterer = MiniBatchKMeans(
+        n_clusters=n_clusters, random_state=RANDOM_STATE, n_init=3, batch_size=_batch_size()
+    )
+    return clusterer.fit_predict(matrix)
+
+
+@register_clusterer('spherical_kmeans')
+def spherical_kmeans(matrix, n_clusters):
+    return SphericalKMeans(n_clusters, chunk_size=_batch_size()).fit_predict(matrix)
+
+
+@register_clusterer('dbscan')
+def dbscan(matrix, n_clusters=None):
+    eps = getattr(settings, 'TEXT_MINING_DBSCAN_EPS', 0.5)
+    min_samples = getattr(settings, 'TEXT_MINING_DBSCAN_MIN_SAMPLES', 5)
+
+    if getattr(settings, 'TEXT_MINING_DBSCAN_REDUCTION', 'graph') == 'svd':
+        # 降到低维稠密空间（文档数 x 维数），再用树索引查找半径近邻
+        n_components = min(getattr(settings, 'TEXT_MINING_SVD_COMPONENTS', 100), matrix.shape[1] - 1)
+        reduced = TruncatedSVD(n_components=n_components, random_state=RANDOM_STATE).fit_transform(matrix)
+        return DBSCAN(eps=eps, min_samples=min_samples).fit_predict(normalize(reduced))
+
+    # 稀疏半径近邻图：只保存距离不超过 eps 的文档对，DBSCAN 直接在图上扩展簇
+    graph = NearestNeighbors(radius=eps).fit(matrix).radius_neighbors_graph(matrix, mode='distance')
+    return DBSCAN(eps=eps, min_samples=min_samples, metric='precomputed').fit_predict(graph)
+
+
+class SphericalKMeans:
+    """球面k-means：在单位球面上按余弦相似度聚类，中心为簇内向量之和的归一化
+
+    相似度按 chunk_size 行分块计算（每块 chunk_size x n_clusters 的稠密矩阵），中心更新用稀疏的
+    指示矩阵乘法完成，整个过程不产生与特征数同阶的稠密文档矩阵。
+    以 n_init 组不同的初始中心各运行一次，保留簇内相似度之和最大的结果。
+    """
+
+    def __init__(self, n_clusters, n_init=3, max_iter=50, tol=1e-4, chunk_size=4096, random_state=RANDOM_STATE):
+        self.n_clusters = n_clusters
+        self.n_init = n_init
+        self.max_iter = max_iter
+        self.tol = tol
+        self.chunk_size = chunk_size
+        self.random_state = np.random.RandomState(random_state)
+        self.cluster_centers_ = None
+        self.objective_ = None
+
+    def _assign(self, matrix):
+        """返回 (标签, 与所属中心的相似度)"""
+        labels = np.empty(matrix.shape[0], dtype=np.int64)
+        similarities = np.empty(matrix.shape[0])
+        for start in range(0, matrix.shape[0], self.chunk_size):
+            chunk = np.asarray(matrix[start:start + self.chunk_size] @ self.cluster_centers_.T)
+            labels[start:start + len(chunk)] = chunk.argmax(axis=1)
+            similarities[start:start + len(chunk)] = chunk.max(axis=1)
+        return labels, similarities
+
+    def _init_centers(self, matrix):
+        """k-means++ 初始化（距离取 1 - 余弦相似度）"""
+        n_rows = matrix.shape[0]
+        centers = [matrix[self.random_state.randint(n_rows)].toarray().ravel()]
+        best = np.asarray(matrix @ centers[0]).ravel()
+        for _ in range(1, self.n_clusters):
+            distances = np.clip(1.0 - best, 0.0, None)
+            total = distances.sum()
+            row = self.random_state.choice(n_rows, p=distances / total) if total > 0 else self.random_state.randint(n_rows)
+            centers.append(matrix[row].toarray().ravel())
+            best = np.maximum(best, np.asarray(matrix @ centers[-1]).ravel())
+        return normalize(np.vstack(centers))
+
+    def _fit_once(self, matrix):
+        """从一组初始中心迭代到收敛，返回 (中心, 簇内相似度之和)"""
+        n_rows = matrix.shape[0]
+        self.cluster_centers_ = self._init_centers(matrix)
+        previous = None
+        for _ in range(self.max_iter):
+            labels, similarities = self._assign(matrix)
+            objective = similarities.sum()
+            if previous is not None and objective - previous <= self.tol * max(abs(previous), 1.0):
+                break
+            previous = objective
+
+            # 簇内向量求和：稀疏指示矩阵 (k x n) 乘以文档矩阵
+            indicator = csr_matrix((np.ones(n_rows), (labels, np.arange(n_rows))), shape=(self.n_clusters, n_rows))
+            centers = np.asarray((indicator @ matrix).todense())
+            # 空簇用离当前中心最远的文档重新初始化
+            for cluster_id in np.flatnonzero(np.bincount(labels, minlength=self.n_clusters) == 0):
+                farthest = int(similarities.argmin())
+                centers[cluster_id] = matrix[farthest].toarray().ravel()
+                similarities[farthest] = np.inf
+            self.cluster_centers_ = normalize(centers)
+
+        return self.cluster_centers_, self._assign(matrix)[1].sum()
+
+    def fit_predict(self, matrix):
+        matrix = normalize(csr_matrix(matrix, dtype=np.float64))
+        if matrix.shape[0] < self.n_clusters:
+            raise ValueError(f"文档数（{matrix.shape[0]}）少于聚类数（{self.n_clusters}）")
+
+        best_centers = None
+        for _ in range(self.n_init):
+            centers, objective = self._fit_once(matrix)
+            if self.objective_ is None or objective > self.objective_:
+                best_centers, self.objective_ = centers, objective
+
+        self.cluster_centers_ = best_centers
+        return self._assign(matrix)[0]
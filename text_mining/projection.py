@@ -0,0 +1,135 @@
+"""
+文本向量的二维投影（聚类可视化）
+
+散点图上几十万个点既看不清，精确 t-SNE 的耗时与内存也随点数平方增长，投影分三步：
+    1. 按簇分层抽样到 TEXT_MINING_PROJECTION_BUDGET 个点（各簇按大小比例分配，小簇至少保留少量点）
+    2. TruncatedSVD 把稀疏TF-IDF直接降到 TEXT_MINING_PROJECTION_SVD_COMPONENTS 维（不生成稠密的全特征矩阵）
+    3. 投影到二维：
+        - tsne      Barnes-Hut t-SNE（O(n log n)）
+        - tsne_fft  FFT加速的 t-SNE（需要安装 openTSNE，未安装时退回 Barnes-Hut）
+        - pca       SVD 前两个主方向，最快，适合只看大致分布
+
+新增投影方法时用 @register_projector('名称') 登记 (降维后的稠密矩阵) -> n x 2 坐标 的函数。
+"""
+import inspect
+import time
+
+import numpy as np
+from django.conf import settings
+from sklearn.decomposition import TruncatedSVD
+from sklearn.manifold import TSNE
+
+RANDOM_STATE = 42
+
+PROJECTORS = {}
+
+PROJECTION_TITLES = {
+    'tsne': 't-SNE',
+    'tsne_fft': 't-SNE',
+    'pca': 'PCA',
+}
+
+
+def register_projector(name):
+    """注册投影方法的装饰器"""
+    def decorator(func):
+        PROJECTORS[name] = func
+        return func
+    return decorator
+
+
+def stratified_sample(labels, budget, min_per_cluster=10, seed=RANDOM_STATE):
+    """按簇分层抽样，返回排好序的下标数组；总数不超过 budget 时返回全部下标"""
+    labels = np.asarray(labels)
+    if len(labels) <= budget:
+        return np.arange(len(labels))
+
+    rng = np.random.RandomState(seed)
+    clusters, counts = np.unique(labels, return_counts=True)
+    quotas = np.maximum(np.floor(counts * budget / len(labels)).astype(int), np.minimum(counts, min_per_cluster))
+    selected = []
+    for cluster_id, quota in zip(clusters, quotas):
+        members = np.flatnonzero(labels == cluster_id)
+        selected.append(rng.choice(members, size=min(quota, len(members)), replace=False))
+    return np.sort(np.concatenate(selected))
+
+
+def reduce_dimensions(matrix, n_components):
+    """TruncatedSVD 降维（稀疏输入直接计算），维数不超过特征数与样本数"""
+    n_components = min(n_components, matrix.shape[1] - 1, matrix.shape[0] - 1)
+    if n_components < 2:
+        return np.asarray(matrix.todense() if hasattr(matrix, 'todense') else matrix, dtype=np.float64)
+    return TruncatedSVD(n_components=n_components, random_state=RANDOM_STATE).fit_transform(matrix)
+
+
+def _perplexity(n_points):
+    # perplexity 必须小于样本数
+    return float(min(30, max(2, (n_points - 1) // 3)))
+
+
+@register_projector('tsne')
+def tsne(reduced):
+    params = {
+        'n_components': 2,
+        'random_state': RANDOM_STATE,
+        'perplexity': _perplexity(len(reduced)),
+        'method': 'barnes_hut',
+        'init': 'pca',
+    }
+    # scikit-learn 1.5 起迭代次数参数由 n_iter 改名为 max_iter
+    iteration_param = 'max_iter' if 'max_iter' in inspect.signature(TSNE).parameters else 'n_iter'
+    params[iteration_param] = getattr(settings, 'TEXT_MINING_TSNE_ITERATIONS', 300)
+    return TSNE(**params).fit_transform(reduced)
+
+
+@register_projector('tsne_fft')
+def tsne_fft(reduced):
+    try:
+        from openTSNE import TSNE as FFTTSNE
+    except ImportError:
+        print("openTSNE未安装（pip install openTSNE），改用 Barnes-Hut t-SNE")
+        return tsne(reduced)
+    embedding = FFTTSNE(
+        n_components=2, perplexity=_perplexity(len(reduced)), negative_gradient_method='fft',
+        n_iter=getattr(settings, 'TEXT_MINING_TSNE_ITERATIONS', 300), random_state=RANDOM_STATE,
+    ).fit(reduced)
+    return np.asarray(embedding)
+
+
+@register_projector('pca')
+def pca(reduced):
+    # SVD 的前两个分量即为前两个主方向上的坐标（TF-IDF 未中心化，与PCA近似）
+    return reduced[:, :2] if reduced.shape[1] >= 2 else np.hstack([reduced, np.zeros((len(reduced), 1))])
+
+
+def project(matrix, labels=None, method=None, budget=None):
+    """把文档向量投影到二维，返回 {'points', 'labels', 'indices', 'method', 'total', 'seconds'}
+
+    labels 为 None 时均匀抽样；method / budget 默认读取 settings。
+    """
+    method = method or getattr(settings, 'TEXT_MINING_PROJECTION', 'tsne')
+    projector = PROJECTORS.get(method)
+    if projector is None:
+        raise ValueError(f"不支持的投影方法: {method}")
+    budget = budget or getattr(settings, 'TEXT_MINING_PROJECTION_BUDGET', 5000)
+
+    start = time.time()
+    n_rows = matrix.shape[0]
+    sample_labels = np.zeros(n_rows, dtype=np.int64) if labels is None else np.asarray(labels)
+    indices = stratified_sample(sample_labels, budget)
+    sampled = matrix[indices]
+
+    if len(indices) < 3:
+        points = np.zeros((len(indices), 2))
+    else:
+        reduced = reduce_dimensions(sampled, getattr(settings, 'TEXT_MINING_PROJECTION_SVD_COMPONENTS', 50))
+        points = projector(reduced)
+
+    return {
+        'points': points,
+        'labels': None if labels is None else sample_labels[indices],
+        'indices': indices,
+        'method': method,
+        'total': n_rows,
+        'seconds': round(time.time() - start, 3),
+    }
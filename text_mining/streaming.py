@@ -0,0 +1,322 @@
+"""
+流式（外存）文本挖掘
+
+语料大于内存时不再把全部文本读入列表，而是分块流过：
+    1. 逐块读取（问答表用 .iterator(chunk_size=...)，ZIP 数据集逐行读取），每块分词一次
+       （问答数据复用已保存的分词结果），分词结果写入临时文件，同时统计词项的文档频率（有上限的计数器）
+    2. 按文档频率选出词表并计算IDF，各遍从临时文件顺序读取，按块向量化后 MiniBatchKMeans.partial_fit
+    3. 再读一遍预测簇标签：簇大小与关键词（簇内TF-IDF之和）按全量精确统计；
+       示例文档、t-SNE 与词云使用每个簇固定大小的蓄水池样本
+
+内存只与块大小、词表大小、聚类数和样本数有关，与语料总量无关。
+"""
+import io
+import json
+import os
+import random
+import tempfile
+import time
+import zipfile
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+from scipy.sparse import csr_matrix, vstack
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from data_processing.text_processor import PARALLEL_MIN_TEXTS
+from qa_system.models import QAData
+from text_mining.analysis_context import AnalysisContext, TFIDF_PARAMS
+
+RANDOM_STATE = 42
+
+# 支持流式聚类（partial_fit）的方法
+STREAMING_METHODS = ('kmeans', 'minibatch_kmeans')
+
+
+def check_streaming_method(method):
+    if method not in STREAMING_METHODS:
+        raise ValueError(f"流式分析只支持以下聚类方法: {', '.join(STREAMING_METHODS)}")
+
+
+def get_chunk_size():
+    return getattr(settings, 'TEXT_MINING_BATCH_SIZE', 4096)
+
+
+def iter_qa_rows(queryset=None, chunk_size=None):
+    """逐块读取问答数据，产出 (原文, 已保存的分词结果或None, 类别)"""
+    queryset = QAData.objects.all() if queryset is None else queryset
+    rows = queryset.order_by('id').values_list(
+        'question', 'answer', 'category', 'processed_question', 'processed_answer'
+    )
+    for question, answer, category, processed_question, processed_answer in rows.iterator(
+            chunk_size=chunk_size or get_chunk_size()):
+        tokens = f"{processed_question} {processed_answer}".split() if processed_question or processed_answer else None
+        yield question + " " + answer, tokens, category or "未分类"
+
+
+def iter_text_rows(texts):
+    """把逐条产出的文本包装为 (原文, None, None)"""
+    for text in texts:
+        yield text, None, None
+
+
+def iter_zip_lines(file_path):
+    """逐行读取ZIP数据集中所有txt文件（不整体解压到内存），每个非空行作为一个文档"""
+    with zipfile.ZipFile(file_path, 'r') as zip_ref:
+        for name in zip_ref.namelist():
+            if not name.endswith('.txt') or os.path.basename(name).startswith('.'):
+                continue
+            try:
+                with zip_ref.open(name) as member:
+                    for line in io.TextIOWrapper(member, encoding='utf-8'):
+                        line = line.strip()
+                        if line:
+                            yield line
+            except Exception as e:
+                print(f"读取文件 {name} 出错: {e}")
+
+
+def zip_text_size(file_path):
+    """ZIP数据集中txt文件解压后的总字节数"""
+    with zipfile.ZipFile(file_path, 'r') as zip_ref:
+        return sum(
+            info.file_size for info in zip_ref.infolist()
+            if info.filename.endswith('.txt') and not os.path.basename(info.filename).startswith('.')
+        )
+
+
+def read_zip_texts(file_path):
+    """读取ZIP数据集中所有txt文件，每个非空行作为一个文档"""
+    return list(iter_zip_lines(file_path))
+
+
+class Reservoir:
+    """固定大小的均匀随机样本（蓄水池抽样）"""
+
+    def __init__(self, size, seed=RANDOM_STATE):
+        self.size = size
+        self.items = []
+        self.seen = 0
+        self._random = random.Random(seed)
+
+    def reserve(self):
+        """为新到的元素抽签：返回应写入 items 的位置，未入选时返回None（入选后再构造元素，避免无谓开销）"""
+        self.seen += 1
+        if len(self.items) < self.size:
+            self.items.append(None)
+            return len(self.items) - 1
+        slot = self._random.randrange(self.seen)
+        return slot if slot < self.size else None
+
+
+class StreamingCorpus:
+    """流式语料：分块分词并落盘，统计文档频率，之后可以多次按块顺序读取"""
+
+    def __init__(self, rows, text_processor, chunk_size=None, spill_dir=None, total=None, progress_callback=None):
+        """total: 总行数（未知时为None）；progress_callback: 每读完一块调用 progress_callback(已读行数, total)"""
+        self.rows = rows
+        self.total = total
+        self.progress_callback = progress_callback
+        self.text_processor = text_processor
+        self.chunk_size = chunk_size or get_chunk_size()
+        self.spill_dir = spill_dir or getattr(settings, 'TEXT_MINING_SPILL_DIR', None)
+        self.vocabulary_cap = getattr(settings, 'TEXT_MINING_VOCABULARY_CAP', 1000000)
+
+        self.n_documents = 0
+        self.segmented_count = 0
+        self.timings = {}
+        self._document_frequency = Counter()
+        self._analyzer = TfidfVectorizer(ngram_range=TFIDF_PARAMS['ngram_range']).build_analyzer()
+        self._spill_path = None
+        self._pool = None
+
+    def __enter__(self):
+        return self.build()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def build(self):
+        """读取全部数据：分词、写入临时文件并统计文档频率（分词进程池只在读取期间存在，总行数未知时按大语料处理）"""
+        start = time.time()
+        fd, self._spill_path = tempfile.mkstemp(prefix='text_mining_', suffix='.jsonl', dir=self.spill_dir)
+        n_texts = self.total if self.total is not None else PARALLEL_MIN_TEXTS
+        with os.fdopen(fd, 'w', encoding='utf-8') as spill, \
+                self.text_processor.segmentation_pool(n_texts) as self._pool:
+            chunk = []
+            for row in self.rows:
+                chunk.append(row)
+                if len(chunk) >= self.chunk_size:
+                    self._write_chunk(spill, chunk)
+                    chunk = []
+            if chunk:
+                self._write_chunk(spill, chunk)
+        self._pool = None
+        self.timings['tokenize'] = round(time.time() - start, 3)
+        return self
+
+    def _write_chunk(self, spill, chunk):
+        pending = [i for i, (_, tokens, _) in enumerate(chunk) if tokens is None]
+        segmented = self.text_processor.segment_texts([chunk[i][0] for i in pending], pool=self._pool)
+        tokens_list = [tokens for _, tokens, _ in chunk]
+        for i, words in zip(pending, segmented):
+            tokens_list[i] = words
+        self.segmented_count += len(pending)
+
+        for (text, _, category), words in zip(chunk, tokens_list):
+            document = " ".join(words)
+            spill.write(json.dumps([text, document, category], ensure_ascii=False) + "\n")
+            self._document_frequency.update(set(self._analyzer(document)))
+        self.n_documents += len(chunk)
+        if self.progress_callback:
+            self.progress_callback(self.n_documents, self.total)
+
+        if len(self._document_frequency) > self.vocabulary_cap:
+            self._prune_frequencies()
+
+    def _prune_frequencies(self):
+        """计数项超过上限时逐步删除低频词项（近似计数，只影响本来就进不了词表的罕见词）"""
+        threshold = 1
+        while len(self._document_frequency) > self.vocabulary_cap // 2:
+            self._document_frequency = Counter(
+                {term: count for term, count in self._document_frequency.items() if count > threshold}
+            )
+            threshold += 1
+
+    def iter_chunks(self):
+        """按块顺序读取 [(原文, 分词文本, 类别), ...]"""
+        with open(self._spill_path, 'r', encoding='utf-8') as spill:
+            chunk = []
+            for line in spill:
+                chunk.append(json.loads(line))
+                if len(chunk) >= self.chunk_size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+
+    def build_vectorizer(self):
+        """按文档频率选出词表（与内存模式相同的 min_df / max_df / max_features），返回带IDF的TF-IDF向量化器"""
+        max_df = TFIDF_PARAMS['max_df'] * self.n_documents
+        candidates = [
+            (count, term) for term, count in self._document_frequency.items()
+            if TFIDF_PARAMS['min_df'] <= count <= max_df
+        ]
+        candidates.sort(key=lambda item: (-item[0], item[1]))
+        selected = sorted(candidates[:TFIDF_PARAMS['max_features']], key=lambda item: item[1])
+        if not selected:
+            raise ValueError("词表为空，请检查数据集内容")
+
+        vectorizer = TfidfVectorizer(
+            vocabulary={term: i for i, (_, term) in enumerate(selected)},
+            ngram_range=TFIDF_PARAMS['ngram_range'],
+        )
+        document_frequency = np.array([count for count, _ in selected], dtype=np.float64)
+        # 与 TfidfVectorizer 默认的平滑IDF相同
+        vectorizer.idf_ = np.log((1 + self.n_documents) / (1 + document_frequency)) + 1
+        return vectorizer
+
+    def close(self):
+        if self._spill_path and os.path.exists(self._spill_path):
+            os.remove(self._spill_path)
+        self._spill_path = None
+
+    def stats(self):
+        return {
+            'documents': self.n_documents,
+            'segmented': self.segmented_count,
+            'reused_processed': self.n_documents - self.segmented_count,
+            'timings': self.timings,
+            'streaming': True,
+        }
+
+
+def stream_clustering(corpus, method='kmeans', n_clusters=5, progress_callback=None):
+    """在流式语料上聚类，返回 (聚类结果, 样本分析上下文, 样本的簇标签)
+
+    聚类结果与内存模式的格式相同，但不包含逐文档的 cluster_labels，另给出 cluster_sizes。
+    progress_callback: 每处理一块调用 progress_callback(已处理行数, 各遍总行数)
+    """
+    check_streaming_method(method)
+    if corpus.n_documents < n_clusters:
+        raise ValueError(f"文档数（{corpus.n_documents}）少于聚类数（{n_clusters}）")
+    if corpus.chunk_size < n_clusters:
+        # partial_fit 的第一批至少要有 n_clusters 行
+        raise ValueError(f"分块大小（{corpus.chunk_size}）不能小于聚类数（{n_clusters}）")
+
+    vectorizer = corpus.build_vectorizer()
+    clusterer = MiniBatchKMeans(n_clusters=n_clusters, random_state=RANDOM_STATE, batch_size=corpus.chunk_size)
+
+    epochs = getattr(settings, 'TEXT_MINING_STREAMING_EPOCHS', 1)
+    total_rows = corpus.n_documents * (epochs + 1)
+    done_rows = 0
+
+    def advance(n_rows):
+        nonlocal done_rows
+        done_rows += n_rows
+        if progress_callback:
+            progress_callback(done_rows, total_rows)
+
+    start = time.time()
+    for _ in range(epochs):
+        for chunk in corpus.iter_chunks():
+            clusterer.partial_fit(vectorizer.transform([document for _, document, _ in chunk]))
+            advance(len(chunk))
+    corpus.timings['cluster'] = round(time.time() - start, 3)
+
+    # 最后一遍：全量统计簇大小与关键词，每个簇保留蓄水池样本
+    start = time.time()
+    sizes = np.zeros(n_clusters, dtype=np.int64)
+    weight_sums = np.zeros((n_clusters, len(vectorizer.vocabulary_)))
+    first_texts = [[] for _ in range(n_clusters)]
+    sample_size = getattr(settings, 'TEXT_MINING_SAMPLE_PER_CLUSTER', 1000)
+    reservoirs = [Reservoir(sample_size, seed=RANDOM_STATE + cluster_id) for cluster_id in range(n_clusters)]
+
+    for chunk in corpus.iter_chunks():
+        matrix = vectorizer.transform([document for _, document, _ in chunk])
+        labels = clusterer.predict(matrix)
+        sizes += np.bincount(labels, minlength=n_clusters)
+        indicator = csr_matrix((np.ones(len(labels)), (labels, np.arange(len(labels)))), shape=(n_clusters, len(labels)))
+        weight_sums += np.asarray((indicator @ matrix).todense())
+        for row, (label, (text, document, _)) in enumerate(zip(labels, chunk)):
+            if len(first_texts[label]) < 3:
+                first_texts[label].append(text)
+            slot = reservoirs[label].reserve()
+            if slot is not None:
+                reservoirs[label].items[slot] = (text, document, matrix[row])
+        advance(len(chunk))
+    corpus.timings['assign'] = round(time.time() - start, 3)
+
+    feature_names = vectorizer.get_feature_names_out()
+    cluster_info = {}
+    for cluster_id in np.flatnonzero(sizes):
+        top_indices = weight_sums[cluster_id].argsort()[-10:][::-1]
+        cluster_info[f"簇_{cluster_id}"] = {
+            'size': int(sizes[cluster_id]),
+            'keywords': [feature_names[i] for i in top_indices],
+            'sample_texts': first_texts[cluster_id],
+        }
+
+    # 样本上下文：各簇的蓄水池样本（用于t-SNE与词云）
+    texts, documents, rows, sample_labels = [], [], [], []
+    for cluster_id, reservoir in enumerate(reservoirs):
+        for text, document, row in reservoir.items:
+            texts.append(text)
+            documents.append(document)
+            rows.append(row)
+            sample_labels.append(cluster_id)
+    sample_context = AnalysisContext.from_vectors(
+        texts, [document.split() for document in documents], vectorizer, vstack(rows).tocsr()
+    )
+
+    clustering_result = {
+        'cluster_sizes': {f"簇_{cluster_id}": int(size) for cluster_id, size in enumerate(sizes)},
+        'cluster_info': cluster_info,
+        'n_clusters': n_clusters,
+        'method': method,
+        'streaming': True,
+        'sample_size': len(sample_labels),
+    }
+    return clustering_result, sample_context, sample_labels
@@ -1,99 +1,68 @@
 import numpy as np
-import pandas as pd
-import matplotlib
-matplotlib.use('Agg')  # 设置非交互式后端
-import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.cluster import KMeans, DBSCAN
-from sklearn.manifold import TSNE
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.preprocessing import StandardScaler
-from wordcloud import WordCloud
-import jieba
 import json
 import os
 import sys
-from datetime import datetime
+import time
 import base64
 from io import BytesIO
 
-# 添加Django环境
-sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+# 直接作为脚本运行时初始化Django环境（作为模块导入时由调用方负责，导入本模块不再触发 django.setup()）
+if __name__ == '__main__':
+    sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-import django
-django.setup()
+    import django
+    django.setup()
+
+from django.conf import settings
 
 from qa_system.models import TextMiningResult, QAData
-from data_processing.text_processor import TextProcessor
+from data_processing.processors import get_text_processor
+from text_mining.analysis_context import AnalysisContext
+from text_mining.clustering import cluster_matrix
+from text_mining.projection import PROJECTION_TITLES, project
+from text_mining.wordcloud_render import get_image_format, render_wordclouds, term_frequencies
+from text_mining.streaming import (
+    StreamingCorpus, check_streaming_method, stream_clustering, iter_qa_rows, iter_text_rows,
+    iter_zip_lines, read_zip_texts, zip_text_size
+)
+
+# 分析阶段（用于汇报进度）
+ANALYSIS_STAGES = ('分词', '聚类', '投影可视化', '词云')
+
 
 class TextMiningAnalyzer:
-    def __init__(self):
-        self.text_processor = TextProcessor()
-        plt.rcParams['font.sans-serif'] = ['SimHei', 'Arial Unicode MS', 'DejaVu Sans']
-        plt.rcParams['axes.unicode_minus'] = False
-        
-    def load_dataset(self, file_path=None, use_qa_data=True):
-        """加载数据集"""
-        if use_qa_data:
-            # 使用现有的问答数据
-            qa_objects = QAData.objects.all()
-            texts = []
-            labels = []
-            
-            for qa in qa_objects:
-                # 合并问题和答案
-                combined_text = qa.question + " " + qa.answer
-                texts.append(combined_text)
-                labels.append(qa.category or "未分类")
-                
-            return texts, labels
-        else:
-            # 从文件加载数据集
-            if file_path and os.path.exists(file_path):
-                # 这里可以处理CSV、JSON等格式的文件
-                pass
-            return [], []
+    def __init__(self, progress_callback=None):
+        """progress_callback: 分析过程中调用 progress_callback(已完成阶段数, 总阶段数)（阶段数可为小数），
+        后台任务借此汇报进度，并在回调中抛出异常以取消分析
+        """
+        self.text_processor = get_text_processor()
+        self.progress_callback = progress_callback
+        
+    def report_progress(self, stage, fraction=0.0):
+        """汇报进度：stage 为 ANALYSIS_STAGES 中的阶段序号，fraction 为该阶段内的完成比例"""
+        if self.progress_callback:
+            self.progress_callback(stage + min(max(fraction, 0.0), 1.0), len(ANALYSIS_STAGES))
     
-    def preprocess_texts(self, texts):
-        """预处理文本数据"""
-        processed_texts = []
-        
-        for text in texts:
-            # 使用TextProcessor进行预处理
-            words = self.text_processor.segment_text(text)
-            processed_text = " ".join(words)
-            processed_texts.append(processed_text)
-            
-        return processed_texts
+    def stage_callback(self, stage):
+        """返回汇报某一阶段内进度的 (done, total) 回调，total 未知时只检查取消"""
+        return lambda done, total=None: self.report_progress(stage, done / total if total else 0.0)
     
-    def perform_clustering(self, texts, method='kmeans', n_clusters=5):
-        """执行文本聚类"""
-        # 预处理文本
-        processed_texts = self.preprocess_texts(texts)
-        
-        # TF-IDF向量化
-        vectorizer = TfidfVectorizer(
-            max_features=1000,
-            ngram_range=(1, 2),
-            min_df=2,
-            max_df=0.8
-        )
-        
-        tfidf_matrix = vectorizer.fit_transform(processed_texts)
-        
-        # 聚类算法
-        if method == 'kmeans':
-            clusterer = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-        elif method == 'dbscan':
-            clusterer = DBSCAN(eps=0.5, min_samples=5)
-        else:
-            raise ValueError("不支持的聚类方法")
+    def load_context(self, texts=None):
+        """构建分析上下文：传入文本时逐篇分词，否则加载问答数据（复用已保存的分词结果）"""
+        if texts is None:
+            return AnalysisContext.from_qa_data(self.text_processor, progress_callback=self.stage_callback(0))
+        return AnalysisContext.from_texts(texts, self.text_processor, progress_callback=self.stage_callback(0))
+    
+    def perform_clustering(self, context, method='kmeans', n_clusters=5):
+        """执行文本聚类（使用上下文中已拟合的TF-IDF矩阵）"""
+        vectorizer, tfidf_matrix = context.vectorize()
         
-        cluster_labels = clusterer.fit_predict(tfidf_matrix.toarray())
+        # 聚类算法（直接在稀疏矩阵上聚类，见 text_mining.clustering）
+        cluster_labels = cluster_matrix(tfidf_matrix, method=method, n_clusters=n_clusters)
         
         # 分析聚类结果
-        cluster_info = self.analyze_clusters(texts, cluster_labels, vectorizer, tfidf_matrix)
+        cluster_info = self.analyze_clusters(context.texts, cluster_labels, vectorizer, tfidf_matrix)
         
         return {
             'cluster_labels': cluster_labels.tolist(),
@@ -107,13 +76,15 @@ class TextMiningAnalyzer:
         cluster_info = {}
         feature_names = vectorizer.get_feature_names_out()
         
-        for cluster_id in set(cluster_labels):
+        cluster_labels = np.asarray(cluster_labels)
+        
+        for cluster_id in np.unique(cluster_labels):
             if cluster_id == -1:  # DBSCAN的噪声点
                 continue
                 
             # 获取该簇的文档
-            cluster_docs = [i for i, label in enumerate(cluster_labels) if label == cluster_id]
-            cluster_texts = [texts[i] for i in cluster_docs]
+            cluster_docs = np.flatnonzero(cluster_labels == cluster_id)
+            cluster_texts = [texts[i] for i in cluster_docs[:3]]
             
             # 计算该簇的TF-IDF均值
             cluster_tfidf = tfidf_matrix[cluster_docs].mean(axis=0).A1
@@ -125,24 +96,37 @@ class TextMiningAnalyzer:
             cluster_info[f"簇_{cluster_id}"] = {
                 'size': len(cluster_docs),
                 'keywords': top_keywords,
-                'sample_texts': cluster_texts[:3]  # 示例文档
+                'sample_texts': cluster_texts  # 示例文档
             }
         
         return cluster_info
     
-    def generate_tsne_visualization(self, texts, cluster_labels=None):
-        """生成t-SNE可视化"""
-        # 预处理和向量化
-        processed_texts = self.preprocess_texts(texts)
-        vectorizer = TfidfVectorizer(max_features=100, ngram_range=(1, 2))
-        tfidf_matrix = vectorizer.fit_transform(processed_texts)
+    def project_context(self, context, cluster_labels=None, method=None):
+        """把上下文的TF-IDF矩阵投影到二维（按簇分层抽样到点数预算，见 text_mining.projection）"""
+        _, tfidf_matrix = context.vectorize()
+        return project(tfidf_matrix, cluster_labels, method=method)
+    
+    def generate_tsne_visualization(self, context, cluster_labels=None, method=None):
+        """生成二维投影可视化（默认 t-SNE，方法由 TEXT_MINING_PROJECTION 指定）"""
+        return self.plot_projection(self.project_context(context, cluster_labels, method=method))
+    
+    def plot_projection(self, projection):
+        """绘制投影散点图，返回base64编码的PNG（尺寸与分辨率由 TEXT_MINING_PROJECTION_FIGSIZE / TEXT_MINING_PROJECTION_DPI 指定）"""
+        # matplotlib 只在绘图时导入，加载分析模块（Web进程导入视图时）不必加载整套绘图库
+        import matplotlib
+        matplotlib.use('Agg')  # 设置非交互式后端
+        import matplotlib.pyplot as plt
+        plt.rcParams['font.sans-serif'] = ['SimHei', 'Arial Unicode MS', 'DejaVu Sans']
+        plt.rcParams['axes.unicode_minus'] = False
         
-        # t-SNE降维
-        tsne = TSNE(n_components=2, random_state=42, perplexity=30, n_iter=300)
-        tsne_results = tsne.fit_transform(tfidf_matrix.toarray())
+        points = projection['points']
+        cluster_labels = projection['labels']
+        title = PROJECTION_TITLES.get(projection['method'], projection['method'])
+        # 点较多时缩小标记，避免互相遮盖
+        marker_size = 50 if len(points) <= 1000 else 10
         
         # 创建可视化
-        plt.figure(figsize=(12, 8))
+        plt.figure(figsize=tuple(getattr(settings, 'TEXT_MINING_PROJECTION_FIGSIZE', (12, 8))))
         
         if cluster_labels is not None:
             # 按聚类结果着色
@@ -157,16 +141,19 @@ class TextMiningAnalyzer:
                     color = colors[i]
                     alpha = 0.7
                 
-                mask = np.array(cluster_labels) == label
-                plt.scatter(tsne_results[mask, 0], tsne_results[mask, 1], 
-                           c=[color], alpha=alpha, s=50, 
+                mask = cluster_labels == label
+                plt.scatter(points[mask, 0], points[mask, 1], 
+                           c=[color], alpha=alpha, s=marker_size, 
                            label=f'簇 {label}' if label != -1 else '噪声')
         else:
-            plt.scatter(tsne_results[:, 0], tsne_results[:, 1], alpha=0.7, s=50)
+            plt.scatter(points[:, 0], points[:, 1], alpha=0.7, s=marker_size)
         
-        plt.title('文本数据 t-SNE 可视化', fontsize=16)
-        plt.xlabel('t-SNE 维度 1', fontsize=12)
-        plt.ylabel('t-SNE 维度 2', fontsize=12)
+        if len(points) < projection['total']:
+            plt.title(f'文本数据 {title} 可视化（抽样 {len(points)} / {projection["total"]}）', fontsize=16)
+        else:
+            plt.title(f'文本数据 {title} 可视化', fontsize=16)
+        plt.xlabel(f'{title} 维度 1', fontsize=12)
+        plt.ylabel(f'{title} 维度 2', fontsize=12)
         
         if cluster_labels is not None:
             plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
@@ -175,7 +162,7 @@ class TextMiningAnalyzer:
         
         # 保存图片到BytesIO
         buffer = BytesIO()
-        plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
+        plt.savefig(buffer, format='png', dpi=getattr(settings, 'TEXT_MINING_PROJECTION_DPI', 100), bbox_inches='tight')
         buffer.seek(0)
         
         # 转换为base64
@@ -184,162 +171,145 @@ class TextMiningAnalyzer:
         
         return image_base64
     
-    def generate_wordclouds(self, texts, cluster_labels=None, categories=None):
-        """生成词云图"""
-        wordcloud_results = {}
+    def generate_wordclouds(self, context, cluster_labels=None, categories=None):
+        """生成词云图（由上下文中的分词结果统计词频，多张词云并行渲染，见 text_mining.wordcloud_render）"""
+        frequencies = {}
         
         if cluster_labels is not None:
             # 为每个聚类生成词云
-            for cluster_id in set(cluster_labels):
+            for cluster_id, indices in sorted(context.group_documents(cluster_labels).items()):
                 if cluster_id == -1:  # 跳过噪声点
                     continue
-                
-                cluster_texts = [texts[i] for i, label in enumerate(cluster_labels) if label == cluster_id]
-                combined_text = " ".join(cluster_texts)
-                processed_text = " ".join(self.text_processor.segment_text(combined_text))
-                
-                if processed_text.strip():
-                    wordcloud_img = self.create_single_wordcloud(processed_text, f"簇_{cluster_id}")
-                    wordcloud_results[f"cluster_{cluster_id}"] = wordcloud_img
+                frequencies[f"cluster_{cluster_id}"] = term_frequencies(context.tokens[i] for i in indices)
         
         elif categories is not None:
             # 按类别生成词云
-            category_texts = {}
-            for text, category in zip(texts, categories):
-                if category not in category_texts:
-                    category_texts[category] = []
-                category_texts[category].append(text)
-            
-            for category, cat_texts in category_texts.items():
-                combined_text = " ".join(cat_texts)
-                processed_text = " ".join(self.text_processor.segment_text(combined_text))
-                
-                if processed_text.strip():
-                    wordcloud_img = self.create_single_wordcloud(processed_text, category)
-                    wordcloud_results[category] = wordcloud_img
+            for category, indices in context.group_documents(categories).items():
+                frequencies[category] = term_frequencies(context.tokens[i] for i in indices)
         
         else:
             # 生成整体词云
-            combined_text = " ".join(texts)
-            processed_text = " ".join(self.text_processor.segment_text(combined_text))
-            
-            if processed_text.strip():
-                wordcloud_img = self.create_single_wordcloud(processed_text, "整体词云")
-                wordcloud_results["overall"] = wordcloud_img
+            frequencies["overall"] = term_frequencies(context.tokens)
         
-        return wordcloud_results
+        return render_wordclouds(frequencies)
     
     def create_single_wordcloud(self, text, title):
-        """创建单个词云图"""
-        # 设置中文字体路径（适用于macOS）
-        import platform
-        font_path = None
-        
-        if platform.system() == 'Darwin':  # macOS
-            # macOS系统中文字体路径
-            possible_fonts = [
-                '/System/Library/Fonts/PingFang.ttc',
-                '/System/Library/Fonts/STHeiti Light.ttc',
-                '/System/Library/Fonts/STHeiti Medium.ttc',
-                '/Library/Fonts/Arial Unicode MS.ttf'
-            ]
-        elif platform.system() == 'Windows':  # Windows
-            possible_fonts = [
-                'C:/Windows/Fonts/simhei.ttf',
-                'C:/Windows/Fonts/msyh.ttc',
-                'C:/Windows/Fonts/simsun.ttc'
-            ]
-        else:  # Linux
-            possible_fonts = [
-                '/usr/share/fonts/truetype/droid/DroidSansFallbackFull.ttf',
-                '/usr/share/fonts/truetype/wqy/wqy-microhei.ttc',
-                '/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf'
-            ]
+        """由空格分隔的分词文本创建单个词云图"""
+        return render_wordclouds({title: term_frequencies([text.split()])}).get(title, '')
+    
+    def analyze_context(self, context, dataset_name, clustering_method='kmeans', n_clusters=5, summary=None):
+        """对分析上下文执行聚类、t-SNE与词云，保存结果（整个流程只分词、向量化一次）"""
+        # 执行聚类分析
+        self.report_progress(1)
+        clustering_result = self.perform_clustering(context, method=clustering_method, n_clusters=n_clusters)
+        
+        return self.save_analysis(
+            dataset_name, clustering_result, context, clustering_result['cluster_labels'], len(context),
+            summary={**(summary or {}), 'tokenization': context.stats()}
+        )
+    
+    def run_streaming_analysis(self, rows, dataset_name, clustering_method='kmeans', n_clusters=5, summary=None,
+                               total_rows=None):
+        """流式分析（语料大于内存时）：rows 逐条产出 (原文, 分词结果或None, 类别)，见 text_mining.streaming
+        
+        total_rows: 总行数（已知时用于汇报分词阶段的进度）
+        """
+        # 先检查聚类方法，避免读完整个语料后才失败
+        check_streaming_method(clustering_method)
+        with StreamingCorpus(rows, self.text_processor, total=total_rows,
+                             progress_callback=self.stage_callback(0)) as corpus:
+            if not corpus.n_documents:
+                raise ValueError("没有找到可用的数据")
+            print(f"流式读取了 {corpus.n_documents} 条文本数据")
+            
+            clustering_result, sample_context, sample_labels = stream_clustering(
+                corpus, method=clustering_method, n_clusters=n_clusters, progress_callback=self.stage_callback(1)
+            )
+            total_texts = corpus.n_documents
+            summary = {**(summary or {}), 'tokenization': corpus.stats()}
         
-        # 找到第一个存在的字体文件
-        for font in possible_fonts:
-            if os.path.exists(font):
-                font_path = font
-                break
+        # t-SNE 与词云使用各簇的蓄水池样本
+        return self.save_analysis(dataset_name, clustering_result, sample_context, sample_labels, total_texts, summary)
+    
+    def save_analysis(self, dataset_name, clustering_result, context, cluster_labels, total_texts, summary):
+        """生成可视化并保存分析结果"""
+        # 生成可视化
+        self.report_progress(2)
+        projection = self.project_context(context, cluster_labels)
+        tsne_image = self.plot_projection(projection)
+        self.report_progress(3)
+        start = time.time()
+        wordcloud_results = self.generate_wordclouds(context, cluster_labels)
+        wordcloud_seconds = round(time.time() - start, 3)
+        wordcloud_format = get_image_format()
+        
+        # 保存结果到数据库
+        mining_result = TextMiningResult.objects.create(
+            dataset_name=dataset_name,
+            clustering_result=json.dumps(clustering_result),
+            wordcloud_plots=json.dumps({
+                'tsne_image': tsne_image,
+                'wordclouds': wordcloud_results,
+                'wordcloud_format': wordcloud_format
+            })
+        )
         
-        # 创建词云
-        wordcloud_params = {
-            'width': 800,
-            'height': 600,
-            'background_color': 'white',
-            'max_words': 100,
-            'relative_scaling': 0.5,
-            'colormap': 'viridis',
-            'prefer_horizontal': 0.9
+        # 生成摘要
+        summary = {
+            'total_texts': total_texts,
+            'n_clusters': clustering_result['n_clusters'],
+            'clustering_method': clustering_result['method'],
+            'projection': {
+                'method': projection['method'],
+                'points': len(projection['points']),
+                'total': projection['total'],
+                'seconds': projection['seconds'],
+            },
+            'wordcloud_seconds': wordcloud_seconds,
+            **summary
         }
         
-        # 如果找到了中文字体，则添加字体路径
-        if font_path:
-            wordcloud_params['font_path'] = font_path
-        
-        wordcloud = WordCloud(**wordcloud_params).generate(text)
-        
-        # 创建图片
-        plt.figure(figsize=(10, 6))
-        plt.imshow(wordcloud, interpolation='bilinear')
-        plt.title(f'{title} 词云图', fontsize=16)
-        plt.axis('off')
-        
-        # 保存图片到BytesIO
-        buffer = BytesIO()
-        plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
-        buffer.seek(0)
-        
-        # 转换为base64
-        image_base64 = base64.b64encode(buffer.getvalue()).decode()
-        plt.close()
-        
-        return image_base64
+        return {
+            'result_id': mining_result.id,
+            'summary': summary,
+            'clustering': clustering_result,
+            'tsne_image': tsne_image,
+            'wordclouds': wordcloud_results,
+            'wordcloud_format': wordcloud_format
+        }
     
-    def run_complete_analysis(self, dataset_name="医疗问答数据", clustering_method='kmeans', n_clusters=5):
-        """运行完整的文本挖掘分析（使用现有问答数据）"""
+    def should_stream(self, n_documents):
+        return n_documents > getattr(settings, 'TEXT_MINING_STREAMING_THRESHOLD', 200000)
+    
+    def run_complete_analysis(self, dataset_name="医疗问答数据", clustering_method='kmeans', n_clusters=5, streaming=None):
+        """运行完整的文本挖掘分析（使用现有问答数据）
+        
+        streaming: 是否流式分析，None 表示问答数据超过 TEXT_MINING_STREAMING_THRESHOLD 条时自动流式
+        """
         try:
-            # 加载数据
-            texts, categories = self.load_dataset(use_qa_data=True)
+            if streaming is None:
+                streaming = self.should_stream(QAData.objects.count())
+            if streaming:
+                return self.run_streaming_analysis(
+                    iter_qa_rows(), dataset_name, clustering_method, n_clusters,
+                    summary={'categories': QAData.objects.values('category').distinct().count()},
+                    total_rows=QAData.objects.count()
+                )
             
-            if not texts:
-                raise ValueError("没有找到可用的数据")
+            # 加载数据（已预处理的问答直接复用保存的分词结果）
+            context = self.load_context()
             
-            print(f"加载了 {len(texts)} 条文本数据")
-            
-            # 执行聚类分析
-            clustering_result = self.perform_clustering(texts, method=clustering_method, n_clusters=n_clusters)
+            if not len(context):
+                raise ValueError("没有找到可用的数据")
             
-            # 生成可视化
-            tsne_image = self.generate_tsne_visualization(texts, clustering_result['cluster_labels'])
-            wordcloud_results = self.generate_wordclouds(texts, clustering_result['cluster_labels'])
+            print(f"加载了 {len(context)} 条文本数据")
             
-            # 保存结果到数据库
-            mining_result = TextMiningResult.objects.create(
-                dataset_name=dataset_name,
-                clustering_result=json.dumps(clustering_result),
-                wordcloud_plots=json.dumps({
-                    'tsne_image': tsne_image,
-                    'wordclouds': wordcloud_results
-                })
+            categories = context.categories
+            return self.analyze_context(
+                context, dataset_name, clustering_method, n_clusters,
+                summary={'categories': len(set(categories)) if categories else 0}
             )
             
-            # 生成摘要
-            summary = {
-                'total_texts': len(texts),
-                'n_clusters': clustering_result['n_clusters'],
-                'clustering_method': clustering_method,
-                'categories': len(set(categories)) if categories else 0
-            }
-            
-            return {
-                'result_id': mining_result.id,
-                'summary': summary,
-                'clustering': clustering_result,
-                'tsne_image': tsne_image,
-                'wordclouds': wordcloud_results
-            }
-            
         except Exception as e:
             print(f"文本挖掘分析错误: {e}")
             raise
@@ -352,39 +322,33 @@ class TextMiningAnalyzer:
             
             print(f"分析 {len(texts)} 条文本数据")
             
-            # 执行聚类分析
-            clustering_result = self.perform_clustering(texts, method=clustering_method, n_clusters=n_clusters)
-            
-            # 生成可视化
-            tsne_image = self.generate_tsne_visualization(texts, clustering_result['cluster_labels'])
-            wordcloud_results = self.generate_wordclouds(texts, clustering_result['cluster_labels'])
-            
-            # 保存结果到数据库
-            mining_result = TextMiningResult.objects.create(
-                dataset_name=dataset_name,
-                clustering_result=json.dumps(clustering_result),
-                wordcloud_plots=json.dumps({
-                    'tsne_image': tsne_image,
-                    'wordclouds': wordcloud_results
-                })
+            context = self.load_context(texts)
+            return self.analyze_context(
+                context, dataset_name, clustering_method, n_clusters,
+                summary={'data_source': 'uploaded_dataset'}
             )
             
-            # 生成摘要
-            summary = {
-                'total_texts': len(texts),
-                'n_clusters': clustering_result['n_clusters'],
-                'clustering_method': clustering_method,
-                'data_source': 'uploaded_dataset'
-            }
-            
-            return {
-                'result_id': mining_result.id,
-                'summary': summary,
-                'clustering': clustering_result,
-                'tsne_image': tsne_image,
-                'wordclouds': wordcloud_results
-            }
-            
+        except Exception as e:
+            print(f"文本挖掘分析错误: {e}")
+            raise
+
+    def run_archive_analysis(self, file_path, dataset_name="上传数据集", clustering_method='kmeans', n_clusters=5,
+                             streaming=None):
+        """分析ZIP数据集（每个txt文件的每个非空行作为一个文档）
+        
+        streaming: 是否流式分析（逐行读取，不把全部文本读入内存），
+        None 表示txt文件解压后超过 TEXT_MINING_STREAMING_ARCHIVE_BYTES 字节时自动流式
+        """
+        if streaming is None:
+            streaming = zip_text_size(file_path) > getattr(settings, 'TEXT_MINING_STREAMING_ARCHIVE_BYTES', 64 * 1024 * 1024)
+        if not streaming:
+            return self.run_complete_analysis_with_texts(read_zip_texts(file_path), dataset_name, clustering_method, n_clusters)
+        
+        try:
+            return self.run_streaming_analysis(
+                iter_text_rows(iter_zip_lines(file_path)), dataset_name, clustering_method, n_clusters,
+                summary={'data_source': 'uploaded_dataset'}
+            )
         except Exception as e:
             print(f"文本挖掘分析错误: {e}")
             raise
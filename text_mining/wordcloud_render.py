@@ -0,0 +1,135 @@
+"""
+词云渲染
+
+词云直接由词频生成（generate_from_frequencies），输入是分析上下文中已有的分词结果，不再拼接文本后
+由 WordCloud 重新切词；图片由 WordCloud.to_image() 直接编码为 PNG / WebP，不经过 matplotlib
+（原来每张图先画进 matplotlib 再以 dpi=300 保存，输出约 3000 x 1800 像素）。
+
+    - 中文字体路径在进程内只查找一次（TEXT_MINING_WORDCLOUD_FONT 可直接指定）
+    - 图片尺寸与格式由 TEXT_MINING_WORDCLOUD_SIZE / TEXT_MINING_WORDCLOUD_FORMAT 指定
+    - 多个词云（每个簇一张）交给本次调用创建的 spawn 进程池（见 data_processing.segment_pool.create_pool）
+      并行渲染，进程数不超过 TEXT_MINING_WORDCLOUD_WORKERS 与词云数，渲染完成后关闭
+"""
+import base64
+import multiprocessing
+import os
+import platform
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+
+# 每张词云最多显示的词数（只把这些词的词频传给渲染进程）
+MAX_WORDS = 100
+
+# 各平台的候选中文字体
+FONT_CANDIDATES = {
+    'Darwin': [
+        '/System/Library/Fonts/PingFang.ttc',
+        '/System/Library/Fonts/STHeiti Light.ttc',
+        '/System/Library/Fonts/STHeiti Medium.ttc',
+        '/Library/Fonts/Arial Unicode MS.ttf',
+    ],
+    'Windows': [
+        'C:/Windows/Fonts/simhei.ttf',
+        'C:/Windows/Fonts/msyh.ttc',
+        'C:/Windows/Fonts/simsun.ttc',
+    ],
+    'Linux': [
+        '/usr/share/fonts/truetype/droid/DroidSansFallbackFull.ttf',
+        '/usr/share/fonts/truetype/wqy/wqy-microhei.ttc',
+        '/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf',
+    ],
+}
+
+IMAGE_FORMATS = ('png', 'webp')
+
+_UNRESOLVED = object()
+_font_path = _UNRESOLVED
+
+
+def resolve_font_path():
+    """查找第一个存在的中文字体（结果在进程内缓存），找不到时返回None（使用 WordCloud 自带字体）"""
+    global _font_path
+    if _font_path is _UNRESOLVED:
+        configured = getattr(settings, 'TEXT_MINING_WORDCLOUD_FONT', None)
+        candidates = [configured] if configured else FONT_CANDIDATES.get(platform.system(), FONT_CANDIDATES['Linux'])
+        _font_path = next((font for font in candidates if os.path.exists(font)), None)
+        if _font_path is None:
+            print("未找到中文字体，词云中的中文可能无法显示")
+    return _font_path
+
+
+def get_image_format():
+    """词云图片格式（'png' 或 'webp'），Pillow 不支持 WebP 时退回 PNG"""
+    image_format = str(getattr(settings, 'TEXT_MINING_WORDCLOUD_FORMAT', 'png')).lower()
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f"不支持的词云图片格式: {image_format}")
+    if image_format == 'webp':
+        from PIL import features
+        if not features.check('webp'):
+            print("Pillow 未编译 WebP 支持，词云改用PNG")
+            return 'png'
+    return image_format
+
+
+def term_frequencies(token_lists, max_words=MAX_WORDS):
+    """统计若干文档分词结果的词频，只保留出现次数最多的 max_words 个词"""
+    counter = Counter()
+    for words in token_lists:
+        counter.update(words)
+    return dict(counter.most_common(max_words))
+
+
+def render_wordcloud(frequencies, size, image_format, font_path):
+    """由词频渲染一张词云，返回base64编码的图片（进程池中执行，参数均可序列化）"""
+    from wordcloud import WordCloud
+
+    width, height = size
+    wordcloud_params = {
+        'width': width,
+        'height': height,
+        'background_color': 'white',
+        'max_words': MAX_WORDS,
+        'relative_scaling': 0.5,
+        'colormap': 'viridis',
+        'prefer_horizontal': 0.9,
+    }
+    # 如果找到了中文字体，则添加字体路径
+    if font_path:
+        wordcloud_params['font_path'] = font_path
+
+    image = WordCloud(**wordcloud_params).generate_from_frequencies(frequencies).to_image()
+    buffer = BytesIO()
+    if image_format == 'webp':
+        # 词云是大块纯色的图形，无损WebP比有损编码更小
+        image.save(buffer, format='WEBP', lossless=True)
+    else:
+        image.save(buffer, format='PNG', optimize=True)
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def get_workers(n_clouds):
+    """渲染进程数：不超过配置值与词云数"""
+    return max(1, min(n_clouds, getattr(settings, 'TEXT_MINING_WORDCLOUD_WORKERS', 4) or 1))
+
+
+def render_wordclouds(frequencies_by_key):
+    """渲染 {名称: 词频} 中的每一张词云，返回 {名称: base64图片}（顺序与输入一致，空词频跳过）"""
+    items = [(key, frequencies) for key, frequencies in frequencies_by_key.items() if frequencies]
+    if not items:
+        return {}
+
+    size = tuple(getattr(settings, 'TEXT_MINING_WORDCLOUD_SIZE', (800, 600)))
+    image_format = get_image_format()
+    font_path = resolve_font_path()
+
+    workers = get_workers(len(items))
+    if workers <= 1:
+        images = [render_wordcloud(frequencies, size, image_format, font_path) for _, frequencies in items]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            futures = [pool.submit(render_wordcloud, frequencies, size, image_format, font_path) for _, frequencies in items]
+            images = [future.result() for future in futures]
+    return {key: image for (key, _), image in zip(items, images)}